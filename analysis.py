@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
 
+from tracing import count, span, traced
+
 # Database configuration
 MYSQL_CONFIG = {
     "host": "localhost",
@@ -22,6 +24,7 @@ engine = create_engine(
     f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}"
 )
 
+@traced()
 def fetch_sales_data():
     """Retrieve historical sales data with product and weather information"""
     query = """
@@ -38,7 +41,7 @@ def fetch_sales_data():
     ORDER BY sale_date
     """
     
-    with engine.connect() as conn:
+    with span('db_query', query='sales_history'), engine.connect() as conn:
         result = conn.execute(text(query))
         df = pd.DataFrame(result.fetchall(), columns=result.keys())
     
@@ -90,6 +93,7 @@ def generate_forecast(item_id, historical_data, periods=15):
         print(f"Error forecasting for {item_id}: {str(e)}")
         return None
 
+@traced()
 def analyze_and_forecast():
     """Main forecasting workflow"""
     # Retrieve sales data
@@ -107,13 +111,16 @@ def analyze_and_forecast():
         
         if len(product_data) < 14:
             print(f"Skipping {product} - insufficient historical data")
+            count('forecast_items_total', outcome='skipped')
             continue
             
         # Prepare data for forecasting
         prophet_data = prepare_forecast_data(product_data)
         
         # Generate 15-day forecast (includes 7-day)
-        forecast = generate_forecast(product, prophet_data)
+        with span('forecast_fit'):
+            forecast = generate_forecast(product, prophet_data)
+        count('forecast_items_total', outcome='failed' if forecast is None else 'ok')
         
         if forecast is not None:
             # Add product ID to forecast
@@ -125,7 +132,8 @@ def analyze_and_forecast():
     # Combine all forecasts
     if all_forecasts:
         final_forecast = pd.concat(all_forecasts)
-        final_forecast.to_csv('sales_forecasts.csv', index=False)
+        with span('write_csv', output='sales_forecasts'):
+            final_forecast.to_csv('sales_forecasts.csv', index=False)
         print(f"Forecasts generated for {len(all_forecasts)} products")
         return final_forecast
     else:
@@ -173,11 +181,12 @@ def calculate_inventory_status(forecast_df, inventory_df):
 def fetch_inventory_data():
     """Retrieve current inventory levels"""
     query = "SELECT item_id, current_stock FROM Inventory"
-    with engine.connect() as conn:
+    with span('db_query', query='inventory_levels'), engine.connect() as conn:
         result = conn.execute(text(query))
         inventory_df = pd.DataFrame(result.fetchall(), columns=result.keys())
     return inventory_df
 
+@traced()
 def calculate_inventory_status(forecast_df, inventory_df):
     """Compare forecasts with inventory and identify surpluses/shortages"""
     # Aggregate forecasts
@@ -209,6 +218,7 @@ def calculate_inventory_status(forecast_df, inventory_df):
     
     return pd.concat(results)
 
+@traced()
 def generate_recommendations(status_df):
     """Generate actionable recommendations based on inventory status"""
     recommendations = []
@@ -251,6 +261,7 @@ def generate_recommendations(status_df):
     
     return pd.DataFrame(recommendations)
 
+@traced()
 def inventory_analysis(forecast_df):
     """Main inventory analysis workflow"""
     # Get current inventory
@@ -263,8 +274,9 @@ def inventory_analysis(forecast_df):
     recommendations_df = generate_recommendations(status_df)
     
     # Save results
-    status_df.to_csv('inventory_status.csv', index=False)
-    recommendations_df.to_csv('inventory_recommendations.csv', index=False)
+    with span('write_csv', output='inventory_status'):
+        status_df.to_csv('inventory_status.csv', index=False)
+        recommendations_df.to_csv('inventory_recommendations.csv', index=False)
     
     # Print critical alerts
     critical_issues = recommendations_df[recommendations_df['type'] != 'Adequate']
@@ -1,9 +1,13 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 import pandas as pd
 import uvicorn
 from typing import Dict, Any
 from analysis import analyze_and_forecast, inventory_analysis  # Fix import path
+import tracing
 
 app = FastAPI()
 
@@ -16,6 +20,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+tracing.describe('http_requests_total', "API requests by route, method and status")
+tracing.describe('http_request_duration_seconds', "API request latency by route and method")
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request under its route template"""
+    if not tracing.ENABLED:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates (not raw paths) keep /item-details/{item_id} one series
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        tracing.observe('http_request_duration_seconds', time.perf_counter() - start,
+                        route=route, method=request.method)
+        tracing.count('http_requests_total', route=route, method=request.method, status=status)
+
 # In-memory storage for results
 latest_results = {
     "forecast": None,
@@ -23,6 +49,10 @@ latest_results = {
     "recommendations": None
 }
 
+def _records(df: pd.DataFrame):
+    # Items without a forecast have NaN projections, which JSON cannot encode
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
 @app.post("/run-analysis")
 async def run_analysis():
     try:
@@ -31,11 +61,12 @@ async def run_analysis():
         status_df, recommendations_df = inventory_analysis(forecast_df)
         
         # Store results in memory
-        latest_results.update({
-            "forecast": forecast_df.to_dict(orient="records"),
-            "status": status_df.to_dict(orient="records"),
-            "recommendations": recommendations_df.to_dict(orient="records")
-        })
+        with tracing.span('serialize_results'):
+            latest_results.update({
+                "forecast": _records(forecast_df),
+                "status": _records(status_df),
+                "recommendations": _records(recommendations_df)
+            })
         
         return {"message": "Analysis completed successfully"}
     
@@ -71,5 +102,10 @@ async def get_item_details(item_id: str):
     except KeyError:
         raise HTTPException(status_code=404, detail="Item not found")
 
+@app.get("/metrics")
+async def metrics():
+    """Stage spans, counters and request metrics in Prometheus text format"""
+    return Response(tracing.render_prometheus(), media_type=tracing.CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,9 +1,8 @@
 import streamlit as st
 import requests
 import pandas as pd
-
-# API configuration
-API_BASE_URL = "http://localhost:8000"
+import streamlit_cache as cache
+from streamlit_cache import API_BASE_URL
 
 def main():
     st.title("🍏 Food Waste Reduction Dashboard")
@@ -15,6 +14,7 @@ def main():
             try:
                 response = requests.post(f"{API_BASE_URL}/run-analysis")
                 if response.status_code == 200:
+                    cache.invalidate_api_results()
                     st.success("✅ Analysis completed successfully!")
                 else:
                     st.error(f"❌ Error: {response.json().get('detail', 'Unknown error')}")
@@ -24,10 +24,10 @@ def main():
     # Display Results
     try:
         # Forecast Display
-        forecast_response = requests.get(f"{API_BASE_URL}/forecast")
-        if forecast_response.status_code == 200:
+        forecast_status, forecast_data = cache.fetch_api("/forecast")
+        if forecast_status == 200:
             with st.expander("📈 Sales Predictions", expanded=True):
-                forecast_df = pd.DataFrame(forecast_response.json()).rename(columns={
+                forecast_df = pd.DataFrame(forecast_data).rename(columns={
                     "ds": "Date",
                     "yhat": "Predicted Sales",
                     "yhat_lower": "Minimum Expected",
@@ -61,10 +61,10 @@ def main():
                 st.dataframe(forecast_df.style.format({"Predicted Sales": "{:.2f}", "Minimum Expected": "{:.2f}", "Maximum Expected": "{:.2f}"}))
 
         # Inventory Status Display
-        status_response = requests.get(f"{API_BASE_URL}/inventory-status")
-        if status_response.status_code == 200:
+        status_code, status_data = cache.fetch_api("/inventory-status")
+        if status_code == 200:
             with st.expander("📦 Inventory Health Check", expanded=True):
-                status_df = pd.DataFrame(status_response.json()).rename(columns={
+                status_df = pd.DataFrame(status_data).rename(columns={
                     "item_id": "Product ID",
                     "days": "Forecast Days",
                     "status": "Status",
@@ -75,10 +75,10 @@ def main():
                 st.dataframe(status_df.style.applymap(lambda x: "color: green" if x == "Adequate" else "color: red", subset=["Status"]))
 
         # Recommendations Display
-        rec_response = requests.get(f"{API_BASE_URL}/recommendations")
-        if rec_response.status_code == 200:
+        rec_status, rec_data = cache.fetch_api("/recommendations")
+        if rec_status == 200:
             with st.expander("🚨 Action Required", expanded=True):
-                rec_df = pd.DataFrame(rec_response.json()).rename(columns={
+                rec_df = pd.DataFrame(rec_data).rename(columns={
                     "item_id": "Product ID",
                     "days": "Days Ahead",
                     "type": "Issue Type",
@@ -101,9 +101,8 @@ def main():
         with st.expander("🔍 Product Lookup", expanded=True):
             item_id = st.text_input("Enter Product ID:")
             if item_id:
-                item_response = requests.get(f"{API_BASE_URL}/item-details/{item_id}")
-                if item_response.status_code == 200:
-                    item_data = item_response.json()
+                item_status, item_data = cache.fetch_api(f"/item-details/{item_id}")
+                if item_status == 200:
                     if any(item_data.values()):
                         st.markdown(f"### 🛒 Product Analysis: {item_id}")
                         
@@ -0,0 +1,267 @@
+import argparse
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, List
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from core import MODEL_FILES, MODEL_FEATURES, prepare_features
+from core import load_model as load_stage_model
+
+# Database configuration
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "abhi1234",
+    "database": "food_demand_db"
+}
+
+DEFAULT_CHUNKSIZE = 50_000
+CHUNKS_IN_FLIGHT_PER_WORKER = 2  # Read-ahead bound on chunks held in memory
+MAX_ONLINE_ROWS = 1_000  # Largest micro-batch accepted by the HTTP endpoint
+
+# A table name, optionally qualified by its database
+_TABLE_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*(?:\.[A-Za-z_][A-Za-z0-9_$]*)?")
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+def get_engine():
+    return create_engine(
+        f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}"
+        f"@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}"
+    )
+
+
+@lru_cache(maxsize=None)
+def load_model(stage: str, compact: bool = True):
+    """Load a trained model once per process"""
+    return load_stage_model(stage, prefer_compact=compact)
+
+
+def score_frame(stage: str, df: pd.DataFrame, compact: bool = True) -> pd.Series:
+    """Score a frame of input rows with the model for a stage
+
+    The compact production forest has the lowest latency for small
+    batches; large batch chunks are faster through sklearn itself.
+    """
+    features = prepare_features(stage, df)
+    predictions = load_model(stage, compact).predict(features)
+    return pd.Series(predictions, index=df.index, name='score')
+
+
+def _score_chunk(args):
+    """Worker entry point: score one chunk and return ids with scores"""
+    stage, id_column, chunk = args
+    scores = score_frame(stage, chunk, compact=False)
+    return pd.DataFrame({'row_id': chunk[id_column].astype(str).values,
+                         'score': scores.values})
+
+
+def _iter_source(source: str, chunksize: int, table: bool) -> Iterator[pd.DataFrame]:
+    if table:
+        if not _TABLE_NAME.fullmatch(source):
+            raise ValueError(f"Invalid table name {source!r}")
+        quoted = '.'.join(f"`{part}`" for part in source.split('.'))
+        query = text(f"SELECT * FROM {quoted}")
+        yield from pd.read_sql(query, get_engine(), chunksize=chunksize)
+    elif source.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+
+
+def read_chunks(source: str, id_column: str, chunksize: int,
+                table: bool = False) -> Iterator[pd.DataFrame]:
+    """Yield input rows from a CSV/Parquet file or a database table in chunks
+
+    Rows without an id column are identified by their position in the input.
+    """
+    offset = 0
+    for chunk in _iter_source(source, chunksize, table):
+        if id_column not in chunk.columns:
+            chunk[id_column] = range(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+class PredictionWriter:
+    """Bulk writer for scores, either to a file or the predictions table"""
+
+    def __init__(self, stage: str, output: str = None):
+        self.stage = stage
+        self.output = output
+        self._parquet_writer = None
+        self._wrote_header = False
+        self.engine = None
+        if output is None:
+            self.engine = get_engine()
+            self._ensure_table()
+
+    def _ensure_table(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                model VARCHAR(20) NOT NULL,
+                row_id VARCHAR(64) NOT NULL,
+                score DOUBLE NOT NULL,
+                scored_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (model, row_id)
+            )
+            """))
+
+    def write(self, scored: pd.DataFrame):
+        if self.output is None:
+            self._write_db(scored)
+        elif self.output.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            scored.to_csv(self.output, mode='a' if self._wrote_header else 'w',
+                          header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def _write_db(self, scored: pd.DataFrame):
+        """Upsert a chunk of scores in one multi-row statement"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                INSERT INTO predictions (model, row_id, score, scored_at)
+                VALUES (:model, :row_id, :score, NOW())
+                ON DUPLICATE KEY UPDATE score = VALUES(score),
+                                        scored_at = VALUES(scored_at)
+                """),
+                [{'model': self.stage, 'row_id': row_id, 'score': float(score)}
+                 for row_id, score in zip(scored['row_id'], scored['score'])]
+            )
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def _write_scored(writer: PredictionWriter, scored: pd.DataFrame, total_rows: int,
+                  start: float) -> int:
+    writer.write(scored)
+    total_rows += len(scored)
+    elapsed = time.perf_counter() - start
+    logging.info(f"Scored {total_rows} rows ({total_rows / elapsed:,.0f} rows/sec)")
+    return total_rows
+
+
+def run_batch(stage: str, source: str, id_column: str = 'id', output: str = None,
+              table: bool = False, chunksize: int = DEFAULT_CHUNKSIZE,
+              workers: int = None) -> Dict:
+    """Score every input row in chunks across worker processes"""
+    workers = workers or os.cpu_count() or 1
+    writer = PredictionWriter(stage, output)
+    total_rows = 0
+    start = time.perf_counter()
+
+    chunks = ((stage, id_column, chunk)
+              for chunk in read_chunks(source, id_column, chunksize, table))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a bounded window of chunks in flight: pool.map would read the
+            # whole source ahead of the workers. Results are written in input order.
+            pending = deque()
+            for args in chunks:
+                pending.append(pool.submit(_score_chunk, args))
+                if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                    total_rows = _write_scored(writer, pending.popleft().result(), total_rows, start)
+            while pending:
+                total_rows = _write_scored(writer, pending.popleft().result(), total_rows, start)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'model': stage,
+        'rows': total_rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(total_rows / elapsed, 1) if elapsed else 0.0
+    }
+    logging.info(f"Batch scoring finished: {stats}")
+    return stats
+
+
+def create_app():
+    """FastAPI app that scores micro-batches of rows for online use"""
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+
+    class ScoreRequest(BaseModel):
+        rows: List[Dict]
+
+    api = FastAPI()
+
+    @api.post("/score/{stage}")
+    def score_rows(stage: str, request: ScoreRequest):
+        if stage not in MODEL_FEATURES:
+            raise HTTPException(status_code=404, detail=f"Unknown model {stage}")
+        if not request.rows:
+            return {"scores": [], "rows_per_sec": 0.0}
+        if len(request.rows) > MAX_ONLINE_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {MAX_ONLINE_ROWS} rows per request"
+            )
+        start = time.perf_counter()
+        try:
+            scores = score_frame(stage, pd.DataFrame(request.rows))
+        except KeyError as e:
+            raise HTTPException(status_code=422, detail=f"Missing feature {e}")
+        elapsed = time.perf_counter() - start
+        return {
+            "scores": scores.tolist(),
+            "rows_per_sec": round(len(scores) / elapsed, 1) if elapsed else 0.0
+        }
+
+    return api
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch scoring for the waste models")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    score = subparsers.add_parser('score', help="Score rows from a file or table")
+    score.add_argument('model', choices=sorted(MODEL_FILES))
+    score.add_argument('source', help="CSV/Parquet path, or table name with --table")
+    score.add_argument('--table', action='store_true',
+                       help="Read input rows from a database table")
+    score.add_argument('--id-column', default='id')
+    score.add_argument('--output',
+                       help="CSV/Parquet output path (default: predictions table)")
+    score.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    score.add_argument('--workers', type=int, default=None)
+
+    serve = subparsers.add_parser('serve', help="Run the online scoring endpoint")
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=8001)
+
+    args = parser.parse_args()
+    if args.command == 'score':
+        run_batch(args.model, args.source, args.id_column, args.output,
+                  args.table, args.chunksize, args.workers)
+    else:
+        import uvicorn
+        uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
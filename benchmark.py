@@ -0,0 +1,476 @@
+"""End-to-end benchmark suite on a local SQLite stand-in for MySQL
+
+Each scale builds a database from synthetic_data (sales, weather, inventory),
+the charities in data.sql (replicated and verified) and NumPy-generated
+production/retail/consumption tables, trains fresh models on it, then times
+the analysis, API, redistribution and WasteAnalyzer stages. Stages whose
+dependencies are missing (e.g. Prophet) are recorded as skipped. Results are written as JSON and compared against a
+stored baseline; slower medians beyond the threshold are flagged.
+
+    python benchmark.py --scales small medium
+    python benchmark.py --save-baseline
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event
+
+import synthetic_data
+from sql_loader import iter_dump
+
+DEFAULT_OUTPUT = 'benchmark_results.json'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+REGRESSION_THRESHOLD = 0.25  # Flag medians more than 25% slower than the baseline
+NOISE_FLOOR_S = 0.005  # Ignore differences below this; timer and scheduler noise
+
+SCALES = {
+    'small': {'items': 100, 'sales': 20_000, 'charities': 50, 'waste_rows': 10_000,
+              'surplus_share': 0.3, 'api_requests': 200},
+    'medium': {'items': 1_000, 'sales': 200_000, 'charities': 200, 'waste_rows': 100_000,
+               'surplus_share': 0.3, 'api_requests': 1_000},
+    'large': {'items': 5_000, 'sales': 2_000_000, 'charities': 1_000, 'waste_rows': 1_000_000,
+              'surplus_share': 0.3, 'api_requests': 5_000}
+}
+MUMBAI_LAT, MUMBAI_LON = (18.9, 19.3), (72.8, 73.0)
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that cannot run in this environment"""
+
+
+def sqlite_engine(path: str):
+    """SQLite engine with the MySQL date functions the modules use"""
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def register_functions(dbapi_connection, _):
+        dbapi_connection.create_function('CURDATE', 0, lambda: date.today().isoformat())
+        dbapi_connection.create_function(
+            'NOW', 0, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    return engine
+
+
+def _charities(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """The data.sql charities, replicated to `n` with jittered locations"""
+    with open('data.sql', encoding='utf-8') as source:
+        base = next(frame for kind, schema, *frame in
+                    (e if e[0] == 'rows' else (*e, None) for e in iter_dump(source))
+                    if kind == 'rows' and schema.name == 'charities')[0]
+    charities = base.iloc[np.arange(n) % len(base)].reset_index(drop=True)
+    charities['charity_id'] = np.arange(1, n + 1)
+    charities['latitude'] = rng.uniform(*MUMBAI_LAT, n)
+    charities['longitude'] = rng.uniform(*MUMBAI_LON, n)
+    charities['verification_status'] = 'verified'
+    charities['last_updated'] = charities['last_updated'].astype(str)
+    return charities
+
+
+def _waste_tables(n: int, rng: np.random.Generator) -> Dict[str, pd.DataFrame]:
+    """Production, retail and consumption rows shaped like mldb.py's"""
+    days = (np.datetime64('2024-01-01') + rng.integers(0, 365, (3, n)).astype('timedelta64[D]')
+            ).astype(str)
+    crop_yield = rng.uniform(500, 2000, n).round(2)
+    stock = rng.integers(100, 501, n)
+    sales = np.minimum(rng.integers(80, 481, n), stock - 20)
+    discounts = rng.integers(0, 11, n)
+    portion = rng.integers(1, 7, n)
+    return {
+        'production_data': pd.DataFrame({
+            'id': np.arange(1, n + 1), 'date': days[0],
+            'crop_type': rng.choice(['Tomatoes', 'Potatoes', 'Carrots', 'Onions', 'Cabbage'], n),
+            'yield': crop_yield, 'storage_days': rng.integers(1, 15, n),
+            'temperature': rng.uniform(2.0, 8.0, n).round(1),
+            'waste': (crop_yield * rng.uniform(0.05, 0.15, n)).round(2)
+        }),
+        'retail_data': pd.DataFrame({
+            'id': np.arange(1, n + 1),
+            'store_id': np.char.add('ST', rng.integers(100, 160, n).astype(str)),
+            'product': rng.choice(['Milk', 'Bread', 'Eggs', 'Cheese', 'Yogurt'], n),
+            'stock_level': stock, 'sales': sales, 'discounts': discounts,
+            'waste': (stock - sales - discounts).astype(float),
+            'record_date': days[1]
+        }),
+        'consumption_data': pd.DataFrame({
+            'id': np.arange(1, n + 1),
+            'household_id': np.char.add('H', rng.integers(1000, 2000, n).astype(str)),
+            'meal_type': rng.choice(['Breakfast', 'Lunch', 'Dinner', 'Snack'], n),
+            'portion_size': portion,
+            'leftovers': (rng.uniform(0, 1, n) * portion * 0.3).round(1),
+            'storage_method': rng.choice(['Refrigerated', 'Frozen', 'Pantry', 'Counter'], n),
+            'record_date': days[2]
+        })
+    }
+
+
+def build_database(path: str, scale: Dict, seed: int = 0):
+    """Create the stand-in database for one scale; returns its engine"""
+    scenario = synthetic_data.Scenario(n_items=scale['items'], n_sales=scale['sales'], seed=seed)
+    synthetic_data.generate(scenario, 'sqlite', path, workers=1)
+    engine = sqlite_engine(path)
+    rng = np.random.default_rng([seed, 49])
+
+    charities = _charities(scale['charities'], rng)
+    categories = sorted({c for cats in charities['accepted_categories'] for c in json.loads(cats)})
+    stores = pd.DataFrame({
+        'store_id': scenario.location_ids,
+        'latitude': rng.uniform(*MUMBAI_LAT, scenario.n_locations),
+        'longitude': rng.uniform(*MUMBAI_LON, scenario.n_locations)
+    })
+    inventory = pd.read_sql('SELECT * FROM inventory', engine)
+    inventory['current_stock'] += rng.integers(50, 500, len(inventory))
+    inventory['category'] = rng.choice(categories, len(inventory))
+    inventory['location_id'] = rng.choice(stores['store_id'], len(inventory))
+
+    # A share of items is marked surplus, with stock above its requirement
+    surplus = rng.random(len(inventory)) < scale['surplus_share']
+    status = pd.DataFrame({
+        'item_id': inventory['item_id'],
+        'days': 7,
+        'buffer_stock': 0.2,
+        'daily_avg': inventory['current_stock'] * np.where(surplus, rng.uniform(0.01, 0.08, len(inventory)),
+                                                           rng.uniform(0.2, 0.5, len(inventory))) / 7,
+        'status': np.where(surplus, 'Surplus', 'Adequate')
+    })
+
+    tables = {'inventory': inventory, 'Stores': stores, 'InventoryStatus': status,
+              'Charities': charities, **_waste_tables(scale['waste_rows'], rng)}
+    for name, frame in tables.items():
+        frame.to_sql(name, engine, if_exists='replace', index=False)
+    # Scheduling tables come from the same migration a deployment runs
+    from redistribution import RedistributionSystem
+    RedistributionSystem(engine=engine).migrate_schedule_schema()
+    return engine
+
+
+def train_models(engine):
+    """Fit and save the three models in the working directory from the stand-in data"""
+    import train
+    from core import MODEL_FEATURES
+
+    production = pd.read_sql('SELECT * FROM production_data', engine)
+    production['waste_percentage'] = production['waste'] / production['yield']
+    retail = pd.read_sql('SELECT * FROM retail_data', engine)
+    retail['waste_ratio'] = retail['waste'] / retail['stock_level']
+    consumption = pd.read_sql('SELECT * FROM consumption_data', engine)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        production_model = train.train_production_model(production)
+        train.save_models(production_model, train.train_retail_model(retail),
+                          train.train_consumption_model(
+                              consumption[MODEL_FEATURES['consumption']]))
+        train.export_compact_model(production_model)
+
+
+def _time(func: Callable, repeat: int) -> Dict:
+    timings, extra = [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = func() or {}
+        timings.append(time.perf_counter() - start)
+    return {'status': 'ok', 'median_s': round(float(np.median(timings)), 6),
+            'min_s': round(min(timings), 6), 'runs': repeat, **extra}
+
+
+class Suite:
+    """Stages for one scale, sharing the database and intermediate results"""
+
+    def __init__(self, engine, scale: Dict, repeat: int):
+        self.engine = engine
+        self.scale = scale
+        self.repeat = repeat
+        self.state = {}
+
+    def _analysis(self):
+        try:
+            import analysis
+        except ImportError as e:
+            raise StageSkipped(f"analysis.py needs {e.name}")
+        analysis.engine = self.engine
+        return analysis
+
+    def _redistribution(self):
+        if 'system' not in self.state:
+            from redistribution import RedistributionSystem
+            self.state['system'] = RedistributionSystem(engine=self.engine)
+        return self.state['system']
+
+    def stages(self) -> List[tuple]:
+        """(name, function, repeats) in run order"""
+        once = 1
+        return [
+            ('analysis.fetch_sales_data', self.fetch_sales_data, self.repeat),
+            ('analysis.analyze_and_forecast', self.analyze_and_forecast, once),
+            ('analysis.calculate_inventory_status', self.calculate_inventory_status, self.repeat),
+            ('analysis.generate_recommendations', self.generate_recommendations, self.repeat),
+            ('api.run_analysis', self.api_run_analysis, once),
+            ('api.concurrent_reads', self.api_concurrent_reads, self.repeat),
+            ('redistribution.get_surplus_items', self.get_surplus_items, self.repeat),
+            ('redistribution.get_charities', self.get_charities, self.repeat),
+            ('redistribution.match_surplus_batch', self.match_surplus_batch, self.repeat),
+            ('redistribution.plan_pickups', self.plan_pickups, self.repeat),
+            ('redistribution.full_pipeline', self.full_pipeline, once),
+            ('core.predict_production_waste', self.predict_production_waste, self.repeat),
+            ('core.detect_retail_anomalies', self.detect_retail_anomalies, self.repeat),
+            ('core.analyze_consumption_patterns', self.analyze_consumption_patterns, self.repeat)
+        ]
+
+    def run(self) -> Dict[str, Dict]:
+        results = {}
+        for name, func, repeat in self.stages():
+            try:
+                results[name] = _time(func, repeat)
+                logging.info(f"{name}: {results[name]['median_s'] * 1e3:.1f} ms")
+            except StageSkipped as e:
+                results[name] = {'status': 'skipped', 'reason': str(e)}
+                logging.info(f"{name}: skipped ({e})")
+            except Exception as e:
+                # A broken stage is a result too; keep timing the others
+                results[name] = {'status': 'error', 'reason': f"{type(e).__name__}: {e}"}
+                logging.error(f"{name}: failed ({results[name]['reason']})")
+        return results
+
+    # Analysis and inventory status
+    def fetch_sales_data(self):
+        sales = self._analysis().fetch_sales_data()
+        self.state['sales'] = sales
+        return {'rows': len(sales)}
+
+    def analyze_and_forecast(self):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            forecast = self._analysis().analyze_and_forecast()
+        if forecast is None:
+            raise StageSkipped("no item had enough history to forecast")
+        self.state['forecast'] = forecast
+        return {'items': int(forecast['item_id'].nunique())}
+
+    def _forecast(self):
+        if 'forecast' not in self.state:
+            raise StageSkipped("needs analysis.analyze_and_forecast")
+        return self.state['forecast']
+
+    def calculate_inventory_status(self):
+        analysis = self._analysis()
+        forecast = self._forecast()
+        status = analysis.calculate_inventory_status(forecast, analysis.fetch_inventory_data())
+        self.state['status'] = status
+        return {'rows': len(status)}
+
+    def generate_recommendations(self):
+        if 'status' not in self.state:
+            raise StageSkipped("needs analysis.calculate_inventory_status")
+        return {'rows': len(self._analysis().generate_recommendations(self.state['status']))}
+
+    # API under concurrent load
+    def _client(self):
+        self._analysis()
+        import httpx
+        from api import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench')
+
+    def api_run_analysis(self):
+        async def call():
+            async with self._client() as client:
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    response = await client.post('/run-analysis')
+            response.raise_for_status()
+        asyncio.run(call())
+        self.state['api_ready'] = True
+
+    def api_concurrent_reads(self, concurrency: int = 32):
+        if not self.state.get('api_ready'):
+            raise StageSkipped("needs api.run_analysis")
+        item_ids = self._forecast()['item_id'].unique()
+        paths = ['/forecast', '/inventory-status', '/recommendations'] + \
+                [f"/item-details/{item_id}" for item_id in item_ids[:50]]
+        n = self.scale['api_requests']
+
+        async def call():
+            latencies = []
+            slots = asyncio.Semaphore(concurrency)
+            async with self._client() as client:
+                async def one(path):
+                    async with slots:
+                        start = time.perf_counter()
+                        (await client.get(path)).raise_for_status()
+                        latencies.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                await asyncio.gather(*(one(paths[i % len(paths)]) for i in range(n)))
+                return latencies, time.perf_counter() - start
+
+        latencies, elapsed = asyncio.run(call())
+        latencies = np.array(latencies) * 1e3
+        return {'requests': n, 'concurrency': concurrency,
+                'requests_per_s': round(n / elapsed, 1),
+                'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+                'p95_ms': round(float(np.percentile(latencies, 95)), 2)}
+
+    # Redistribution
+    def get_surplus_items(self):
+        surplus = self._redistribution().get_surplus_items()
+        if surplus.empty:
+            raise StageSkipped("no surplus rows returned")
+        self.state['surplus'] = surplus
+        return {'rows': len(surplus)}
+
+    def get_charities(self):
+        state = self._redistribution().charity_state
+        state.reconcile()
+        return {'rows': len(state)}
+
+    def match_surplus_batch(self):
+        if 'surplus' not in self.state:
+            raise StageSkipped("needs redistribution.get_surplus_items")
+        system = self._redistribution()
+        system.charity_state.refresh_if_stale()
+        allocations = system.match_surplus_batch(self.state['surplus'])
+        self.state['allocations'] = allocations
+        return {'allocations': len(allocations)}
+
+    def plan_pickups(self):
+        if not self.state.get('allocations'):
+            raise StageSkipped("needs allocations from redistribution.match_surplus_batch")
+        planned = self._redistribution().plan_pickups(self.state['allocations'])
+        return {'stops': len(planned),
+                'scheduled': sum(p['scheduled_pickup'] is not None for p in planned)}
+
+    def full_pipeline(self):
+        result = self._redistribution().full_redistribution_pipeline()
+        return {'allocations': 0 if result is None else len(result)}
+
+    # WasteAnalyzer predictions
+    def _analyzer(self):
+        if 'analyzer' not in self.state:
+            from core import WasteAnalyzer
+            self.state['analyzer'] = WasteAnalyzer(engine=self.engine)
+        return self.state['analyzer']
+
+    def predict_production_waste(self):
+        return {'rows': len(self._analyzer().predict_production_waste())}
+
+    def detect_retail_anomalies(self):
+        return {'rows': len(self._analyzer().detect_retail_anomalies())}
+
+    def analyze_consumption_patterns(self):
+        return {'rows': len(self._analyzer().analyze_consumption_patterns())}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+def run_suite(scales: List[str], repeat: int = 3, seed: int = 0) -> Dict:
+    """Build each scale's database in a scratch directory and time every stage"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    report = {'environment': environment(), 'seed': seed, 'repeat': repeat, 'results': {}}
+    for name in scales:
+        scale = SCALES[name]
+        with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp):
+            # Modules read data.sql and write models/CSVs relative to the working directory
+            os.symlink(os.path.join(repo, 'data.sql'), 'data.sql')
+            start = time.perf_counter()
+            engine = build_database(os.path.join(tmp, 'bench.db'), scale, seed)
+            train_models(engine)
+            logging.info(f"[{name}] database and models ready in {time.perf_counter() - start:.1f}s")
+            report['results'][name] = Suite(engine, scale, repeat).run()
+            engine.dispose()
+    return report
+
+
+def compare(report: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> pd.DataFrame:
+    """Per-stage median against the baseline, with regressions flagged"""
+    rows = []
+    for scale, stages in report['results'].items():
+        for stage, result in stages.items():
+            before = baseline.get('results', {}).get(scale, {}).get(stage, {})
+            if before.get('status') != 'ok':
+                continue
+            if result.get('status') == 'error':
+                # Worked in the baseline, fails now
+                rows.append({'scale': scale, 'stage': stage,
+                             'baseline_ms': round(before['median_s'] * 1e3, 2),
+                             'current_ms': None, 'ratio': None, 'regression': True})
+                continue
+            if result.get('status') != 'ok':
+                continue
+            ratio = result['median_s'] / before['median_s'] if before['median_s'] else np.inf
+            rows.append({
+                'scale': scale, 'stage': stage,
+                'baseline_ms': round(before['median_s'] * 1e3, 2),
+                'current_ms': round(result['median_s'] * 1e3, 2),
+                'ratio': round(ratio, 3),
+                'regression': bool(ratio > 1 + threshold
+                                   and result['median_s'] - before['median_s'] > NOISE_FLOOR_S)
+            })
+    return pd.DataFrame(rows, columns=['scale', 'stage', 'baseline_ms', 'current_ms',
+                                       'ratio', 'regression'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on SQLite")
+    parser.add_argument('--scales', nargs='+', choices=sorted(SCALES), default=['small'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with status 1 when a stage regressed")
+    args = parser.parse_args()
+
+    report = run_suite(args.scales, args.repeat, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Baseline stored in {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        logging.info(f"No baseline at {args.baseline}; run with --save-baseline to store one")
+        return
+    with open(args.baseline) as f:
+        comparison = compare(report, json.load(f), args.threshold)
+    print(comparison.to_string(index=False))
+    regressions = comparison[comparison['regression']]
+    if not regressions.empty:
+        logging.warning(f"{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+        if args.fail_on_regression:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
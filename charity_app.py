@@ -1,21 +1,9 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, text
-import json
-from datetime import datetime
 import pydeck as pdk
 import numpy as np
-
-MYSQL_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "abhi1234",
-    "database": "food_demand_db"
-}
-
-engine = create_engine(
-    f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}"
-)
+import streamlit_cache as cache
+from operating_hours import is_open
 
 st.markdown("""
 <style>
@@ -47,24 +35,7 @@ def get_geolocation():
         st.session_state.location = (19.0760, 72.8777)
 
 def is_charity_open(operating_hours_str):
-    try:
-        hours = json.loads(operating_hours_str)
-        now = datetime.now().time()
-        current_day = datetime.now().weekday()
-        
-        time_slots = []
-        if 'daily' in hours: time_slots.extend(hours['daily'].split(','))
-        if current_day <5 and 'weekdays' in hours: time_slots.extend(hours['weekdays'].split(','))
-        if current_day >=5 and 'weekends' in hours: time_slots.extend(hours['weekends'].split(','))
-
-        for slot in time_slots:
-            start_str, end_str = slot.strip().split('-')
-            start = datetime.strptime(start_str.strip(), "%H:%M").time()
-            end = datetime.strptime(end_str.strip(), "%H:%M").time()
-            if start <= now <= end: return True
-        return False
-    except:
-        return False
+    return is_open(operating_hours_str)
 
 def main_app():
     user_lat, user_lon = st.session_state.location
@@ -88,34 +59,13 @@ def main_app():
             max_distance = st.slider("Max Distance (km)", 1, 50, 15)
             show_open = st.checkbox("Show only open now", True)
 
-    with engine.connect() as conn:
-        charities = pd.read_sql(
-            text("""
-            SELECT *, 
-                (6371 * acos(cos(radians(:lat)) * cos(radians(latitude)) 
-                * cos(radians(longitude) - radians(:lon)) 
-                + sin(radians(:lat)) * sin(radians(latitude)))) 
-                AS distance_km 
-            FROM Charities
-            WHERE verification_status = 'verified'
-            AND JSON_CONTAINS(accepted_categories, :food_type)
-            HAVING distance_km <= :max_dist
-            AND capacity_kg >= :quantity
-            """),
-            conn,
-            params={
-                'lat': user_lat,
-                'lon': user_lon,
-                'food_type': json.dumps([food_type_mapping[selected_type]]),
-                'max_dist': max_distance,
-                'quantity': quantity
-            }
-        )
+    # Radius search on the in-memory charity index
+    charities = cache.find_nearby_charities(
+        user_lat, user_lon, food_type_mapping[selected_type], max_distance, quantity
+    )
 
     if not charities.empty:
-        charities['status'] = charities['operating_hours'].apply(
-            lambda x: "Open" if is_charity_open(x) else "Closed"
-        )
+        charities['status'] = np.where(charities['open_now'], "Open", "Closed")
         charities['capacity_pct'] = (charities['capacity_kg'] / charities['capacity_kg'].max() * 100).round(2)
         
         if show_open: charities = charities[charities['status'] == "Open"]
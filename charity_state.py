@@ -0,0 +1,129 @@
+import logging
+import time
+from datetime import date, datetime
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from operating_hours import OperatingHoursIndex
+
+DEFAULT_RECONCILE_S = 300  # Re-read charities and reservations every 5 minutes
+
+
+class CharityState:
+    """Cached, columnar charity table with an in-memory capacity ledger
+
+    Coordinates, parsed categories and interval-encoded opening hours are
+    built once per load. `available` starts as the database's remaining
+    capacity for today and is decremented locally as allocations are
+    scheduled, so repeated matching never has to query MySQL. The table is
+    reloaded from `loader` every `reconcile_interval` seconds, on the first
+    use after midnight (reservations are per day), or when marked stale.
+    With `auto_refresh=False` reads never call the loader; the owner checks
+    is_stale() and calls load() itself, e.g. from an async database.
+    """
+
+    def __init__(self, loader: Callable[[], pd.DataFrame],
+                 reconcile_interval: float = DEFAULT_RECONCILE_S,
+                 auto_refresh: bool = True):
+        self.loader = loader
+        self.reconcile_interval = reconcile_interval
+        self.auto_refresh = auto_refresh
+        self.charities = pd.DataFrame()
+        self.hours = OperatingHoursIndex([])
+        self.available = np.empty(0)
+        self._rows = {}
+        self._loaded_at = None
+        self._loaded_on = None
+        self._stale = True
+
+    def __len__(self):
+        return len(self.charities)
+
+    def reconcile(self):
+        """Reload charities and today's reservations from the database
+
+        If the loader fails, the previous state is kept and stays stale, so
+        the next use retries; with nothing loaded yet the error is raised.
+        """
+        try:
+            charities = self.loader()
+        except Exception as e:
+            if self._loaded_at is None:
+                raise
+            logging.error(f"Charity reload failed, keeping the previous state: {str(e)}")
+            self._stale = True
+            return
+        self.load(charities)
+
+    def load(self, charities: pd.DataFrame):
+        """Replace the state with freshly read charity rows"""
+        if charities is None:
+            charities = pd.DataFrame()
+        charities = charities.reset_index(drop=True)
+        self.charities = charities
+        self.hours = OperatingHoursIndex(
+            charities['operating_hours'] if 'operating_hours' in charities else []
+        )
+        self.available = (charities['available_capacity'].to_numpy(dtype=float).copy()
+                          if 'available_capacity' in charities else np.empty(0))
+        self.lat = charities['latitude'].to_numpy(dtype=float) if len(charities) else np.empty(0)
+        self.lon = charities['longitude'].to_numpy(dtype=float) if len(charities) else np.empty(0)
+        self.categories = ([set(c) for c in charities['accepted_categories']]
+                           if len(charities) else [])
+        self._rows = ({charity_id: row for row, charity_id in enumerate(charities['charity_id'])}
+                      if len(charities) else {})
+        self._loaded_at = time.monotonic()
+        self._loaded_on = date.today()
+        self._stale = False
+        logging.info(f"Charity state reconciled: {len(charities)} charities")
+
+    def mark_stale(self):
+        """Force a reload on next use, e.g. after a concurrent writer won a race"""
+        self._stale = True
+
+    def is_stale(self) -> bool:
+        return (self._stale
+                or self._loaded_on != date.today()
+                or time.monotonic() - self._loaded_at > self.reconcile_interval)
+
+    def refresh_if_stale(self) -> 'CharityState':
+        if self.is_stale():
+            self.reconcile()
+        return self
+
+    def frame(self) -> pd.DataFrame:
+        """Charity rows with available_capacity taken from the ledger
+
+        Row order matches `hours`, so the two can be used together.
+        """
+        if self.auto_refresh:
+            self.refresh_if_stale()
+        if self.charities.empty:
+            return self.charities
+        frame = self.charities.copy(deep=False)
+        frame['available_capacity'] = self.available
+        return frame
+
+    def rows(self, charity_ids: Iterable) -> np.ndarray:
+        """Row positions of charity ids (-1 when unknown)"""
+        return np.array([self._rows.get(charity_id, -1) for charity_id in charity_ids],
+                        dtype=np.intp)
+
+    def reserve(self, charity_ids: Iterable, kg: Iterable[float],
+                pickups: Optional[Iterable[Optional[Union[date, datetime]]]] = None):
+        """Apply changes in booked kg to the ledger
+
+        `kg` is the net change per row (negative for capacity given back by
+        replaced rows). Only pickups falling today count against today's
+        capacity; rows for unknown charities are ignored.
+        """
+        rows = self.rows(charity_ids)
+        kg = np.asarray(list(kg), dtype=float)
+        keep = rows >= 0
+        if pickups is not None:
+            today = date.today()
+            days = [pickup.date() if isinstance(pickup, datetime) else pickup for pickup in pickups]
+            keep &= np.array([day is None or day == today for day in days], dtype=bool)
+        np.subtract.at(self.available, rows[keep], kg[keep])
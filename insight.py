@@ -1,17 +1,22 @@
+import io
+import os
+
 import streamlit as st
-import google.generativeai as genai
 
-# Configure Gemini API
-genai.configure(api_key="API KEY")
+from llm_cache import GeminiClient, ResponseCache, StubClient
+from waste_extraction import stream_waste_by_category, waste_by_category
 
-# Initialize the Gemini model
-model = genai.GenerativeModel('gemini-pro')
 
-# Function to generate insights and solutions using Gemini
-def analyze_food_waste(data):
-    try:
-        # Generate insights and solutions using Gemini
-        prompt = f"""
+# One response cache per server process, shared by every session.
+# Set INSIGHT_LLM=stub to run without calling Gemini.
+@st.cache_resource
+def get_response_cache():
+    if os.environ.get('INSIGHT_LLM') == 'stub':
+        return ResponseCache(StubClient())
+    return ResponseCache(GeminiClient('gemini-pro'))
+
+def build_prompt(data):
+    return f"""
         You are a sustainability expert. Analyze the following food waste data and provide insights and solutions:
         
         Food Waste Data:
@@ -25,19 +30,29 @@ def analyze_food_waste(data):
         - Provide actionable recommendations to reduce waste.
         - Suggest ways to improve sustainability.
         """
-        response = model.generate_content(prompt)
-        return response.text.strip()
+
+# Function to generate insights and solutions using Gemini
+def analyze_food_waste(data):
+    try:
+        # Identical or near-identical submissions are answered from the cache
+        return get_response_cache().get(build_prompt(data))
     except Exception as e:
         return f"Error: {e}"
 
 # Function to extract the quantity of food waste from the input data
 def extract_waste_quantity(data):
-    # Example: Extract numbers followed by "kg" or "kgs"
-    import re
-    match = re.search(r"(\d+)\s*(kg|kgs)", data, re.IGNORECASE)
-    if match:
-        return int(match.group(1))
-    return 0  # Default to 0 if no quantity is found
+    # Every quantity/unit pair (g, kg, tonnes, lbs...), summed in kg
+    return float(waste_by_category(data).sum())
+
+# Function to pick the alert for a total waste quantity in kg
+def waste_alert(waste_quantity):
+    if waste_quantity == 0:
+        return "No food waste detected. Great job!", "info"
+    elif 0 < waste_quantity <= 10:
+        return "Food waste is within normal limits.", "info"
+    elif 10 < waste_quantity <= 50:
+        return "Medium food waste detected. Consider reducing waste.", "warning"
+    return "High food waste detected! Take immediate action.", "error"
 
 # Function to display alerts in the bottom-right corner
 def display_alerts(alert_message, alert_type="info"):
@@ -91,30 +106,38 @@ def main():
     st.header("Enter Business Data")
     business_name = st.text_input("Business Name")
     food_waste_data = st.text_area("Enter Food Waste Data (e.g., types of waste, quantities, etc.)")
+    waste_log = st.file_uploader("Or upload a food waste log", type=["txt", "log", "csv"])
 
     if st.button("Analyze Food Waste"):
-        if business_name and food_waste_data:
-            with st.spinner("Analyzing food waste data..."):
-                # Extract waste quantity from the input data
-                waste_quantity = extract_waste_quantity(food_waste_data)
+        if business_name and (food_waste_data or waste_log):
+            # Quantities are parsed locally, so the alert never waits on the model
+            if waste_log is not None:
+                by_category = stream_waste_by_category(
+                    io.TextIOWrapper(waste_log, encoding='utf-8', errors='replace')
+                )
+            else:
+                by_category = waste_by_category(food_waste_data)
+            waste_quantity = float(by_category.sum())
+            display_alerts(*waste_alert(waste_quantity))
+
+            st.header("Waste by Category")
+            st.metric("Total Food Waste", f"{waste_quantity:,.2f} kg")
+            if not by_category.empty:
+                st.bar_chart(by_category.rename('kg'))
 
+            if not food_waste_data:
+                # Large logs go to the model as their per-category summary
+                food_waste_data = "\n".join(
+                    f"{category}: {kg:.2f} kg" for category, kg in by_category.items()
+                )
+            with st.spinner("Analyzing food waste data..."):
                 # Generate insights and solutions
                 result = analyze_food_waste(food_waste_data)
                 st.success("Analysis Complete!")
-                
+
                 # Display results
                 st.header("Insights and Solutions")
                 st.write(result)
-
-                # Display alerts based on waste quantity
-                if waste_quantity == 0:
-                    display_alerts("No food waste detected. Great job!", "info")
-                elif 0 < waste_quantity <= 10:
-                    display_alerts("Food waste is within normal limits.", "info")
-                elif 10 < waste_quantity <= 50:
-                    display_alerts("Medium food waste detected. Consider reducing waste.", "warning")
-                else:
-                    display_alerts("High food waste detected! Take immediate action.", "error")
         else:
             st.warning("Please enter both business name and food waste data.")
 
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from llm_cache import GeminiClient, ResponseCache, StubClient
+
+# Database configuration
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "abhi1234",
+    "database": "food_demand_db"
+}
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RATE = 10.0  # Upstream requests per second across all workers
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_FLUSH_EVERY = 200  # Results buffered before each bulk write
+BASE_BACKOFF_S = 0.5
+MAX_BACKOFF_S = 30.0
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+def get_engine():
+    return create_engine(
+        f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}"
+        f"@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}"
+    )
+
+
+def build_prompt(data: str) -> str:
+    from insight import build_prompt as insight_prompt
+    return insight_prompt(data)
+
+
+def make_backend(name: str, delay: float = 0.0, failure_rate: float = 0.0,
+                 cache: bool = False):
+    """Model client by name ('gemini' or 'stub'), optionally behind the response cache"""
+    if name == 'stub':
+        client = StubClient(delay=delay, failure_rate=failure_rate)
+    elif name == 'gemini':
+        client = GeminiClient('gemini-pro')
+    else:
+        raise ValueError(f"Unknown backend {name}")
+    return ResponseCache(client) if cache else client
+
+
+class RateLimiter:
+    """Async token bucket: at most `rate` acquisitions per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def read_businesses(source: str, id_column: str = 'business_id',
+                    text_column: str = 'waste_data', table: bool = False) -> pd.DataFrame:
+    """Business records from a CSV/JSONL/Parquet file or a database table"""
+    if table:
+        with get_engine().connect() as conn:
+            df = pd.read_sql(text(f"SELECT * FROM {source}"), conn)
+    elif source.endswith('.parquet'):
+        df = pd.read_parquet(source)
+    elif source.endswith('.jsonl'):
+        df = pd.read_json(source, lines=True)
+    else:
+        df = pd.read_csv(source)
+    missing = {id_column, text_column} - set(df.columns)
+    if missing:
+        raise KeyError(f"Input is missing columns {sorted(missing)}")
+    df = df.rename(columns={id_column: 'business_id', text_column: 'waste_data'})
+    df['business_id'] = df['business_id'].astype(str)
+    return df
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, Dict]:
+    """Results already written by earlier runs, keyed by business_id"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from an interrupted run
+            if record.get('insight') is not None:
+                done[record['business_id']] = record
+    return done
+
+
+class InsightWriter:
+    """Appends results to the JSONL checkpoint and bulk-upserts them to MySQL"""
+
+    def __init__(self, checkpoint: Optional[str], to_database: bool = False):
+        self.checkpoint = checkpoint
+        self.engine = None
+        if to_database:
+            self.engine = get_engine()
+            self._ensure_table()
+
+    def _ensure_table(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS business_insights (
+                business_id VARCHAR(64) NOT NULL PRIMARY KEY,
+                business_name VARCHAR(255),
+                insight TEXT,
+                error TEXT,
+                attempts INT NOT NULL,
+                generated_at TIMESTAMP NOT NULL
+            )
+            """))
+
+    def write(self, results: List[Dict]):
+        if not results:
+            return
+        if self.checkpoint:
+            with open(self.checkpoint, 'a') as f:
+                f.writelines(json.dumps(record) + "\n" for record in results)
+                f.flush()
+                os.fsync(f.fileno())
+        if self.engine is not None:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text("""
+                    INSERT INTO business_insights
+                    (business_id, business_name, insight, error, attempts, generated_at)
+                    VALUES (:business_id, :business_name, :insight, :error, :attempts, NOW())
+                    ON DUPLICATE KEY UPDATE insight = VALUES(insight),
+                                            error = VALUES(error),
+                                            attempts = VALUES(attempts),
+                                            generated_at = VALUES(generated_at)
+                    """),
+                    [{key: record.get(key) for key in
+                      ('business_id', 'business_name', 'insight', 'error', 'attempts')}
+                     for record in results]
+                )
+
+
+class InsightBatchRunner:
+    """Generates insights for many businesses with bounded concurrency
+
+    `concurrency` workers share a token-bucket rate limit. Failed calls are
+    retried with exponential backoff and full jitter. Results are written
+    in batches of `flush_every`; records already in the checkpoint are
+    skipped, so an interrupted run resumes where it stopped. The backend is
+    any object with a blocking `generate(prompt)`, run in worker threads.
+    """
+
+    def __init__(self, backend, writer: InsightWriter,
+                 concurrency: int = DEFAULT_CONCURRENCY, rate: float = DEFAULT_RATE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 flush_every: int = DEFAULT_FLUSH_EVERY):
+        self.backend = backend
+        self.writer = writer
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_retries = max_retries
+        self.flush_every = flush_every
+        self.latencies = []
+        self.stats = {'done': 0, 'failed': 0, 'retries': 0, 'skipped': 0}
+        self._executor = None
+
+    async def _generate(self, limiter: RateLimiter, record: Dict) -> Dict:
+        prompt = build_prompt(record['waste_data'])
+        # The source text stays in the input; results only carry identifiers
+        record = {key: value for key, value in record.items() if key != 'waste_data'}
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            await limiter.acquire()
+            start = time.perf_counter()
+            try:
+                insight = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self.backend.generate, prompt
+                )
+                self.latencies.append(time.perf_counter() - start)
+                return {**record, 'insight': insight, 'error': None, 'attempts': attempt}
+            except Exception as e:
+                error = str(e)
+                if attempt > self.max_retries:
+                    break
+                self.stats['retries'] += 1
+                backoff = min(MAX_BACKOFF_S, BASE_BACKOFF_S * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, backoff))
+        logging.warning(f"Giving up on {record['business_id']}: {error}")
+        return {**record, 'insight': None, 'error': error, 'attempts': self.max_retries + 1}
+
+    async def run(self, records: Iterable[Dict]) -> Dict:
+        limiter = RateLimiter(self.rate)
+        pending = asyncio.Queue()
+        for record in records:
+            pending.put_nowait(record)
+        buffer = []
+
+        async def worker():
+            while True:
+                try:
+                    record = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await self._generate(limiter, record)
+                self.stats['done' if result['insight'] is not None else 'failed'] += 1
+                buffer.append(result)
+                if len(buffer) >= self.flush_every:
+                    batch = buffer[:]
+                    buffer.clear()
+                    await asyncio.to_thread(self.writer.write, batch)
+
+        start = time.perf_counter()
+        # One thread per worker, so blocking model calls never queue behind each other
+        with ThreadPoolExecutor(max_workers=self.concurrency) as self._executor:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        await asyncio.to_thread(self.writer.write, buffer)
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed: float) -> Dict:
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        processed = self.stats['done'] + self.stats['failed']
+        return {
+            **self.stats,
+            'seconds': round(elapsed, 2),
+            'records_per_s': round(processed / elapsed, 2) if elapsed else None,
+            'latency_p50_s': round(float(np.percentile(latencies, 50)), 3),
+            'latency_p95_s': round(float(np.percentile(latencies, 95)), 3)
+        }
+
+
+def run_insights(source: str, backend, checkpoint: Optional[str] = None,
+                 output: Optional[str] = None, to_database: bool = False,
+                 table: bool = False, id_column: str = 'business_id',
+                 text_column: str = 'waste_data', concurrency: int = DEFAULT_CONCURRENCY,
+                 rate: float = DEFAULT_RATE, max_retries: int = DEFAULT_MAX_RETRIES,
+                 flush_every: int = DEFAULT_FLUSH_EVERY) -> Dict:
+    """Generate insights for every business in `source` not yet in the checkpoint"""
+    businesses = read_businesses(source, id_column, text_column, table)
+    done = load_checkpoint(checkpoint)
+    todo = businesses[~businesses['business_id'].isin(done)]
+    columns = [c for c in ('business_id', 'business_name', 'waste_data') if c in todo.columns]
+
+    runner = InsightBatchRunner(backend, InsightWriter(checkpoint, to_database),
+                                concurrency, rate, max_retries, flush_every)
+    runner.stats['skipped'] = len(businesses) - len(todo)
+    logging.info(f"{len(todo)} businesses to process, {runner.stats['skipped']} already done")
+    report = asyncio.run(runner.run(todo[columns].to_dict(orient='records')))
+
+    if output:
+        results = pd.DataFrame(list(load_checkpoint(checkpoint).values())) if checkpoint else None
+        if results is not None and not results.empty:
+            if output.endswith('.parquet'):
+                results.to_parquet(output, index=False)
+            else:
+                results.to_csv(output, index=False)
+    logging.info(f"Insight batch finished: {report}")
+    return report
+
+
+def benchmark(n_businesses=2_000, delay=0.05, failure_rate=0.05, concurrency=64, rate=500.0):
+    """Run the batch against the stub backend and report throughput"""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, 'businesses.csv')
+        pd.DataFrame({
+            'business_id': [f"outlet_{i:05d}" for i in range(n_businesses)],
+            'business_name': [f"Outlet {i}" for i in range(n_businesses)],
+            'waste_data': [f"{rng.integers(1, 80)} kg rice, {rng.integers(100, 900)} g bread"
+                           for _ in range(n_businesses)]
+        }).to_csv(source, index=False)
+        checkpoint = os.path.join(workdir, 'insights.jsonl')
+        backend = make_backend('stub', delay=delay, failure_rate=failure_rate)
+        report = run_insights(source, backend, checkpoint, concurrency=concurrency, rate=rate)
+        resumed = run_insights(source, backend, checkpoint, concurrency=concurrency, rate=rate)
+    print(f"Stub model ({delay * 1e3:.0f} ms, {failure_rate:.0%} failures): {report}")
+    print(f"Re-run from checkpoint: {resumed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nightly LLM waste insights for many businesses")
+    parser.add_argument('source', nargs='?',
+                        help="CSV/JSONL/Parquet path, or table name with --table")
+    parser.add_argument('--table', action='store_true')
+    parser.add_argument('--id-column', default='business_id')
+    parser.add_argument('--text-column', default='waste_data')
+    parser.add_argument('--checkpoint', default='insights.checkpoint.jsonl')
+    parser.add_argument('--output', help="CSV/Parquet copy of all results")
+    parser.add_argument('--database', action='store_true',
+                        help="Also upsert results into the business_insights table")
+    parser.add_argument('--backend', choices=['gemini', 'stub'], default='gemini')
+    parser.add_argument('--cache', action='store_true',
+                        help="Reuse the llm_cache response cache across runs")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE)
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Run against the stub backend on synthetic businesses")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+    if not args.source:
+        parser.error("source is required unless --benchmark is given")
+    run_insights(args.source, make_backend(args.backend, cache=args.cache),
+                 args.checkpoint, args.output, args.database, args.table,
+                 args.id_column, args.text_column, args.concurrency, args.rate,
+                 args.max_retries)
+
+
+if __name__ == "__main__":
+    main()
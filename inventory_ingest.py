@@ -0,0 +1,216 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 250_000
+DATE_FORMAT = '%Y-%m-%d'
+
+# Column names seen in inventory exports, mapped to the names used downstream
+COLUMN_ALIASES = {
+    'Raw Material': 'Item',
+    'Item Name': 'Item',
+    'Ingredient': 'Item',
+    'ExpiryDate': 'Expiry_Date',
+    'Expiry Date': 'Expiry_Date',
+    'Cost (per unit)': 'Cost',
+    'Unit Cost': 'Cost',
+    'ShelfLife (days)': 'Shelf_Life_Days',
+    'Shelf Life (days)': 'Shelf_Life_Days'
+}
+
+# Compact dtypes per mapped column; anything else in the file is not read
+INVENTORY_DTYPES = {
+    'Item': 'category',
+    'Category': 'category',
+    'Quantity': 'float32',
+    'Cost': 'float32',
+    'Shelf_Life_Days': 'float32'
+}
+DATE_COLUMNS = ['Expiry_Date']
+# Read as text and coerced per chunk, so one stray value ('n/a', '12 kg') becomes NaN
+NUMERIC_COLUMNS = ['Quantity', 'Cost', 'Shelf_Life_Days']
+GROUP_KEYS = ['Item', 'Category', 'Expiry_Date']
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename known column aliases to the names used downstream"""
+    return df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip(), str(c).strip()))
+
+
+def read_inventory_chunks(source, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Inventory CSV as mapped, compactly typed chunks of `chunksize` rows
+
+    Files without an item column get one synthetic item per row ('Item 1',
+    'Item 2', ...), numbered across chunks.
+    """
+    if hasattr(source, 'seek'):
+        start = source.tell()
+        header = pd.read_csv(source, nrows=0).columns
+        source.seek(start)
+    else:
+        header = pd.read_csv(source, nrows=0).columns
+    mapped = {raw: COLUMN_ALIASES.get(raw.strip(), raw.strip()) for raw in header}
+    wanted = set(INVENTORY_DTYPES) | set(DATE_COLUMNS)
+    usecols = [raw for raw, name in mapped.items() if name in wanted]
+    dates = [raw for raw in usecols if mapped[raw] in DATE_COLUMNS]
+
+    reader = pd.read_csv(
+        source,
+        usecols=usecols,
+        dtype={raw: str if mapped[raw] in NUMERIC_COLUMNS else INVENTORY_DTYPES[mapped[raw]]
+               for raw in usecols if mapped[raw] in INVENTORY_DTYPES},
+        parse_dates=dates,
+        date_format=DATE_FORMAT,
+        chunksize=chunksize
+    )
+    offset = 0
+    for chunk in reader:
+        chunk = chunk.rename(columns=mapped)
+        for column in NUMERIC_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = (pd.to_numeric(chunk[column], errors='coerce')
+                                 .astype(INVENTORY_DTYPES[column]))
+        if 'Item' not in chunk.columns:
+            chunk['Item'] = 'Item ' + pd.Series(np.arange(offset + 1, offset + len(chunk) + 1),
+                                                index=chunk.index).astype(str)
+        offset += len(chunk)
+        yield chunk
+
+
+def _grouping(frame: pd.DataFrame):
+    keys = [key for key in GROUP_KEYS if key in frame.columns]
+    aggregations = {'Quantity': 'sum', 'Value': 'sum', 'Batches': 'sum'}
+    if 'Shelf_Life_Days' in frame.columns:
+        aggregations['Shelf_Life_Days'] = 'min'
+    return keys, aggregations
+
+
+def _aggregate(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Per item, category and expiry date: stock, value and batch count"""
+    chunk = chunk.assign(
+        Quantity=chunk.get('Quantity', 0),
+        Value=chunk.get('Quantity', 0) * chunk.get('Cost', 0),
+        Batches=1
+    )
+    keys, aggregations = _grouping(chunk)
+    grouped = chunk.groupby(keys, observed=True, dropna=False).agg(aggregations).reset_index()
+    # Chunks carry different category sets, so merge on plain labels
+    for key in keys:
+        if isinstance(grouped[key].dtype, pd.CategoricalDtype):
+            grouped[key] = grouped[key].astype(object)
+    return grouped
+
+
+def _merge(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    keys, aggregations = _grouping(left)
+    return (pd.concat([left, right], ignore_index=True)
+            .groupby(keys, dropna=False).agg(aggregations).reset_index())
+
+
+def ingest_inventory(source, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """Stream an inventory CSV into one row per item, category and expiry date
+
+    Each chunk is reduced to its group totals and merged into a running
+    total, so memory is bounded by the number of distinct stock lots rather
+    than the file size. The result has the columns preprocess_data expects;
+    Cost is the quantity-weighted unit cost.
+    """
+    totals = None
+    rows = 0
+    for chunk in read_inventory_chunks(source, chunksize):
+        rows += len(chunk)
+        part = _aggregate(chunk)
+        totals = part if totals is None else _merge(totals, part)
+    if totals is None:
+        return pd.DataFrame(columns=GROUP_KEYS + ['Quantity', 'Cost', 'Batches'])
+
+    quantity = totals['Quantity'].to_numpy(dtype=np.float64)
+    totals['Cost'] = np.divide(totals['Value'].to_numpy(dtype=np.float64), quantity,
+                               out=np.zeros_like(quantity), where=quantity != 0)
+    totals = totals.drop(columns='Value')
+    if 'Category' in totals.columns:
+        totals['Category'] = totals['Category'].astype(str).str.lower().str.strip().astype('category')
+    totals.attrs['rows'] = rows
+    return totals
+
+
+def make_synthetic_inventory(path: str, n_rows: int, template: str = 'restaurant_inventory.csv',
+                             seed: int = 0, block: int = 500_000):
+    """Write `n_rows` inventory rows shaped like `template`, resampled with jitter"""
+    base = pd.read_csv(template)
+    rng = np.random.default_rng(seed)
+    expiry = pd.to_datetime(base['ExpiryDate'], format=DATE_FORMAT)
+    with open(path, 'w') as f:
+        for offset in range(0, n_rows, block):
+            size = min(block, n_rows - offset)
+            pick = rng.integers(0, len(base), size)
+            rows = base.iloc[pick].reset_index(drop=True)
+            rows['Quantity'] = rng.integers(1, 100, size)
+            rows['Cost (per unit)'] = (rows['Cost (per unit)'].to_numpy()
+                                       * rng.uniform(0.8, 1.2, size)).round(2)
+            rows['ExpiryDate'] = (expiry.iloc[pick].to_numpy()
+                                  + pd.to_timedelta(rng.integers(-5, 30, size), unit='D')
+                                  ).strftime(DATE_FORMAT)
+            rows.to_csv(f, header=offset == 0, index=False)
+
+
+def benchmark(n_rows: int = 5_000_000, chunksize: int = DEFAULT_CHUNKSIZE):
+    """Stream a synthetic multi-hundred-MB export and report throughput and peak memory"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'inventory.csv')
+        start = time.perf_counter()
+        make_synthetic_inventory(path, n_rows)
+        size_mb = os.path.getsize(path) / 1e6
+        logging.info(f"Generated {n_rows:,} rows ({size_mb:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        totals = ingest_inventory(path, chunksize)
+        elapsed = time.perf_counter() - start
+
+        # Second pass only to measure peak allocations (tracemalloc slows it down)
+        tracemalloc.start()
+        ingest_inventory(path, chunksize)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        logging.info(
+            f"Ingested {totals.attrs['rows']:,} rows into {len(totals):,} stock lots in {elapsed:.1f}s "
+            f"({totals.attrs['rows'] / elapsed:,.0f} rows/s, {size_mb / elapsed:.0f} MB/s); "
+            f"peak allocations {peak_mb:.0f} MB"
+        )
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream an inventory export into per-lot totals")
+    parser.add_argument('path', nargs='?', help="Inventory CSV to ingest")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--output', help="Write the totals to this CSV instead of printing them")
+    parser.add_argument('--benchmark', type=int, nargs='?', const=5_000_000, metavar='ROWS',
+                        help="Benchmark on a synthetic file with this many rows")
+    args = parser.parse_args()
+
+    if args.benchmark or not args.path:
+        benchmark(args.benchmark or 5_000_000, args.chunksize)
+        return
+    totals = ingest_inventory(args.path, args.chunksize)
+    if args.output:
+        totals.to_csv(args.output, index=False)
+        logging.info(f"Wrote {len(totals):,} stock lots to {args.output}")
+    else:
+        print(totals.to_string())
+
+
+if __name__ == "__main__":
+    main()
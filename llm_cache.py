@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+DEFAULT_TTL_S = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_CACHE_DIR = 'llm_cache'
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt, used for the cache key"""
+    return _WHITESPACE.sub(" ", prompt).strip().lower()
+
+
+class GeminiClient:
+    """Google Gemini text model; the SDK is only imported when first used"""
+
+    def __init__(self, model_name: str = 'gemini-pro', api_key: Optional[str] = None):
+        self.model_name = model_name
+        self.api_key = api_key or os.environ.get('GEMINI_API_KEY', "API KEY")
+        self._model = None
+
+    def generate(self, prompt: str) -> str:
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model.generate_content(prompt).text.strip()
+
+
+class StubClient:
+    """Offline stand-in for tests and benchmarks
+
+    `delay` simulates model latency and `failure_rate` the share of calls
+    failing with a transient upstream error.
+    """
+
+    def __init__(self, delay: float = 0.0, model_name: str = 'stub',
+                 responder: Optional[Callable[[str], str]] = None,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.model_name = model_name
+        self.delay = delay
+        self.responder = responder
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        if self.delay:
+            time.sleep(self.delay)
+        if fail:
+            raise RuntimeError("Stub upstream error (simulated)")
+        if self.responder is not None:
+            return self.responder(prompt)
+        digest = hashlib.sha256(normalize_prompt(prompt).encode()).hexdigest()[:12]
+        return f"Stub insights for prompt {digest}"
+
+
+class ResponseCache:
+    """Content-addressed LLM response cache
+
+    Responses are keyed by the model name and the normalised prompt. A
+    bounded in-memory LRU tier sits in front of an optional on-disk tier
+    (one JSON file per key); both honour `ttl`. Concurrent requests for the
+    same key share one upstream call. Errors are passed to every waiter
+    but never cached.
+    """
+
+    def __init__(self, client, ttl: float = DEFAULT_TTL_S,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'coalesced': 0, 'misses': 0}
+
+    def key(self, prompt: str) -> str:
+        model = getattr(self.client, 'model_name', type(self.client).__name__)
+        return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        """(expires_at, response) of an unexpired disk entry, else None"""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] < time.time():
+            return None
+        return entry['expires_at'], entry['response']
+
+    def _write_disk(self, key: str, response: str, expires_at: float):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'expires_at': expires_at, 'response': response}, f)
+        os.replace(tmp, path)  # Readers never see a half-written file
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        """Store in the memory tier; caller holds the lock"""
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, prompt: str) -> str:
+        """Cached response for `prompt`, calling the model at most once per key"""
+        key = self.key(prompt)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= time.time():
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[1]
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                leader = True
+            else:
+                self.stats['coalesced'] += 1
+                leader = False
+        if not leader:
+            return pending.result()
+
+        try:
+            stored = self._read_disk(key)
+            if stored is not None:
+                # Keep the entry's own expiry; a restart must not extend it
+                expires_at, response = stored
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+            else:
+                response = self.client.generate(prompt)
+                expires_at = time.time() + self.ttl
+                self._write_disk(key, response, expires_at)
+                with self._lock:
+                    self.stats['misses'] += 1
+            with self._lock:
+                self._remember(key, response, expires_at)
+            pending.set_result(response)
+            return response
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # A cache can stand in wherever a model client is expected
+    generate = get
+
+    def invalidate(self, prompt: Optional[str] = None):
+        """Drop one prompt's entry, or the whole memory tier"""
+        with self._lock:
+            if prompt is None:
+                self._memory.clear()
+                return
+            key = self.key(prompt)
+            self._memory.pop(key, None)
+        if self.cache_dir:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+def benchmark(n_requests=2_000, n_distinct=50, n_threads=32, delay=0.2, seed=0):
+    """Replay near-duplicate prompts from many threads against a slow stub model"""
+    import tempfile
+
+    rng = random.Random(seed)
+    base = [f"Food Waste Data: {i * 3} kg of rice and {i} kg vegetables" for i in range(n_distinct)]
+    # Same prompts with case and whitespace noise, as users paste them
+    prompts = [rng.choice(base).replace(" ", rng.choice([" ", "  ", "\n"])).upper()
+               if rng.random() < 0.3 else rng.choice(base) for _ in range(n_requests)]
+
+    client = StubClient(delay=delay)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResponseCache(client, cache_dir=cache_dir)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(cache.get, prompts))
+        elapsed = time.perf_counter() - start
+
+        cold = ResponseCache(StubClient(delay=delay), cache_dir=cache_dir)
+        start = time.perf_counter()
+        for prompt in base:
+            cold.get(prompt)
+        disk_elapsed = time.perf_counter() - start
+
+    print(f"{n_requests} requests, {n_distinct} distinct prompts, {n_threads} threads, "
+          f"{delay * 1e3:.0f} ms model latency")
+    print(f"Upstream calls: {client.calls} (uncached would be {n_requests}); "
+          f"{n_requests / elapsed:,.0f} requests/s; stats {cache.stats}")
+    print(f"Fresh process from the disk tier: {n_distinct} prompts in {disk_elapsed * 1e3:.1f} ms, "
+          f"stats {cold.stats}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,118 +1,195 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from inventory_ingest import ingest_inventory, normalize_columns
+from recipe_index import default_index
+
+EXPIRY_SOON_DAYS = 7  # Items expiring within this many days are urgent
+OVERSTOCK_QUANTITY = 50  # Stock above this is flagged as excess
+MAX_RECOMMENDATIONS = 10
+MAX_TIPS = 10
+
+
 # Function to preprocess the uploaded data
-def preprocess_data(df):
-    # Convert Expiry_Date to datetime format
-    if 'Expiry_Date' in df.columns:
-        df['Expiry_Date'] = pd.to_datetime(df['Expiry_Date'], format='%Y-%m-%d')
-    
-    # Handle missing values (if any)
-    df.fillna({'Quantity': 0, 'Cost': 0}, inplace=True)
-    
-    # Calculate shelf life (days until expiry)
+def preprocess_data(df, today=None):
+    df = normalize_columns(df)
+    today = pd.Timestamp(today or datetime.today()).normalize()
+
+    # Handle missing columns and values (if any)
+    for column in ('Quantity', 'Cost'):
+        values = df[column] if column in df.columns else pd.Series(0, index=df.index)
+        df[column] = pd.to_numeric(values, errors='coerce').fillna(0)
+    if 'Item' not in df.columns:
+        df['Item'] = 'Item ' + pd.Series(np.arange(1, len(df) + 1), index=df.index).astype(str)
+    df['Category'] = (df['Category'].astype(str).str.lower().str.strip()
+                      if 'Category' in df.columns else 'general')
+
+    # Calculate shelf life (days until expiry); fall back to the stated shelf life
     if 'Expiry_Date' in df.columns:
-        today = datetime.today()
+        df['Expiry_Date'] = pd.to_datetime(df['Expiry_Date'], format='%Y-%m-%d', errors='coerce')
         df['Shelf_Life'] = (df['Expiry_Date'] - today).dt.days
-    
-    # Categorize items (optional)
-    if 'Category' in df.columns:
-        df['Category'] = df['Category'].str.lower().str.strip()
-    
+    else:
+        df['Shelf_Life'] = np.nan
+    if 'Shelf_Life_Days' in df.columns:
+        df['Shelf_Life'] = df['Shelf_Life'].fillna(
+            pd.to_numeric(df['Shelf_Life_Days'], errors='coerce'))
+
+    return score_inventory(df)
+
+# Function to score every item at once
+def score_inventory(df):
+    shelf_life = df['Shelf_Life'].to_numpy(dtype=np.float64)
+    quantity = df['Quantity'].to_numpy(dtype=np.float64)
+    cost = df['Cost'].to_numpy(dtype=np.float64)
+
+    # 1 for expired stock, falling towards 0 as expiry moves away; unknown expiry counts as 0
+    urgency = np.where(np.isnan(shelf_life), 0.0,
+                       1.0 / (1.0 + np.clip(np.nan_to_num(shelf_life), 0, None)))
+    value = quantity * cost
+    df['Urgency'] = urgency
+    df['Value_At_Risk'] = value
+    df['Priority'] = urgency * np.maximum(value, quantity * 1e-6)  # Free items still rank by urgency
+    df['Available'] = quantity > 0
+    df['Expired'] = shelf_life < 0
+    df['Expiring_Soon'] = (shelf_life >= 0) & (shelf_life <= EXPIRY_SOON_DAYS)
+    df['Overstock'] = quantity > OVERSTOCK_QUANTITY
     return df
 
+# Function to order rows by priority, highest first, keeping only the top `limit`
+def top_by_priority(df, mask, limit, distinct_items=False):
+    positions = np.flatnonzero(mask)
+    priority = df['Priority'].to_numpy()[positions]
+    if distinct_items:
+        # Several stock batches of one item: keep its highest-priority batch
+        ranked = df.iloc[positions[np.argsort(-priority, kind='stable')]]
+        return ranked.drop_duplicates('Item').head(limit)
+    if len(positions) > limit:
+        keep = np.argpartition(-priority, limit - 1)[:limit]
+        positions, priority = positions[keep], priority[keep]
+    return df.iloc[positions[np.argsort(-priority, kind='stable')]]
+
 # Function to generate meal recommendations
-def generate_meal_recommendations(df):
-    recommendations = []
-    # Example: Suggest meals based on available ingredients
-    for index, row in df.iterrows():
-        if row['Quantity'] > 0:  # Only suggest for available items
-            recommendations.append(f"Use {row['Item']} to make a delicious {row['Category']} dish.")
-    return recommendations[:10]  # Limit to 10 recommendations
+def generate_meal_recommendations(df, limit=MAX_RECOMMENDATIONS):
+    # Suggest meals from available, unexpired ingredients, most urgent and valuable first
+    usable = (df['Available'] & ~df['Expired']).to_numpy()
+    top = top_by_priority(df, usable, limit, distinct_items=True)
+    return ("Use " + top['Item'].astype(str) + " to make a delicious "
+            + top['Category'].astype(str) + " dish.").tolist()
 
 # Function to generate inventory optimization tips
-def generate_inventory_tips(df):
-    tips = []
-    # Example: Suggest actions for items nearing expiry or excess stock
-    for index, row in df.iterrows():
-        if row['Shelf_Life'] <= 7:  # Items expiring soon
-            tips.append(f"Use {row['Item']} (expires in {row['Shelf_Life']} days) in a recipe.")
-        if row['Quantity'] > 50:  # Excess inventory
-            tips.append(f"Consider reducing stock of {row['Item']} (current quantity: {row['Quantity']}).")
-    return tips[:10]  # Limit to 10 tips
+def generate_inventory_tips(df, limit=MAX_TIPS):
+    # Suggest actions for expired, soon-expiring and excess stock. Every tip is ranked
+    # by Priority (urgency x value) of the stock it covers; for excess that is only the
+    # share above OVERSTOCK_QUANTITY
+    expired = top_by_priority(df, (df['Expired'] & df['Available']).to_numpy(), limit)
+    soon = top_by_priority(df, (df['Expiring_Soon'] & df['Available']).to_numpy(), limit)
+    excess = top_by_priority(df, df['Overstock'].to_numpy(), limit)
+    tips = pd.concat([
+        pd.DataFrame({'tip': "Check " + expired['Item'].astype(str) + " (expired "
+                      + (-expired['Shelf_Life']).astype(int).astype(str)
+                      + " days ago) and discard or compost it if spoiled.",
+                      'priority': expired['Priority']}),
+        pd.DataFrame({'tip': "Use " + soon['Item'].astype(str) + " (expires in "
+                      + soon['Shelf_Life'].astype(int).astype(str) + " days) in a recipe.",
+                      'priority': soon['Priority']}),
+        pd.DataFrame({'tip': "Consider reducing stock of " + excess['Item'].astype(str)
+                      + " (current quantity: " + excess['Quantity'].astype(str) + ").",
+                      'priority': excess['Priority'] * (1 - OVERSTOCK_QUANTITY / excess['Quantity'])})
+    ])
+    return tips.sort_values('priority', ascending=False, kind='stable')['tip'].head(limit).tolist()
+
+# Recipe index, built once per server process
+@st.cache_resource
+def get_recipe_index():
+    return default_index()
 
 # Function to suggest meal plans
-def suggest_meal_plans(df):
+def suggest_meal_plans(df, index=None, limit=2):
     meal_plans = []
-    # Example: Combine multiple ingredients into a meal plan
-    available_items = df[df['Quantity'] > 0]['Item'].tolist()
-    if available_items:
-        meal_plans.append(f"Meal Plan: Combine {', '.join(available_items[:3])} to make a hearty stew.")
-        meal_plans.append(f"Meal Plan: Use {', '.join(available_items[3:5])} to prepare a fresh salad.")
-    return meal_plans[:2]  # Limit to 2 meal plans
-
-# Page title
-st.title("🍽️ AI-Powered  Recommendation System For Restaurants")
-
-# Sidebar for restaurant input
-st.sidebar.header("Restaurant Details")
-restaurant_name = st.sidebar.text_input("Restaurant Name")
-
-# File upload for food-related data
-st.sidebar.header("Upload Food Data")
-uploaded_file = st.sidebar.file_uploader(
-    "Upload your food data (CSV file)",
-    type=["csv"],
-    help="Upload a CSV file containing menu items, inventory, or sales data."
-)
-
-# Main content
-st.header("Meal Planning and Inventory Optimization")
-
-if uploaded_file is not None:
-    # Read the uploaded file
-    try:
-        df = pd.read_csv(uploaded_file)
-        st.success("File uploaded successfully!")
-        
-        # Display the uploaded data
-        st.subheader("Uploaded Data Preview")
-        st.write(df.head())
-
-        # Preprocess the data
-        st.subheader("Preprocessed Data")
-        df_processed = preprocess_data(df)
-        st.write(df_processed.head())
-
-        # Generate and display meal recommendations
-        st.subheader("Meal Recommendations")
-        meal_recommendations = generate_meal_recommendations(df_processed)
-        if meal_recommendations:
-            for recommendation in meal_recommendations:
-                st.write(f"- {recommendation}")
-        else:
-            st.write("No meal recommendations at this time.")
-
-        # Generate and display inventory optimization tips
-        st.subheader("Inventory Optimization Tips ")
-        inventory_tips = generate_inventory_tips(df_processed)
-        if inventory_tips:
-            for tip in inventory_tips:
-                st.write(f"- {tip}")
-        else:
-            st.write("No inventory optimization tips at this time.")
-
-        # Suggest meal plans
-        st.subheader("Meal Planning Suggestions")
-        meal_plans = suggest_meal_plans(df_processed)
-        if meal_plans:
-            for plan in meal_plans:
-                st.write(f"- {plan}")
-        else:
-            st.write("No meal plans suggested at this time.")
-
-    except Exception as e:
-        st.error(f"Error reading or processing the file: {e}")
-else:
-    st.info("Please upload a CSV file to get started.")
\ No newline at end of file
+    # Rank recipes by how much urgent, valuable stock they use up; expired stock is
+    # only for discarding
+    available = df[df['Available'] & ~df['Expired']]
+    if available.empty:
+        return meal_plans
+    stock = available.groupby('Item')['Priority'].sum()
+    recipes = (index or get_recipe_index()).query(stock.to_dict(), top_k=limit)
+    for recipe in recipes.itertuples():
+        plan = f"Meal Plan: Make {recipe.recipe} using {', '.join(recipe.uses)}"
+        if recipe.missing:
+            plan += f" (buy {', '.join(recipe.missing)})"
+        meal_plans.append(plan + ".")
+    return meal_plans
+
+def main():
+    # Page title
+    st.title("🍽️ AI-Powered  Recommendation System For Restaurants")
+
+    # Sidebar for restaurant input
+    st.sidebar.header("Restaurant Details")
+    restaurant_name = st.sidebar.text_input("Restaurant Name")
+
+    # File upload for food-related data
+    st.sidebar.header("Upload Food Data")
+    uploaded_file = st.sidebar.file_uploader(
+        "Upload your food data (CSV file)",
+        type=["csv"],
+        help="Upload a CSV file containing menu items, inventory, or sales data."
+    )
+
+    # Main content
+    st.header("Meal Planning and Inventory Optimization")
+
+    if uploaded_file is not None:
+        # Read the uploaded file
+        try:
+            # Stream the upload into one row per item and expiry date
+            df = ingest_inventory(uploaded_file)
+            st.success(f"File uploaded successfully! {df.attrs.get('rows', len(df)):,} rows "
+                       f"in {len(df):,} stock lots.")
+
+            # Display the uploaded data
+            st.subheader("Uploaded Data Preview")
+            st.write(df.head())
+
+            # Preprocess the data
+            st.subheader("Preprocessed Data")
+            df_processed = preprocess_data(df)
+            st.write(df_processed.head())
+
+            # Generate and display meal recommendations
+            st.subheader("Meal Recommendations")
+            meal_recommendations = generate_meal_recommendations(df_processed)
+            if meal_recommendations:
+                for recommendation in meal_recommendations:
+                    st.write(f"- {recommendation}")
+            else:
+                st.write("No meal recommendations at this time.")
+
+            # Generate and display inventory optimization tips
+            st.subheader("Inventory Optimization Tips ")
+            inventory_tips = generate_inventory_tips(df_processed)
+            if inventory_tips:
+                for tip in inventory_tips:
+                    st.write(f"- {tip}")
+            else:
+                st.write("No inventory optimization tips at this time.")
+
+            # Suggest meal plans
+            st.subheader("Meal Planning Suggestions")
+            meal_plans = suggest_meal_plans(df_processed)
+            if meal_plans:
+                for plan in meal_plans:
+                    st.write(f"- {plan}")
+            else:
+                st.write("No meal plans suggested at this time.")
+
+        except Exception as e:
+            st.error(f"Error reading or processing the file: {e}")
+    else:
+        st.info("Please upload a CSV file to get started.")
+
+
+if __name__ == "__main__":
+    main()
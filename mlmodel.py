@@ -1,11 +1,10 @@
 # mlmodel.py (Enhanced Version)
 import streamlit as st
 import plotly.express as px
-from core import WasteAnalyzer
+import streamlit_cache as cache
 
 def main():
     st.set_page_config(page_title="Food Waste Analytics", layout="wide")
-    analyzer = WasteAnalyzer()
 
     # App Header
     st.title("🍏 Food Waste Intelligence Platform")
@@ -30,7 +29,7 @@ def main():
             - *3D Visualization*: Explore relationships between yield, storage, and temperature
             """)
         
-        prod_df = analyzer.predict_production_waste()
+        prod_df = cache.predict_production_waste()
         
         # Key Metrics Row
         col1, col2, col3 = st.columns(3)
@@ -96,21 +95,32 @@ def main():
             - *Size Indicator*: Current stock levels
             """)
         
-        retail_df = analyzer.detect_retail_anomalies()
-        
-        # Date Range Filter
-        min_date = retail_df['record_date'].min().date()
-        max_date = retail_df['record_date'].max().date()
-        selected_dates = st.date_input("Select Date Range", 
-                                      [min_date, max_date],
-                                      min_value=min_date,
-                                      max_value=max_date)
-        
-        filtered_df = retail_df[
-            (retail_df['record_date'].dt.date >= selected_dates[0]) &
-            (retail_df['record_date'].dt.date <= selected_dates[1])
-        ]
-        
+        # Filters are pushed down into the SQL query
+        options = cache.get_retail_filter_options()
+        min_date = options['min_date'].date()
+        max_date = options['max_date'].date()
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            selected_dates = st.date_input("Select Date Range",
+                                          [min_date, max_date],
+                                          min_value=min_date,
+                                          max_value=max_date)
+        with filter_col2:
+            selected_products = st.multiselect("Products", options['products'],
+                                               help="Leave empty to include all products")
+        if len(selected_dates) != 2:
+            st.info("Select both a start and an end date")
+            st.stop()
+
+        filtered_df = cache.detect_retail_anomalies(
+            start_date=selected_dates[0],
+            end_date=selected_dates[1],
+            products=selected_products or None
+        )
+        if filtered_df.empty:
+            st.warning("No retail records match the selected filters")
+            st.stop()
+
         # Key Metrics
         anomalies = filtered_df[filtered_df['anomaly'] == -1]
         col1, col2, col3 = st.columns(3)
@@ -156,7 +166,7 @@ def main():
             - *Cluster 3*: Irregular patterns, high waste
             """)
         
-        cons_df = analyzer.analyze_consumption_patterns()
+        cons_df = cache.analyze_consumption_patterns()
         
         # Cluster Distribution
         cluster_dist = cons_df['cluster'].value_counts().reset_index()
@@ -220,6 +230,9 @@ def main():
 
     # Footer
     st.divider()
+    if st.button("🔄 Refresh data", help="Reload predictions from the database"):
+        cache.invalidate_waste_analytics()
+        st.rerun()
     st.markdown("""
     Data updated daily • Predictions refresh hourly  
     For support contact: analytics@foodwaste.ai  
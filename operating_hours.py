@@ -0,0 +1,156 @@
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Keys of the operating_hours JSON and the weekdays (Monday = 0) they cover.
+# Any other key (e.g. "evenings", "night") is read as applying every day.
+DAY_KEYS = {
+    'daily': range(7),
+    'weekdays': range(5),
+    'weekends': (5, 6),
+    **{name: (day,) for day, name in enumerate(
+        ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'])},
+    **{name + 's': (day,) for day, name in enumerate(
+        ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'])}
+}
+
+
+def minute_of_week(when: datetime) -> float:
+    """Minutes since Monday 00:00, including fractional seconds"""
+    return (when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+            + when.second / 60)
+
+
+def _parse_clock(value: str) -> int:
+    hours, minutes = value.strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time {value!r}")
+    return hours * 60 + minutes
+
+
+def parse_slot(slot: str) -> tuple:
+    """Parse 'HH:MM-HH:MM' (or '24_hours') into start/end minutes of the day"""
+    slot = slot.strip()
+    if slot.lower() in ('24_hours', '24 hours', '24x7'):
+        return 0, MINUTES_PER_DAY
+    start, end = slot.split('-')
+    return _parse_clock(start), _parse_clock(end)
+
+
+def parse_operating_hours(operating_hours) -> list:
+    """Expand an operating_hours value into closed minute-of-week intervals
+
+    Slots ending before they start run overnight into the next day, with
+    Sunday night wrapping to Monday morning. Unparseable slots are skipped.
+    """
+    if operating_hours is None:
+        return []
+    if isinstance(operating_hours, str):
+        try:
+            operating_hours = json.loads(operating_hours)
+        except ValueError:
+            logging.debug(f"Unparseable operating hours: {operating_hours!r}")
+            return []
+    if not isinstance(operating_hours, dict):
+        return []
+
+    intervals = []
+    for key, slots in operating_hours.items():
+        days = DAY_KEYS.get(str(key).strip().lower(), range(7))
+        for slot in str(slots).split(','):
+            try:
+                start, end = parse_slot(slot)
+            except ValueError:
+                logging.debug(f"Skipping operating hours slot {slot!r}")
+                continue
+            for day in days:
+                offset = day * MINUTES_PER_DAY
+                if start <= end:
+                    intervals.append((offset + start, offset + end))
+                else:
+                    intervals.append((offset + start, offset + MINUTES_PER_DAY))
+                    next_day = (offset + MINUTES_PER_DAY) % MINUTES_PER_WEEK
+                    intervals.append((next_day, next_day + end))
+    return intervals
+
+
+class OperatingHoursIndex:
+    """Weekly opening intervals for many charities, parsed once
+
+    Intervals are stored as a padded (charities x slots) matrix of
+    minute-of-week starts and ends, so "open at T" and "open during a
+    window" are answered for every charity with a few array comparisons.
+    """
+
+    def __init__(self, operating_hours: Iterable):
+        parsed = [parse_operating_hours(value) for value in operating_hours]
+        width = max([len(intervals) for intervals in parsed] + [1])
+        # Padding slots start after the end of the week and never match
+        self.starts = np.full((len(parsed), width), np.inf, dtype=np.float32)
+        self.ends = np.full((len(parsed), width), -np.inf, dtype=np.float32)
+        for row, intervals in enumerate(parsed):
+            if intervals:
+                self.starts[row, :len(intervals)], self.ends[row, :len(intervals)] = zip(*intervals)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _rows(self, rows):
+        return slice(None) if rows is None else np.asarray(rows)
+
+    def open_at(self, when: datetime, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether each charity (or each of `rows`) is open at `when`"""
+        t = minute_of_week(when)
+        rows = self._rows(rows)
+        return ((self.starts[rows] <= t) & (t <= self.ends[rows])).any(axis=1)
+
+    def open_now(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.open_at(datetime.now(), rows)
+
+    def open_at_minutes(self, rows: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+        """Pairwise check: is charity rows[i] open at minute-of-week minutes[i]"""
+        t = (np.asarray(minutes, dtype=np.float64) % MINUTES_PER_WEEK)[:, None]
+        rows = np.asarray(rows)
+        return ((self.starts[rows] <= t) & (t <= self.ends[rows])).any(axis=1)
+
+    def minutes_until_open(self, rows: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+        """Pairwise wait from minute-of-week minutes[i] until charity rows[i] opens
+
+        0 when already open, inf when the charity never opens.
+        """
+        t = (np.asarray(minutes, dtype=np.float64) % MINUTES_PER_WEEK)[:, None]
+        rows = np.asarray(rows)
+        starts, ends = self.starts[rows], self.ends[rows]
+        wait = np.where(starts >= t, starts - t, starts + MINUTES_PER_WEEK - t)
+        wait = np.where((starts <= t) & (t <= ends), 0, wait)
+        return wait.min(axis=1) if wait.shape[1] else np.full(len(rows), np.inf)
+
+    def open_during(self, start: datetime, end: datetime,
+                    rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether each charity is open at any point between start and end"""
+        rows = self._rows(rows)
+        starts, ends = self.starts[rows], self.ends[rows]
+        length = (end - start).total_seconds() / 60
+        if length >= MINUTES_PER_WEEK:
+            return np.isfinite(starts).any(axis=1)
+
+        a = minute_of_week(start)
+        b = a + length
+        overlap = (starts <= b) & (ends >= a)
+        if b > MINUTES_PER_WEEK:
+            # Window wraps past Sunday midnight
+            overlap |= (starts <= b - MINUTES_PER_WEEK) & (ends >= 0)
+        return overlap.any(axis=1)
+
+
+def is_open(operating_hours, when: Optional[datetime] = None) -> bool:
+    """Single-charity convenience check against the same interval rules"""
+    index = OperatingHoursIndex([operating_hours])
+    return bool(index.open_at(when or datetime.now())[0])
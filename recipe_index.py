@@ -0,0 +1,200 @@
+import json
+import re
+import time
+from typing import Dict, Iterable, List, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Built-in catalogue covering the ingredients in restaurant_inventory.csv
+DEFAULT_RECIPES = [
+    {'name': 'Tomato and onion curry with rice', 'ingredients': ['tomato', 'onion', 'garlic', 'rice', 'cooking oil']},
+    {'name': 'Hearty beef stew', 'ingredients': ['beef', 'potato', 'onion', 'garlic', 'tomato']},
+    {'name': 'Fish curry', 'ingredients': ['fish', 'tomato', 'onion', 'garlic', 'cooking oil', 'rice']},
+    {'name': 'Chicken biryani', 'ingredients': ['chicken', 'rice', 'onion', 'garlic', 'butter']},
+    {'name': 'Butter chicken', 'ingredients': ['chicken', 'butter', 'tomato', 'milk', 'garlic']},
+    {'name': 'Cheese omelette', 'ingredients': ['egg', 'cheese', 'butter', 'onion']},
+    {'name': 'Potato and cheese bake', 'ingredients': ['potato', 'cheese', 'milk', 'butter']},
+    {'name': 'Fried rice', 'ingredients': ['rice', 'egg', 'onion', 'garlic', 'cooking oil']},
+    {'name': 'Fish and chips', 'ingredients': ['fish', 'potato', 'flour', 'cooking oil']},
+    {'name': 'Pancakes', 'ingredients': ['flour', 'milk', 'egg', 'sugar', 'butter']},
+    {'name': 'Rice pudding', 'ingredients': ['rice', 'milk', 'sugar']},
+    {'name': 'Flatbread with garlic butter', 'ingredients': ['flour', 'butter', 'garlic']},
+    {'name': 'Tomato soup', 'ingredients': ['tomato', 'onion', 'garlic', 'butter', 'milk']},
+    {'name': 'Beef and potato hash', 'ingredients': ['beef', 'potato', 'onion', 'cooking oil', 'egg']},
+    {'name': 'Chicken and potato roast', 'ingredients': ['chicken', 'potato', 'garlic', 'cooking oil']},
+    {'name': 'Cheese sauce pasta bake', 'ingredients': ['flour', 'butter', 'milk', 'cheese']},
+    {'name': 'Egg curry', 'ingredients': ['egg', 'tomato', 'onion', 'garlic', 'cooking oil']},
+    {'name': 'Shortbread biscuits', 'ingredients': ['flour', 'butter', 'sugar']}
+]
+
+_UNIT_SUFFIX = re.compile(r"\s*\([^)]*\)\s*$")
+_IRREGULAR = {'tomatoes': 'tomato', 'potatoes': 'potato', 'eggs': 'egg'}
+
+
+def normalize_ingredient(name: str) -> str:
+    """Canonical ingredient key: lower case, no unit suffix, singular"""
+    key = _UNIT_SUFFIX.sub('', str(name)).strip().lower()
+    key = re.sub(r"\s+", " ", key)
+    if key in _IRREGULAR:
+        return _IRREGULAR[key]
+    if len(key) > 3 and key.endswith('s') and not key.endswith('ss'):
+        return key[:-1]
+    return key
+
+
+class RecipeIndex:
+    """Precomputed ingredient -> recipe index over a recipe catalogue
+
+    Postings are stored CSR-style (one flat array of recipe ids plus offsets
+    per ingredient) and every recipe's ingredient set is a packed uint64
+    bitset. A query touches only the postings of ingredients in stock, so it
+    costs milliseconds even for 100k recipes.
+    """
+
+    def __init__(self, recipes: Sequence[Mapping]):
+        names, ingredient_lists = [], []
+        for recipe in recipes:
+            names.append(recipe['name'])
+            ingredient_lists.append(sorted({normalize_ingredient(i) for i in recipe['ingredients']}))
+        self.names = np.array(names, dtype=object)
+        self.recipe_ingredients = ingredient_lists
+        self.vocabulary = sorted({i for ingredients in ingredient_lists for i in ingredients})
+        self.ingredient_ids = {name: i for i, name in enumerate(self.vocabulary)}
+
+        lengths = np.fromiter(map(len, ingredient_lists), dtype=np.int64, count=len(ingredient_lists))
+        recipe_of = np.repeat(np.arange(len(ingredient_lists), dtype=np.int32), lengths)
+        ingredient_of = np.fromiter(
+            (self.ingredient_ids[i] for ingredients in ingredient_lists for i in ingredients),
+            dtype=np.int32, count=int(lengths.sum())
+        )
+        self.sizes = lengths.astype(np.int32)
+
+        # Inverted index: recipes of ingredient i are postings[offsets[i]:offsets[i + 1]]
+        order = np.argsort(ingredient_of, kind='stable')
+        self.postings = recipe_of[order]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ingredient_of, minlength=len(self.vocabulary)), out=self.offsets[1:])
+
+        # Packed ingredient bitsets, one row of uint64 words per recipe
+        self.n_words = max(1, -(-len(self.vocabulary) // 64))
+        self.bits = np.zeros((len(ingredient_lists), self.n_words), dtype=np.uint64)
+        np.bitwise_or.at(self.bits, (recipe_of, ingredient_of // 64),
+                         np.left_shift(np.uint64(1), (ingredient_of % 64).astype(np.uint64)))
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RecipeIndex':
+        """Catalogue from JSON (list of {name, ingredients}) or CSV (name, ingredients as 'a;b;c')"""
+        if path.endswith('.json'):
+            with open(path) as f:
+                return cls(json.load(f))
+        frame = pd.read_csv(path)
+        return cls([{'name': name, 'ingredients': str(ingredients).split(';')}
+                    for name, ingredients in zip(frame['name'], frame['ingredients'])])
+
+    def _stock_mask(self, ids: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.n_words, dtype=np.uint64)
+        np.bitwise_or.at(mask, ids // 64, np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64)))
+        return mask
+
+    def query(self, stock: Union[Mapping[str, float], Iterable[str]], top_k: int = 5,
+              max_missing: int = 1) -> pd.DataFrame:
+        """Recipes ranked by how much urgent stock they use
+
+        `stock` maps ingredient names to an urgency weight (a plain iterable
+        weighs every item 1). Recipes missing more than `max_missing`
+        ingredients are dropped; the rest are ranked by the total weight of
+        the stock they consume, then by coverage.
+        """
+        if not isinstance(stock, Mapping):
+            stock = dict.fromkeys(stock, 1.0)
+        weights: Dict[int, float] = {}
+        for name, weight in stock.items():
+            ingredient = self.ingredient_ids.get(normalize_ingredient(name))
+            if ingredient is not None:
+                weights[ingredient] = weights.get(ingredient, 0.0) + float(weight)
+        columns = ['recipe', 'score', 'coverage', 'uses', 'missing']
+        if not weights:
+            return pd.DataFrame(columns=columns)
+
+        ids = np.fromiter(weights, dtype=np.int64, count=len(weights))
+        ingredient_weights = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+        starts, ends = self.offsets[ids], self.offsets[ids + 1]
+        hits = np.concatenate([self.postings[a:b] for a, b in zip(starts, ends)])
+        score = np.bincount(hits, weights=np.repeat(ingredient_weights, ends - starts),
+                            minlength=len(self))
+        matched = np.bincount(hits, minlength=len(self))
+
+        # Candidates share an ingredient with the stock and miss few others
+        candidates = np.flatnonzero((matched > 0) & (self.sizes - matched <= max_missing))
+        coverage = matched[candidates] / self.sizes[candidates]
+        if len(candidates) > top_k:
+            shortlist = np.argpartition(-score[candidates], top_k - 1)[:top_k]
+            # Keep score ties at the cut-off so coverage can break them
+            cutoff = score[candidates[shortlist]].min()
+            shortlist = np.flatnonzero(score[candidates] >= cutoff)
+            candidates, coverage = candidates[shortlist], coverage[shortlist]
+        order = np.lexsort((-coverage, -score[candidates]))[:top_k]
+
+        # Bitsets split each shortlisted recipe into stocked and missing ingredients
+        stocked = self.bits[candidates[order]] & self._stock_mask(ids)
+        rows = []
+        for position, recipe_bits in zip(order, stocked):
+            recipe = candidates[position]
+            uses = set(self._decode(recipe_bits))
+            ingredients = self.recipe_ingredients[recipe]
+            rows.append({
+                'recipe': self.names[recipe],
+                'score': float(score[recipe]),
+                'coverage': float(coverage[position]),
+                'uses': [i for i in ingredients if i in uses],
+                'missing': [i for i in ingredients if i not in uses]
+            })
+        return pd.DataFrame(rows, columns=columns)
+
+    def _decode(self, words: np.ndarray) -> List[str]:
+        bits = np.unpackbits(words.view(np.uint8), bitorder='little')
+        return [self.vocabulary[i] for i in np.flatnonzero(bits) if i < len(self.vocabulary)]
+
+
+def default_index() -> RecipeIndex:
+    return RecipeIndex(DEFAULT_RECIPES)
+
+
+def benchmark(n_recipes=100_000, n_ingredients=2_000, n_stock=200, n_queries=200, seed=0):
+    """Build and query time for a large synthetic catalogue"""
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"ingredient {i}" for i in range(n_ingredients)]
+    # Popular ingredients appear in many recipes, as in real catalogues
+    popularity = 1.0 / np.arange(1, n_ingredients + 1)
+    popularity /= popularity.sum()
+    recipes = [{'name': f"recipe {r}",
+                'ingredients': [vocabulary[i] for i in rng.choice(
+                    n_ingredients, size=rng.integers(3, 12), replace=False, p=popularity)]}
+               for r in range(n_recipes)]
+
+    start = time.perf_counter()
+    index = RecipeIndex(recipes)
+    build = time.perf_counter() - start
+
+    timings = []
+    for _ in range(n_queries):
+        stock = dict(zip((vocabulary[i] for i in rng.choice(n_ingredients, n_stock, replace=False)),
+                         rng.random(n_stock)))
+        start = time.perf_counter()
+        index.query(stock, top_k=10)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e3
+    print(f"{n_recipes:,} recipes, {n_ingredients:,} ingredients: built in {build:.2f}s; "
+          f"query with {n_stock} stocked items p50 {np.median(timings):.2f} ms, "
+          f"p95 {np.percentile(timings, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    inventory = pd.read_csv('restaurant_inventory.csv')
+    urgency = inventory.groupby('Raw Material')['ShelfLife (days)'].min().rdiv(1.0)
+    print(default_index().query(urgency.to_dict(), top_k=5).to_string())
+    benchmark()
@@ -1,11 +1,18 @@
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
-from typing import List, Dict, Optional
-from sqlalchemy import create_engine, text
+from typing import Iterable, List, Dict, Optional, Tuple
+from sqlalchemy import Integer, bindparam, create_engine, inspect, text
+import hashlib
 import json
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
+from allocation import SOLVERS
+from charity_state import CharityState
+from geo import distance_km, pairwise_km
+from operating_hours import OperatingHoursIndex, is_open
+from routing import DEFAULT_VEHICLE_CAPACITY_KG, DEFAULT_VEHICLES_PER_DEPOT, plan_routes
+from tracing import count, span, traced
 
 # Database configuration
 MYSQL_CONFIG = {
@@ -15,6 +22,29 @@ MYSQL_CONFIG = {
     "database": "food_demand_db"
 }
 
+# Distance modes (see geo.py): cheap float32 screening of every item x
+# charity pair, exact geodesic for the distances reported on allocations
+SCREEN_DISTANCE_MODE = 'haversine32'
+REPORT_DISTANCE_MODE = 'geodesic'
+# Relative gap between the screening sphere and the WGS-84 geodesic (under
+# 0.6% anywhere). Screening passes pairs up to this far past the cutoff and
+# pairs within it of the cutoff are re-checked with the reported distance.
+SCREEN_MARGIN = 0.006
+
+# Allocations written per scheduling transaction
+SCHEDULE_CHUNK_SIZE = 500
+
+
+def _as_date(value) -> date:
+    """DATE() results come back as dates from MySQL and ISO strings from SQLite"""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _scalar(value):
+    """Unwrap NumPy scalars so database drivers can bind them"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -22,14 +52,19 @@ logging.basicConfig(
 )
 
 class RedistributionSystem:
-    def __init__(self, max_distance_km: int = 50):
-        self.engine = create_engine(
+    def __init__(self, max_distance_km: int = 50, engine=None):
+        # `engine` overrides MYSQL_CONFIG, e.g. for a local benchmark database
+        self.engine = engine or create_engine(
             f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}"
             f"@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}",
             pool_size=10,
             max_overflow=20
         )
         self.max_distance_km = max_distance_km
+        self._schedule_schema_ready = False
+        self.last_schedule_report = None
+        # Charities plus a local capacity ledger, reloaded from get_charities
+        self.charity_state = CharityState(self.get_charities)
         self._verify_connection()
 
     def _verify_connection(self):
@@ -42,9 +77,15 @@ class RedistributionSystem:
             logging.error(f"Database connection failed: {str(e)}")
             raise
 
-    def get_surplus_items(self) -> pd.DataFrame:
-        """Retrieve current surplus inventory with spatial data"""
-        query = text("""
+    def get_surplus_items(self, item_ids: Optional[List[str]] = None,
+                          raise_errors: bool = False) -> pd.DataFrame:
+        """Retrieve current surplus inventory with spatial data
+
+        `item_ids` restricts the scan to those items, e.g. the ones an
+        inventory change event touched. A failed query returns an empty
+        frame unless `raise_errors` is set.
+        """
+        query = """
         SELECT i.item_id, 
                i.current_stock - r.required_stock AS surplus_quantity,
                i.category,
@@ -59,83 +100,211 @@ class RedistributionSystem:
         ) r ON i.item_id = r.item_id
         JOIN Stores s ON i.location_id = s.store_id
         WHERE i.current_stock > r.required_stock
-        """)
+        """
+        params = {}
+        if item_ids is not None:
+            if not len(item_ids):
+                return pd.DataFrame()
+            query += " AND i.item_id IN :item_ids"
+            params['item_ids'] = list(item_ids)
+        query = text(query)
+        if params:
+            query = query.bindparams(bindparam('item_ids', expanding=True))
         
         try:
-            return pd.read_sql(query, self.engine)
+            with span('db_query', query='surplus_items'):
+                return pd.read_sql(query, self.engine, params=params)
         except Exception as e:
             logging.error(f"Error fetching surplus items: {str(e)}")
+            if raise_errors:
+                raise
             return pd.DataFrame()
 
-    def get_charities(self) -> pd.DataFrame:
-        """Retrieve verified charities with capacity data"""
+    def get_charities(self, conn=None) -> pd.DataFrame:
+        """Retrieve verified charities with capacity data
+
+        Reads through `conn` when given (e.g. an async engine's connection
+        via run_sync), otherwise through the system's engine.
+        """
         query = text("""
-        SELECT charity_id, name, latitude, longitude, 
+        SELECT c.charity_id, name, latitude, longitude,
+               contact_phone, contact_email,
                accepted_categories, operating_hours,
-               capacity_kg - COALESCE(daily_used, 0) AS available_capacity
+               capacity_kg - COALESCE(r.reserved_kg, 0) AS available_capacity
         FROM Charities c
-        LEFT JOIN (
-            SELECT charity_id, SUM(quantity) AS daily_used
-            FROM RedistributionLogs
-            WHERE DATE(scheduled_pickup) = CURDATE()
-            GROUP BY charity_id
-        ) r ON c.charity_id = r.charity_id
+        LEFT JOIN CharityReservations r
+            ON c.charity_id = r.charity_id AND r.reservation_date = CURDATE()
         WHERE verification_status = 'verified'
         """)
         
         try:
-            charities = pd.read_sql(query, self.engine)
+            with span('db_query', query='charities'):
+                charities = pd.read_sql(query, conn if conn is not None else self.engine)
             charities['accepted_categories'] = charities['accepted_categories'].apply(
                 lambda x: json.loads(x) if pd.notnull(x) else []
             )
             return charities
         except Exception as e:
+            # Raised rather than returned empty, so CharityState keeps what it has
             logging.error(f"Error fetching charities: {str(e)}")
-            return pd.DataFrame()
+            raise
 
     def _calculate_distances(self, origin: tuple, df: pd.DataFrame) -> pd.Series:
         """Vectorized distance calculation using NumPy"""
-        earth_radius = 6371  # Earth radius in km
-        lat1, lon1 = np.radians(origin[0]), np.radians(origin[1])
-        lat2 = np.radians(df['latitude'].values)
-        lon2 = np.radians(df['longitude'].values)
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = np.sin(dlat/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin(dlon/2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
-        
-        return earth_radius * c
+        return distance_km(origin[0], origin[1], df['latitude'].values, df['longitude'].values)
+
+    @staticmethod
+    def _distance_matrix(item_lat: np.ndarray, item_lon: np.ndarray,
+                         charity_lat: np.ndarray, charity_lon: np.ndarray) -> np.ndarray:
+        """Items x charities screening distances in one vectorized call"""
+        return pairwise_km(item_lat, item_lon, charity_lat, charity_lon,
+                           mode=SCREEN_DISTANCE_MODE)
+
+    @staticmethod
+    def _parse_categories(categories) -> List[str]:
+        """Decode item categories stored as JSON or comma-separated text"""
+        if isinstance(categories, list):
+            return categories
+        if not categories:
+            return []
+        try:
+            return json.loads(categories)
+        except json.JSONDecodeError:
+            return [c.strip() for c in categories.split(',')]
 
     def _is_operating_now(self, operating_hours: str) -> bool:
         """Check if charity is currently operating"""
-        try:
-            hours = json.loads(operating_hours)
-            now = datetime.now().time()
-            current_weekday = datetime.now().weekday()
-            
-            time_slots = []
-            if 'daily' in hours:
-                time_slots.extend(hours['daily'].split(','))
-            if current_weekday < 5 and 'weekdays' in hours:
-                time_slots.extend(hours['weekdays'].split(','))
-            if current_weekday >= 5 and 'weekends' in hours:
-                time_slots.extend(hours['weekends'].split(','))
-                
-            for slot in time_slots:
-                start_str, end_str = slot.split('-')
-                start = datetime.strptime(start_str.strip(), "%H:%M").time()
-                end = datetime.strptime(end_str.strip(), "%H:%M").time()
-                if start <= now <= end:
-                    return True
-            return False
-        except Exception as e:
-            logging.warning(f"Error parsing operating hours: {str(e)}")
-            return False
+        return is_open(operating_hours)
+
+    @traced()
+    def match_surplus_batch(self, surplus_df: pd.DataFrame,
+                            charities: Optional[pd.DataFrame] = None,
+                            solver: str = 'optimal',
+                            pickup_window: Optional[Tuple[datetime, datetime]] = None,
+                            block_cells: int = 2_000_000,
+                            hours: Optional[OperatingHoursIndex] = None) -> List[Dict]:
+        """Allocate every surplus item to charities in one pass
+
+        Charities are loaded once and the eligible item x charity pairs
+        (category match, within range, spare capacity and, if given, open at
+        some point in `pickup_window`) are found with array operations, in
+        blocks of at most `block_cells` cells to bound memory. The allocation
+        itself is solved jointly by `solver`: 'optimal' (min-cost LP) or
+        'greedy', see allocation.py. Either way charity capacity is shared
+        across items.
+        Opening hours are opt-in here: without `pickup_window` a charity
+        closed all day can still be allocated to, and plan_pickups then
+        leaves that load unscheduled. Pass the shift, e.g.
+        (now, now + timedelta(hours=routing.DEFAULT_SHIFT_HOURS)), to exclude it.
+        `surplus_df` needs item_id, surplus_quantity, category, store_lat
+        and store_lon. Without `charities` the cached charity state is used,
+        so no database query is made.
+        """
+        if surplus_df.empty:
+            return []
+        if charities is None:
+            charities, hours = self.charity_state.frame(), self.charity_state.hours
+        if charities.empty:
+            return []
+
+        charities = charities.reset_index(drop=True)
+        charity_lat = charities['latitude'].to_numpy(dtype=float)
+        charity_lon = charities['longitude'].to_numpy(dtype=float)
+        capacity = charities['available_capacity'].to_numpy(dtype=float)
+        if hours is None:
+            hours = OperatingHoursIndex(charities['operating_hours'])
+        operating_now = hours.open_now()
+        charity_ids = charities['charity_id'].to_numpy()
+        names = charities['name'].to_numpy()
+        # Missing phone or email is left out rather than shown as "None"/"nan"
+        contacts = [' '.join(part for part in (phone.strip(), email.strip()) if part)
+                    for phone, email in zip(
+                        charities.get('contact_phone', pd.Series('', index=charities.index))
+                        .fillna('').astype(str),
+                        charities.get('contact_email', pd.Series('', index=charities.index))
+                        .fillna('').astype(str)
+                    )]
+
+        # Multi-hot category matrices over a shared vocabulary
+        item_categories = surplus_df['category'].apply(self._parse_categories)
+        vocabulary = {}
+        for cats in list(item_categories) + list(charities['accepted_categories']):
+            for cat in cats:
+                vocabulary.setdefault(cat, len(vocabulary))
+        charity_hot = np.zeros((len(charities), len(vocabulary)), dtype=np.float32)
+        for row, cats in enumerate(charities['accepted_categories']):
+            charity_hot[row, [vocabulary[c] for c in cats]] = 1
+        item_hot = np.zeros((len(surplus_df), len(vocabulary)), dtype=np.float32)
+        for row, cats in enumerate(item_categories):
+            item_hot[row, [vocabulary[c] for c in cats]] = 1
+
+        item_ids = surplus_df['item_id'].to_numpy()
+        quantities = surplus_df['surplus_quantity'].to_numpy(dtype=float)
+        store_lat = surplus_df['store_lat'].to_numpy(dtype=float)
+        store_lon = surplus_df['store_lon'].to_numpy(dtype=float)
+
+        if pickup_window is not None:
+            open_ok = hours.open_during(*pickup_window)
+        else:
+            open_ok = np.ones(len(charities), dtype=bool)
+        edge_items, edge_charities, edge_km = [], [], []
+        block = max(1, block_cells // len(charities))
+        for start in range(0, len(surplus_df), block):
+            rows = slice(start, start + block)
+            distances = self._distance_matrix(store_lat[rows], store_lon[rows],
+                                              charity_lat, charity_lon)
+            suitable = (
+                (item_hot[rows] @ charity_hot.T > 0)
+                & (distances <= self.max_distance_km * (1 + SCREEN_MARGIN))
+                & ((capacity > 0) & open_ok)
+                & (quantities[rows] > 0)[:, None]
+            )
+            item_rows, charity_rows = np.nonzero(suitable)
+            edge_items.append(item_rows + start)
+            edge_charities.append(charity_rows)
+            edge_km.append(distances[item_rows, charity_rows])
+
+        edge_items = np.concatenate(edge_items)
+        edge_charities = np.concatenate(edge_charities)
+        edge_km = np.concatenate(edge_km).astype(float)
+
+        # The cutoff applies to the reported distance, so pairs near it get
+        # the exact distance before solving and those past it are dropped
+        borderline = np.flatnonzero(edge_km > self.max_distance_km * (1 - SCREEN_MARGIN))
+        if len(borderline):
+            edge_km[borderline] = distance_km(
+                store_lat[edge_items[borderline]], store_lon[edge_items[borderline]],
+                charity_lat[edge_charities[borderline]], charity_lon[edge_charities[borderline]],
+                mode=REPORT_DISTANCE_MODE
+            )
+            keep = edge_km <= self.max_distance_km
+            edge_items, edge_charities, edge_km = edge_items[keep], edge_charities[keep], edge_km[keep]
+        allocated = SOLVERS[solver](edge_items, edge_charities, edge_km, quantities, capacity)
+
+        # Only the handful of chosen edges get the exact distance
+        chosen = np.flatnonzero(allocated > 0)
+        chosen_km = distance_km(store_lat[edge_items[chosen]], store_lon[edge_items[chosen]],
+                                charity_lat[edge_charities[chosen]],
+                                charity_lon[edge_charities[chosen]], mode=REPORT_DISTANCE_MODE)
+
+        allocations = []
+        for edge, km in zip(chosen, chosen_km):
+            i, charity_row = edge_items[edge], edge_charities[edge]
+            allocations.append({
+                'charity_id': charity_ids[charity_row],
+                'charity_name': names[charity_row],
+                'allocated_kg': round(float(allocated[edge]), 3),
+                'distance_km': round(float(km), 2),
+                'contact': contacts[charity_row],
+                'operating_now': bool(operating_now[charity_row]),
+                'item_id': item_ids[i],
+                'surplus_location': f"{store_lat[i]},{store_lon[i]}"
+            })
+
+        return allocations
 
     def find_optimal_recipients(self, item_id: str, quantity: float, 
-                              store_location: tuple) -> List[Dict]:
+                              store_location: tuple, solver: str = 'optimal') -> List[Dict]:
         """Find optimal recipients with capacity and timing constraints"""
         try:
             # Validate inputs
@@ -144,118 +313,475 @@ class RedistributionSystem:
                 
             # Get item categories
             query = text("SELECT category FROM Inventory WHERE item_id = :item_id")
-            with self.engine.connect() as conn:
+            with span('db_query', query='item_category'), self.engine.connect() as conn:
                 result = conn.execute(query, {'item_id': item_id})
                 categories = result.scalar()
             
             if not categories:
                 raise ValueError(f"No categories found for item {item_id}")
-                
-            try:
-                item_categories = json.loads(categories)
-            except json.JSONDecodeError:
-                item_categories = [c.strip() for c in categories.split(',')]
-
-            # Get and filter charities
-            charities = self.get_charities()
-            if charities.empty:
-                return []
-                
-            # Calculate distances
-            charities['distance_km'] = self._calculate_distances(store_location, charities)
-            charities = charities[charities['distance_km'] <= self.max_distance_km]
-            
-            # Filter by category and capacity
-            mask = charities['accepted_categories'].apply(
-                lambda x: any(cat in item_categories for cat in x)
-            )
-            suitable_charities = charities[mask & (charities['available_capacity'] > 0)]
-            
-            if suitable_charities.empty:
-                return []
-                
-            # Prioritization
-            suitable_charities = suitable_charities.sort_values(
-                by=['available_capacity', 'distance_km'],
-                ascending=[False, True]
-            )
-            
-            # Allocate quantities
-            allocations = []
-            remaining = quantity
-            
-            for _, charity in suitable_charities.iterrows():
-                alloc = min(remaining, charity['available_capacity'])
-                allocations.append({
-                    'charity_id': charity['charity_id'],
-                    'charity_name': charity['name'],
-                    'allocated_kg': alloc,
-                    'distance_km': round(charity['distance_km'], 2),
-                    'contact': f"{charity.get('contact_phone', '')} {charity.get('contact_email', '')}",
-                    'operating_now': self._is_operating_now(charity['operating_hours'])
-                })
-                remaining -= alloc
-                if remaining <= 0:
-                    break
-                    
-            return allocations
+
+            item = pd.DataFrame([{
+                'item_id': item_id,
+                'surplus_quantity': quantity,
+                'category': categories,
+                'store_lat': store_location[0],
+                'store_lon': store_location[1]
+            }])
+            return self.match_surplus_batch(item, solver=solver)
             
         except Exception as e:
             logging.error(f"Redistribution error: {str(e)}", exc_info=True)
             return []
 
-    def schedule_redistribution(self, allocations: List[Dict]) -> bool:
-        """Bulk insert redistribution schedule"""
+    @traced()
+    def plan_pickups(self, allocations: List[Dict], charities: Optional[pd.DataFrame] = None,
+                     start_time: Optional[datetime] = None,
+                     vehicle_capacity_kg: float = DEFAULT_VEHICLE_CAPACITY_KG,
+                     vehicles_per_depot: Optional[int] = DEFAULT_VEHICLES_PER_DEPOT,
+                     hours: Optional[OperatingHoursIndex] = None) -> List[Dict]:
+        """Group allocations into vehicle tours and assign pickup times
+
+        Allocations heavier than one vehicle are split into several loads.
+        Each returned allocation carries tour, vehicle, stop_sequence and
+        scheduled_pickup (None when it does not fit in today's shift).
+        See routing.py for the tour heuristic.
+        """
+        if not allocations:
+            return []
+        if charities is None:
+            charities, hours = self.charity_state.frame(), self.charity_state.hours
+        charities = charities.reset_index(drop=True)
+        if hours is None:
+            hours = OperatingHoursIndex(charities['operating_hours'])
+        charity_rows = pd.Series(charities.index, index=charities['charity_id'])
+
+        loads = []
+        for alloc in allocations:
+            n_loads = max(1, int(np.ceil(alloc['allocated_kg'] / vehicle_capacity_kg)))
+            for _ in range(n_loads):
+                loads.append({**alloc, 'allocated_kg': round(alloc['allocated_kg'] / n_loads, 3)})
+
+        stops = pd.DataFrame(loads)
+        depot = stops['surplus_location'].str.split(',', expand=True).astype(float)
+        rows = charity_rows.loc[stops['charity_id']].to_numpy()
+        plan = plan_routes(
+            pd.DataFrame({
+                'depot_lat': depot[0], 'depot_lon': depot[1],
+                'lat': charities['latitude'].to_numpy(dtype=float)[rows],
+                'lon': charities['longitude'].to_numpy(dtype=float)[rows],
+                'kg': stops['allocated_kg'], 'charity_row': rows
+            }),
+            hours,
+            start_time=start_time,
+            vehicle_capacity_kg=vehicle_capacity_kg,
+            vehicles_per_depot=vehicles_per_depot
+        )
+
+        for load, (_, stop) in zip(loads, plan.iterrows()):
+            scheduled = pd.notna(stop['scheduled_pickup'])
+            load.update({
+                'tour': int(stop['tour']),
+                'vehicle': int(stop['vehicle']),
+                'stop_sequence': int(stop['sequence']),
+                'scheduled_pickup': stop['scheduled_pickup'].to_pydatetime() if scheduled else None
+            })
+        return loads
+
+    def migrate_schedule_schema(self, conn=None):
+        """Create or upgrade the scheduling tables
+
+        Run once at deployment or service start (the worker, the API and
+        `python redistribution.py --migrate` do), not from request paths.
+        RedistributionLogs gets run_id and idempotency_key columns,
+        CharityReservations is keyed by the same integer charity_id as
+        Charities, and reservations from today on are rebuilt from the
+        logs so capacity booked before the upgrade is counted.
+        """
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.migrate_schedule_schema(conn)
+
+        with span('db_query', query='schedule_schema'):
+            mysql = conn.dialect.name == 'mysql'
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS RedistributionLogs (
+                item_id VARCHAR(50) NOT NULL,
+                charity_id INT NOT NULL,
+                quantity DOUBLE NOT NULL,
+                scheduled_pickup DATETIME NOT NULL,
+                status VARCHAR(20) NOT NULL
+            )
+            """))
+            schema = inspect(conn)
+            columns = {column['name'].lower() for column in schema.get_columns('RedistributionLogs')}
+            if 'run_id' not in columns:
+                conn.execute(text("ALTER TABLE RedistributionLogs ADD COLUMN run_id VARCHAR(64) NULL"))
+            if 'idempotency_key' not in columns:
+                conn.execute(text("ALTER TABLE RedistributionLogs ADD COLUMN idempotency_key CHAR(40) NULL"))
+            indexes = {index['name'] for index in schema.get_indexes('RedistributionLogs')}
+            if 'uq_redistribution_idempotency' not in indexes:
+                conn.execute(text("CREATE UNIQUE INDEX uq_redistribution_idempotency "
+                                  "ON RedistributionLogs (idempotency_key)"))
+            if 'ix_redistribution_run_item' not in indexes:
+                conn.execute(text("CREATE INDEX ix_redistribution_run_item "
+                                  "ON RedistributionLogs (run_id, item_id)"))
+
+            conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS CharityReservations (
+                charity_id INT NOT NULL,
+                reservation_date DATE NOT NULL,
+                reserved_kg DOUBLE NOT NULL,
+                PRIMARY KEY (charity_id, reservation_date)
+            )
+            """))
+            charity_id = next(column for column in schema.get_columns('CharityReservations')
+                              if column['name'].lower() == 'charity_id')
+            if mysql and not isinstance(charity_id['type'], Integer):
+                # Created as VARCHAR(64) by earlier versions
+                conn.execute(text("ALTER TABLE CharityReservations MODIFY charity_id INT NOT NULL"))
+
+            # Backfill: reservations are always the sum of the logs per charity and day
+            conn.execute(text("DELETE FROM CharityReservations WHERE reservation_date >= CURDATE()"))
+            conn.execute(text("""
+            INSERT INTO CharityReservations (charity_id, reservation_date, reserved_kg)
+            SELECT charity_id, DATE(scheduled_pickup), SUM(quantity)
+            FROM RedistributionLogs
+            WHERE DATE(scheduled_pickup) >= CURDATE()
+            GROUP BY charity_id, DATE(scheduled_pickup)
+            """))
+        self._schedule_schema_ready = True
+        self.charity_state.mark_stale()
+
+    @staticmethod
+    def idempotency_key(run_id: str, item_id, charity_id, part: int = 0) -> str:
+        """Deterministic key of one allocation within a pipeline run
+
+        `part` tells apart the loads of an allocation split across vehicles.
+        """
+        raw = f"{run_id}|{item_id}|{charity_id}" + (f"|{part}" if part else "")
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def run_reservations(self, run_id: str, item_ids: Iterable) -> Dict:
+        """kg per charity that `run_id` has booked for today's pickups of `item_ids`"""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        with span('db_query', query='run_reservations'), self.engine.connect() as conn:
+            return {charity_id: float(kg) for charity_id, kg in conn.execute(
+                text("""
+                SELECT charity_id, SUM(quantity) FROM RedistributionLogs
+                WHERE run_id = :run_id AND item_id IN :item_ids
+                AND status = 'scheduled' AND DATE(scheduled_pickup) = CURDATE()
+                GROUP BY charity_id
+                """).bindparams(bindparam('item_ids', expanding=True)),
+                {'run_id': run_id, 'item_ids': item_ids}
+            )}
+
+    def charities_for_run(self, run_id: str, item_ids: Iterable) -> pd.DataFrame:
+        """Cached charities with the capacity `run_id` holds for `item_ids` added back
+
+        Scheduling replaces a run's rows for the items it reschedules, so
+        matching them again must not count their earlier bookings as taken.
+        """
+        charities = self.charity_state.frame()
+        own = self.run_reservations(run_id, item_ids) if len(charities) else {}
+        if own:
+            charities = charities.copy(deep=False)
+            charities['available_capacity'] = (charities['available_capacity']
+                                               + charities['charity_id'].map(own).fillna(0.0))
+        return charities
+
+    def _lock_charities(self, conn, charity_ids: List) -> Dict:
+        """Lock charity rows in id order; returns their capacity_kg"""
+        if not charity_ids:
+            return {}
+        # SQLite has no row locks; its write transaction already serialises writers
+        lock = " FOR UPDATE" if conn.dialect.name != 'sqlite' else ""
+        with span('db_query', query='lock_charities'):
+            return dict(conn.execute(
+                text(f"""
+                SELECT charity_id, capacity_kg FROM Charities
+                WHERE charity_id IN :charity_ids
+                ORDER BY charity_id{lock}
+                """).bindparams(bindparam('charity_ids', expanding=True)),
+                {'charity_ids': sorted(charity_ids)}
+            ).all())
+
+    def _schedule_chunk(self, conn, rows: List[Dict]) -> Tuple[List[Dict], List[Tuple], float]:
+        """Replace one run's scheduled rows for a chunk of items, within capacity
+
+        The run's earlier 'scheduled' rows for these items are deleted and
+        the new ones inserted in the same transaction, so a re-run that
+        picks other charities gives back what it booked before instead of
+        booking twice; allocations whose row has already moved past
+        'scheduled' (same idempotency key) are left as they are. Old and
+        new charities are locked in id order so concurrent workers queue
+        instead of deadlocking. Capacity used by all other rows is read
+        under the lock and allocations that no longer fit are dropped.
+        `rows` must hold every row of their items
+        (see item_chunks). Returns the rows written, the change in booked
+        kg as (charity_id, day, new minus previous kg) and the perf_counter
+        time the charity locks were granted.
+        """
+        run_id = rows[0]['run_id']
+        item_ids = sorted({row['item_id'] for row in rows})
+        new_charities = {row['charity_id'] for row in rows}
+
+        # Lock every charity the run's old or new rows touch, then re-read
+        # the old rows under lock in case a concurrent worker moved them
+        capacity, locked_at, row_lock = {}, None, ""
+        while True:
+            previous = conn.execute(
+                text(f"""
+                SELECT charity_id, DATE(scheduled_pickup), quantity FROM RedistributionLogs
+                WHERE run_id = :run_id AND item_id IN :item_ids AND status = 'scheduled'{row_lock}
+                """).bindparams(bindparam('item_ids', expanding=True)),
+                {'run_id': run_id, 'item_ids': item_ids}
+            ).all()
+            missing = (new_charities | {charity_id for charity_id, _, _ in previous}) - set(capacity)
+            if not missing:
+                break
+            capacity.update(self._lock_charities(conn, sorted(missing)))
+            capacity.update(dict.fromkeys(missing - set(capacity), 0))
+            locked_at = locked_at or time.perf_counter()
+            row_lock = " FOR UPDATE" if conn.dialect.name != 'sqlite' else ""
+
+        conn.execute(
+            text("""
+            DELETE FROM RedistributionLogs
+            WHERE run_id = :run_id AND item_id IN :item_ids AND status = 'scheduled'
+            """).bindparams(bindparam('item_ids', expanding=True)),
+            {'run_id': run_id, 'item_ids': item_ids}
+        )
+
+        new_dates = sorted({row['scheduled_pickup'].date() for row in rows})
+        reserved = {
+            (charity_id, _as_date(day)): float(kg) for charity_id, day, kg in conn.execute(
+                text("""
+                SELECT charity_id, DATE(scheduled_pickup), SUM(quantity)
+                FROM RedistributionLogs
+                WHERE charity_id IN :charity_ids
+                AND DATE(scheduled_pickup) IN :dates
+                GROUP BY charity_id, DATE(scheduled_pickup)
+                """).bindparams(bindparam('charity_ids', expanding=True),
+                                bindparam('dates', expanding=True)),
+                {'charity_ids': sorted(new_charities), 'dates': new_dates}
+            )
+        }
+
+        # Keys the run already holds in another status (picked up, cancelled)
+        # stay with that row; the unique index would reject a second one
+        settled = set(conn.execute(
+            text("""
+            SELECT idempotency_key FROM RedistributionLogs
+            WHERE idempotency_key IN :keys
+            """).bindparams(bindparam('keys', expanding=True)),
+            {'keys': [row['idempotency_key'] for row in rows]}
+        ).scalars())
+
+        accepted = []
+        for row in rows:
+            if row['idempotency_key'] in settled:
+                logging.info(f"Skipping {row['item_id']} -> {row['charity_id']}: "
+                             f"already past 'scheduled' in run {run_id}")
+                continue
+            slot = (row['charity_id'], row['scheduled_pickup'].date())
+            used = reserved.get(slot, 0.0) + row['allocated_kg']
+            if used > float(capacity.get(row['charity_id']) or 0) + 1e-6:
+                logging.warning(f"Skipping {row['item_id']} -> {row['charity_id']}: "
+                                f"capacity taken by a concurrent run")
+                continue
+            reserved[slot] = used
+            accepted.append(row)
+
+        if accepted:
+            conn.execute(
+                text("""
+                INSERT INTO RedistributionLogs
+                (item_id, charity_id, quantity, scheduled_pickup, status, run_id, idempotency_key)
+                VALUES (:item_id, :charity_id, :allocated_kg, :scheduled_pickup,
+                        'scheduled', :run_id, :idempotency_key)
+                """),
+                [{key: row[key] for key in ('item_id', 'charity_id', 'allocated_kg',
+                                             'scheduled_pickup', 'run_id', 'idempotency_key')}
+                 for row in accepted]
+            )
+
+        # Recompute rather than increment, so replays and moved rows leave
+        # every touched charity and day equal to the sum of its logs
+        charity_ids = sorted(capacity)
+        dates = sorted(set(new_dates) | {_as_date(day) for _, day, _ in previous})
+        params = {'charity_ids': charity_ids, 'dates': dates}
+        conn.execute(
+            text("""
+            DELETE FROM CharityReservations
+            WHERE charity_id IN :charity_ids AND reservation_date IN :dates
+            """).bindparams(bindparam('charity_ids', expanding=True),
+                            bindparam('dates', expanding=True)),
+            params
+        )
+        conn.execute(
+            text("""
+            INSERT INTO CharityReservations (charity_id, reservation_date, reserved_kg)
+            SELECT charity_id, DATE(scheduled_pickup), SUM(quantity)
+            FROM RedistributionLogs
+            WHERE charity_id IN :charity_ids
+            AND DATE(scheduled_pickup) IN :dates
+            GROUP BY charity_id, DATE(scheduled_pickup)
+            """).bindparams(bindparam('charity_ids', expanding=True),
+                            bindparam('dates', expanding=True)),
+            params
+        )
+
+        # Net change per charity and day: replays and unchanged rows cancel out
+        change = {}
+        for charity_id, day, kg in previous:
+            slot = (charity_id, _as_date(day))
+            change[slot] = change.get(slot, 0.0) - float(kg)
+        for row in accepted:
+            slot = (row['charity_id'], row['scheduled_pickup'].date())
+            change[slot] = change.get(slot, 0.0) + row['allocated_kg']
+        deltas = [(charity_id, day, kg) for (charity_id, day), kg in change.items()
+                  if abs(kg) > 1e-9]
+        return accepted, deltas, locked_at
+
+    def schedule_rows(self, allocations: List[Dict], run_id: str) -> List[Dict]:
+        """RedistributionLogs rows, with idempotency keys, for a run's allocations"""
+        now = datetime.now()
+        seen = {}
+        rows = []
+        for alloc in allocations:
+            item_id, charity_id = _scalar(alloc['item_id']), _scalar(alloc['charity_id'])
+            pair = (item_id, charity_id)
+            part = seen[pair] = seen.get(pair, -1) + 1
+            rows.append({
+                'item_id': item_id,
+                'charity_id': charity_id,
+                'allocated_kg': float(alloc['allocated_kg']),
+                'scheduled_pickup': alloc.get('scheduled_pickup') or now,
+                'run_id': run_id,
+                'idempotency_key': self.idempotency_key(run_id, *pair, part)
+            })
+        return rows
+
+    @staticmethod
+    def item_chunks(rows: List[Dict], chunk_size: int = SCHEDULE_CHUNK_SIZE) -> List[List[Dict]]:
+        """Split schedule rows into chunks of about `chunk_size`, never splitting an item
+
+        Each chunk replaces all of its items' rows, so an item's rows must
+        be written together.
+        """
+        by_item = {}
+        for row in rows:
+            by_item.setdefault(row['item_id'], []).append(row)
+        chunks, chunk = [], []
+        for item_rows in by_item.values():
+            if chunk and len(chunk) + len(item_rows) > chunk_size:
+                chunks.append(chunk)
+                chunk = []
+            chunk.extend(item_rows)
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @traced()
+    def schedule_redistribution(self, allocations: List[Dict], run_id: Optional[str] = None,
+                                chunk_size: int = SCHEDULE_CHUNK_SIZE,
+                                raise_errors: bool = False) -> bool:
+        """Write a run's redistribution schedule for the allocated items, in chunks
+
+        A run (run_id, default today's date) owns its rows: scheduling
+        items again replaces the run's earlier rows for those items, so
+        re-running a pipeline never double-books a charity. Every chunk is
+        its own short transaction that also refreshes CharityReservations.
+        Uses each allocation's planned scheduled_pickup, or the current
+        time when it has not been routed. Throughput and lock-hold times
+        end up in `last_schedule_report`. A database error returns False
+        unless `raise_errors` is set.
+        """
         if not allocations:
             return False
-            
+        run_id = run_id or datetime.now().date().isoformat()
+        rows = self.schedule_rows(allocations, run_id)
+
         try:
-            with self.engine.begin() as conn:
-                conn.execute(
-                    text("""
-                    INSERT INTO RedistributionLogs 
-                    (item_id, charity_id, quantity, scheduled_pickup, status)
-                    VALUES (:item_id, :charity_id, :allocated_kg, NOW(), 'scheduled')
-                    """),
-                    [{
-                        'item_id': alloc['item_id'],
-                        'charity_id': alloc['charity_id'],
-                        'allocated_kg': alloc['allocated_kg']
-                    } for alloc in allocations]
-                )
-            logging.info(f"Scheduled {len(allocations)} redistributions")
-            return True
+            if not self._schedule_schema_ready:
+                self.migrate_schedule_schema()
+            written, lock_hold = 0, []
+            start = time.perf_counter()
+            for chunk in self.item_chunks(rows, chunk_size):
+                with span('db_query', query='schedule_chunk'), self.engine.begin() as conn:
+                    accepted, deltas, locked_at = self._schedule_chunk(conn, chunk)
+                lock_hold.append(time.perf_counter() - locked_at)
+                written += len(accepted)
+                self.charity_state.reserve([charity_id for charity_id, _, _ in deltas],
+                                           [kg for _, _, kg in deltas],
+                                           [day for _, day, _ in deltas])
+            elapsed = time.perf_counter() - start
         except Exception as e:
             logging.error(f"Scheduling failed: {str(e)}")
+            # Part of the batch may have committed; re-read capacity before reuse
+            self.charity_state.mark_stale()
+            if raise_errors:
+                raise
             return False
+        count('redistribution_rows_total', written, outcome='scheduled')
+        count('redistribution_rows_total', len(rows) - written, outcome='skipped')
+        if written < len(rows):
+            # Another worker took capacity the ledger still thought was free
+            self.charity_state.mark_stale()
+
+        self.last_schedule_report = {
+            'run_id': run_id,
+            'rows': written,
+            'skipped': len(rows) - written,
+            'chunks': len(lock_hold),
+            'rows_per_s': round(written / elapsed, 1) if elapsed else None,
+            'lock_hold_ms_avg': round(1e3 * sum(lock_hold) / len(lock_hold), 2),
+            'lock_hold_ms_max': round(1e3 * max(lock_hold), 2)
+        }
+        logging.info(f"Scheduled {written} redistributions for run {run_id} "
+                     f"({self.last_schedule_report['rows_per_s']} rows/s, "
+                     f"lock hold avg {self.last_schedule_report['lock_hold_ms_avg']} ms, "
+                     f"max {self.last_schedule_report['lock_hold_ms_max']} ms)")
+        return written > 0
 
-    def full_redistribution_pipeline(self) -> Optional[pd.DataFrame]:
-        """Automated pipeline with error handling"""
+    @traced()
+    def full_redistribution_pipeline(self, solver: str = 'optimal',
+                                     route_pickups: bool = True,
+                                     vehicles_per_depot: Optional[int] = DEFAULT_VEHICLES_PER_DEPOT,
+                                     run_id: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Automated pipeline with error handling
+
+        Re-running with the same run_id (default today's date) replaces the
+        run's earlier schedule instead of adding to it.
+        """
+        run_id = run_id or datetime.now().date().isoformat()
         try:
             surplus_df = self.get_surplus_items()
             if surplus_df.empty:
                 logging.info("No surplus items found")
                 return None
                 
-            all_allocations = []
-            
-            for _, item in surplus_df.iterrows():
-                allocations = self.find_optimal_recipients(
-                    item['item_id'],
-                    item['surplus_quantity'],
-                    (item['store_lat'], item['store_lon'])
-                )
-                
-                if allocations:
-                    for alloc in allocations:
-                        alloc.update({
-                            'item_id': item['item_id'],
-                            'surplus_location': f"{item['store_lat']},{item['store_lon']}"
-                        })
-                    all_allocations.extend(allocations)
+            # All items are allocated jointly against shared charity capacity,
+            # counting what this run booked for them earlier as free
+            all_allocations = self.match_surplus_batch(
+                surplus_df, solver=solver,
+                charities=self.charities_for_run(run_id, surplus_df['item_id']),
+                hours=self.charity_state.hours
+            )
+
+            if all_allocations and route_pickups:
+                planned = self.plan_pickups(all_allocations,
+                                            vehicles_per_depot=vehicles_per_depot)
+                all_allocations = [a for a in planned if a['scheduled_pickup'] is not None]
+                if len(all_allocations) < len(planned):
+                    # Unrouted surplus stays in inventory and is matched again next run
+                    logging.warning(f"{len(planned) - len(all_allocations)} pickups "
+                                    f"did not fit in today's routes")
             
             if all_allocations:
-                if self.schedule_redistribution(all_allocations):
+                if self.schedule_redistribution(all_allocations, run_id=run_id):
                     return pd.DataFrame(all_allocations)
             return None
             
@@ -265,7 +791,13 @@ class RedistributionSystem:
 
 # Example usage
 if __name__ == "__main__":
+    import sys
+
     rs = RedistributionSystem(max_distance_km=30)
+    rs.migrate_schedule_schema()
+    if '--migrate' in sys.argv[1:]:
+        logging.info("Scheduling schema is up to date")
+        sys.exit(0)
     
     # Test single item allocation
     print("Testing single item allocation:")
@@ -280,4 +812,4 @@ if __name__ == "__main__":
     print("\nRunning full redistribution pipeline:")
     results = rs.full_redistribution_pipeline()
     if results is not None:
-        print(results[['item_id', 'charity_name', 'allocated_kg', 'operating_now']])
\ No newline at end of file
+        print(results[['item_id', 'charity_name', 'allocated_kg', 'tour', 'scheduled_pickup']])
\ No newline at end of file
@@ -0,0 +1,328 @@
+import asyncio
+import bisect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from allocation import SOLVERS
+from redistribution import MYSQL_CONFIG, SCHEDULE_CHUNK_SIZE, RedistributionSystem
+from routing import DEFAULT_VEHICLES_PER_DEPOT
+
+DB_CONCURRENCY = 10  # Queries in flight against MySQL at once
+DB_ACQUIRE_TIMEOUT_S = 2.0  # Wait for a slot this long before answering 503
+MAX_BATCH_ITEMS = 5_000
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (upper bounds in ms, last bucket open)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else None,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {f"le_{bound}": count for bound, count in zip(
+                self.buckets + ['inf'], np.cumsum(self.counts).tolist())}
+        }
+
+
+class MatchItem(BaseModel):
+    item_id: str
+    quantity: float = Field(gt=0)
+    store_lat: float = Field(ge=-90, le=90)
+    store_lon: float = Field(ge=-180, le=180)
+    category: Optional[str] = None  # Looked up in Inventory when omitted
+
+
+class MatchRequest(MatchItem):
+    solver: str = 'optimal'
+
+
+class BatchMatchRequest(BaseModel):
+    items: List[MatchItem]
+    solver: str = 'optimal'
+
+
+class Allocation(BaseModel):
+    item_id: str
+    charity_id: Union[int, str]
+    allocated_kg: float = Field(gt=0)
+    surplus_location: Optional[str] = None
+    scheduled_pickup: Optional[datetime] = None
+
+
+class ScheduleRequest(BaseModel):
+    allocations: List[Allocation]
+    run_id: Optional[str] = None
+    route_pickups: bool = True
+    vehicles_per_depot: Optional[int] = DEFAULT_VEHICLES_PER_DEPOT
+
+
+def _jsonable(allocations: List[Dict]) -> List[Dict]:
+    """Unwrap NumPy scalars so allocations serialise as JSON"""
+    return [{key: value.item() if isinstance(value, np.generic) else value
+             for key, value in alloc.items()} for alloc in allocations]
+
+
+def create_app(system: Optional[RedistributionSystem] = None, async_engine=None,
+               db_concurrency: int = DB_CONCURRENCY) -> FastAPI:
+    """FastAPI service around RedistributionSystem
+
+    Reads and schedule writes go through an async MySQL engine, gated by a
+    semaphore so bursts from store devices queue in the app instead of
+    piling onto the database; so do charity reloads and the schema
+    migration at start-up. Matching runs against the in-memory charity
+    state on a single worker thread, which also serialises ledger updates.
+    """
+    state = {'system': system, 'engine': async_engine}
+    db_slots = asyncio.Semaphore(db_concurrency)
+    state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='charity-state')
+    latency = {}
+
+    async def on_state_thread(func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(state_executor, partial(func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def db_slot():
+        try:
+            await asyncio.wait_for(db_slots.acquire(), DB_ACQUIRE_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Database busy, retry shortly")
+        try:
+            yield
+        finally:
+            db_slots.release()
+
+    async def refresh_charities():
+        """Reload the charity state through the async engine when it is stale"""
+        charity_state = state['system'].charity_state
+        if not await on_state_thread(charity_state.is_stale):
+            return
+        try:
+            async with db_slot():
+                async with state['engine'].connect() as conn:
+                    charities = await conn.run_sync(state['system'].get_charities)
+        except HTTPException:
+            raise
+        except Exception as e:
+            if not len(charity_state):
+                raise HTTPException(status_code=503, detail="Charities unavailable, retry shortly")
+            # Keep matching on the previous state; it stays stale so the next request retries
+            logging.error(f"Charity reload failed, keeping the previous state: {str(e)}")
+            return
+        await on_state_thread(charity_state.load, charities)
+
+    @asynccontextmanager
+    async def lifespan(api: FastAPI):
+        if state['system'] is None:
+            state['system'] = await asyncio.to_thread(RedistributionSystem)
+        if state['engine'] is None:
+            state['engine'] = create_async_engine(
+                f"mysql+aiomysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}"
+                f"@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}",
+                pool_size=db_concurrency,
+                max_overflow=0,
+                pool_pre_ping=True
+            )
+        system = state['system']
+        # Reloads go through the async engine below, never the sync one
+        system.charity_state.auto_refresh = False
+        async with db_slot():
+            async with state['engine'].begin() as conn:
+                await conn.run_sync(system.migrate_schedule_schema)
+        await refresh_charities()
+        yield
+        await state['engine'].dispose()
+        state_executor.shutdown(wait=False)
+
+    api = FastAPI(title="Surplus redistribution", lifespan=lifespan)
+
+    @api.middleware("http")
+    async def record_latency(request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get('route')
+        # One series for unmatched paths, so 404 scans cannot grow the table
+        key = f"{request.method} {route.path if route else 'unmatched'}"
+        latency.setdefault(key, LatencyHistogram()).observe(
+            (time.perf_counter() - start) * 1e3
+        )
+        return response
+
+    async def fill_categories(items: List[MatchItem]) -> List[Dict]:
+        missing = [item.item_id for item in items if item.category is None]
+        categories = {}
+        if missing:
+            async with db_slot():
+                async with state['engine'].connect() as conn:
+                    result = await conn.execute(
+                        text("SELECT item_id, category FROM Inventory WHERE item_id IN :item_ids")
+                        .bindparams(bindparam('item_ids', expanding=True)),
+                        {'item_ids': missing}
+                    )
+                    categories = dict(result.all())
+        rows = []
+        for item in items:
+            category = item.category or categories.get(item.item_id)
+            if not category:
+                raise HTTPException(status_code=404,
+                                    detail=f"No categories found for item {item.item_id}")
+            rows.append({
+                'item_id': item.item_id,
+                'surplus_quantity': item.quantity,
+                'category': category,
+                'store_lat': item.store_lat,
+                'store_lon': item.store_lon
+            })
+        return rows
+
+    async def match(items: List[MatchItem], solver: str) -> List[Dict]:
+        if solver not in SOLVERS:
+            raise HTTPException(status_code=422, detail=f"Unknown solver {solver}")
+        surplus = pd.DataFrame(await fill_categories(items))
+        await refresh_charities()
+        allocations = await on_state_thread(
+            state['system'].match_surplus_batch, surplus, solver=solver
+        )
+        return _jsonable(allocations)
+
+    @api.get("/health")
+    async def health():
+        return {"charities": len(state['system'].charity_state)}
+
+    @api.post("/match")
+    async def match_item(request: MatchRequest):
+        return {"allocations": await match([request], request.solver)}
+
+    @api.post("/match/batch")
+    async def match_batch(request: BatchMatchRequest):
+        if len(request.items) > MAX_BATCH_ITEMS:
+            raise HTTPException(status_code=413,
+                                detail=f"At most {MAX_BATCH_ITEMS} items per request")
+        if not request.items:
+            return {"allocations": []}
+        return {"allocations": await match(request.items, request.solver)}
+
+    @api.post("/schedule")
+    async def schedule(request: ScheduleRequest):
+        system = state['system']
+        allocations = [alloc.model_dump() for alloc in request.allocations]
+        if not allocations:
+            return {"scheduled": 0, "skipped": 0, "allocations": []}
+
+        unrouted = 0
+        if request.route_pickups:
+            if any(alloc['surplus_location'] is None for alloc in allocations):
+                raise HTTPException(status_code=422,
+                                    detail="surplus_location is required to route pickups")
+            await refresh_charities()
+            try:
+                planned = await on_state_thread(
+                    system.plan_pickups, allocations,
+                    vehicles_per_depot=request.vehicles_per_depot
+                )
+            except KeyError as e:
+                raise HTTPException(status_code=404, detail=f"Unknown charity {e}")
+            allocations = [alloc for alloc in planned if alloc['scheduled_pickup'] is not None]
+            unrouted = len(planned) - len(allocations)
+
+        run_id = request.run_id or datetime.now().date().isoformat()
+        rows = system.schedule_rows(allocations, run_id)
+
+        async def reserve(deltas):
+            await on_state_thread(
+                system.charity_state.reserve,
+                [charity_id for charity_id, _, _ in deltas],
+                [kg for _, _, kg in deltas],
+                [day for _, day, _ in deltas]
+            )
+
+        written, deltas, lock_hold = [], [], []
+        start = time.perf_counter()
+        try:
+            for chunk in system.item_chunks(rows, SCHEDULE_CHUNK_SIZE):
+                async with db_slot():
+                    async with state['engine'].begin() as conn:
+                        accepted, chunk_deltas, locked_at = await conn.run_sync(
+                            system._schedule_chunk, chunk
+                        )
+                lock_hold.append(time.perf_counter() - locked_at)
+                written.extend(accepted)
+                deltas.extend(chunk_deltas)
+        except Exception as e:
+            # Chunks committed before the failure still hold capacity
+            await reserve(deltas)
+            await on_state_thread(system.charity_state.mark_stale)
+            if isinstance(e, HTTPException):
+                raise
+            logging.error(f"Scheduling failed after {len(written)} rows: {str(e)}")
+            raise HTTPException(status_code=503,
+                                detail=f"Scheduling failed after {len(written)} of {len(rows)} "
+                                       f"rows; retry the request to finish the run")
+        elapsed = time.perf_counter() - start
+
+        await reserve(deltas)
+        if len(written) < len(rows):
+            await on_state_thread(system.charity_state.mark_stale)
+
+        return {
+            "run_id": run_id,
+            "scheduled": len(written),
+            "skipped": len(rows) - len(written),
+            "unrouted": unrouted,
+            "rows_per_s": round(len(written) / elapsed, 1) if elapsed else None,
+            "lock_hold_ms_max": round(1e3 * max(lock_hold), 2) if lock_hold else None,
+            "allocations": _jsonable(allocations)
+        }
+
+    @api.get("/metrics/latency")
+    async def latency_metrics():
+        return {route: histogram.snapshot() for route, histogram in sorted(latency.items())}
+
+    return api
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    logging.info("Starting redistribution API")
+    uvicorn.run("redistribution_api:app", host="0.0.0.0", port=8001)
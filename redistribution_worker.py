@@ -0,0 +1,315 @@
+import argparse
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from redistribution import RedistributionSystem
+
+CHANGE_LOG_TABLE = 'InventoryChangeLog'
+DEFAULT_MAX_LATENCY_S = 2.0  # Longest an event waits before its item is matched
+DEFAULT_LINGER_S = 0.25  # How long to gather more events once the first arrives
+DEFAULT_MAX_BATCH = 500
+RETRY_BACKOFF_S = (1.0, 60.0)  # First and longest wait before retrying a failed batch
+
+
+class QueueEventSource:
+    """In-process event source, e.g. for tests or an embedding service
+
+    Producers call `publish(item_id)`; the worker drains the queue.
+    Events handed out since the last ack() are put back by rewind().
+    """
+
+    def __init__(self, events: Optional[queue.Queue] = None):
+        self.events = events or queue.Queue()
+        self.pending = []
+
+    def publish(self, item_id: str):
+        self.events.put((item_id, time.time()))
+
+    def poll(self, timeout: float, max_events: int) -> List[Tuple[str, float]]:
+        """Block up to `timeout` for one event, then drain what is already queued"""
+        try:
+            batch = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < max_events:
+            try:
+                batch.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        self.pending.extend(batch)
+        return batch
+
+    def ack(self):
+        """The events polled so far were processed"""
+        self.pending = []
+
+    def rewind(self):
+        """Deliver the unacknowledged events again"""
+        for event in self.pending:
+            self.events.put(event)
+        self.pending = []
+
+
+class ChangeLogEventSource:
+    """Polls a change-log table filled by triggers on Inventory and InventoryStatus
+
+    Only rows with a change_id above the read cursor are read, so every
+    poll is a short index range scan. `last_id` (the committed position)
+    only moves on ack(); rewind() sends the cursor back to it, so a failed
+    batch is read again.
+    """
+
+    def __init__(self, engine, table: str = CHANGE_LOG_TABLE,
+                 poll_interval: float = 0.5, start_id: Optional[int] = None):
+        self.engine = engine
+        self.table = table
+        self.poll_interval = poll_interval
+        self.last_id = start_id if start_id is not None else self._latest_id()
+        self.cursor = self.last_id
+
+    def _latest_id(self) -> int:
+        with self.engine.connect() as conn:
+            return int(conn.execute(
+                text(f"SELECT COALESCE(MAX(change_id), 0) FROM {self.table}")
+            ).scalar())
+
+    def poll(self, timeout: float, max_events: int) -> List[Tuple[str, float]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    text(f"""
+                    SELECT change_id, item_id, UNIX_TIMESTAMP(changed_at)
+                    FROM {self.table}
+                    WHERE change_id > :last_id
+                    ORDER BY change_id
+                    LIMIT :limit
+                    """),
+                    {'last_id': self.cursor, 'limit': max_events}
+                ).all()
+            if rows:
+                self.cursor = rows[-1][0]
+                return [(item_id, float(changed_at)) for _, item_id, changed_at in rows]
+            if time.monotonic() >= deadline:
+                return []
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+
+    def ack(self):
+        self.last_id = self.cursor
+
+    def rewind(self):
+        self.cursor = self.last_id
+
+
+def install_change_log(engine, table: str = CHANGE_LOG_TABLE):
+    """Create the change-log table and the triggers that feed it"""
+    statements = [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            item_id VARCHAR(64) NOT NULL,
+            source VARCHAR(32) NOT NULL,
+            changed_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)
+        )
+        """
+    ]
+    for source, events in (('Inventory', ('INSERT', 'UPDATE')),
+                           ('InventoryStatus', ('INSERT', 'UPDATE'))):
+        for event in events:
+            trigger = f"trg_{source.lower()}_{event.lower()}_changelog"
+            statements.append(f"DROP TRIGGER IF EXISTS {trigger}")
+            statements.append(f"""
+            CREATE TRIGGER {trigger} AFTER {event} ON {source}
+            FOR EACH ROW
+            INSERT INTO {table} (item_id, source) VALUES (NEW.item_id, '{source}')
+            """)
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+class RedistributionWorker:
+    """Re-matches surplus as inventory changes arrive
+
+    Events are gathered into micro-batches: the first event opens a batch,
+    which closes after `linger` seconds (at most `max_latency`) or
+    `max_batch` distinct items, so an event waits for at most that plus
+    the matching time.
+    Only the affected items are re-read and matched, against the
+    system's cached charity state, whose capacity ledger is updated by
+    every write.
+    """
+
+    def __init__(self, system: RedistributionSystem, source,
+                 max_latency: float = DEFAULT_MAX_LATENCY_S,
+                 linger: float = DEFAULT_LINGER_S,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 solver: str = 'optimal', route_pickups: bool = True):
+        self.system = system
+        self.source = source
+        self.max_latency = max_latency
+        self.linger = min(linger, max_latency)
+        self.max_batch = max_batch
+        self.solver = solver
+        self.route_pickups = route_pickups
+        self.latencies = []
+        self.stats = {'batches': 0, 'events': 0, 'items': 0, 'allocations': 0, 'retries': 0}
+        self.retry_delay = 0.0
+
+    def collect(self) -> Dict[str, float]:
+        """Next micro-batch as {item_id: oldest event time}"""
+        batch = {}
+        deadline = None
+        while len(batch) < self.max_batch:
+            timeout = self.max_latency if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            events = self.source.poll(timeout, self.max_batch - len(batch))
+            if not events:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.linger
+            for item_id, occurred in events:
+                batch[item_id] = min(occurred, batch.get(item_id, occurred))
+            self.stats['events'] += len(events)
+        return batch
+
+    def process(self, item_ids: Iterable[str]) -> List[Dict]:
+        """Match and schedule the current surplus of the given items
+
+        Items are rescheduled within today's run, replacing what earlier
+        events booked for them. Database errors are raised, so run_once
+        retries the batch instead of acknowledging it.
+        """
+        run_id = datetime.now().date().isoformat()
+        surplus = self.system.get_surplus_items(item_ids=list(item_ids), raise_errors=True)
+        if surplus.empty:
+            return []
+        allocations = self.system.match_surplus_batch(
+            surplus, solver=self.solver,
+            charities=self.system.charities_for_run(run_id, surplus['item_id']),
+            hours=self.system.charity_state.hours
+        )
+        if allocations and self.route_pickups:
+            allocations = [a for a in self.system.plan_pickups(allocations)
+                           if a['scheduled_pickup'] is not None]
+        if allocations and self.system.schedule_redistribution(allocations, run_id=run_id,
+                                                               raise_errors=True):
+            return allocations
+        return []
+
+    def run_once(self, stop: Optional[threading.Event] = None) -> int:
+        batch = self.collect()
+        if not batch:
+            return 0
+        try:
+            allocations = self.process(batch)
+        except Exception as e:
+            # Nothing is acknowledged, so the same events come back after a backoff
+            self.source.rewind()
+            self.retry_delay = min(max(2 * self.retry_delay, RETRY_BACKOFF_S[0]), RETRY_BACKOFF_S[1])
+            self.stats['retries'] += 1
+            logging.error(f"Redistribution batch failed, retrying in {self.retry_delay:.0f}s: "
+                          f"{str(e)}", exc_info=True)
+            (stop or threading.Event()).wait(self.retry_delay)
+            return 0
+        self.source.ack()
+        self.retry_delay = 0.0
+
+        done = time.time()
+        latencies = [done - occurred for occurred in batch.values()]
+        self.latencies.extend(latencies)
+        self.stats['batches'] += 1
+        self.stats['items'] += len(batch)
+        self.stats['allocations'] += len(allocations)
+        logging.info(f"Matched {len(batch)} changed items into {len(allocations)} allocations, "
+                     f"event-to-schedule latency max {max(latencies):.2f}s")
+        return len(batch)
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """Process batches until `stop` is set"""
+        stop = stop or threading.Event()
+        logging.info("Redistribution worker started")
+        while not stop.is_set():
+            self.run_once(stop)
+        logging.info(f"Redistribution worker stopped: {self.report()}")
+
+    def report(self) -> Dict:
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            **self.stats,
+            'latency_p50_s': round(float(np.percentile(latencies, 50)), 3),
+            'latency_p95_s': round(float(np.percentile(latencies, 95)), 3),
+            'latency_max_s': round(float(latencies.max()), 3)
+        }
+
+
+def verify_retry_on_db_failure():
+    """Check that a batch whose database reads fail goes back to the queue
+
+    The worker runs against an empty in-memory SQLite database, where the
+    surplus query fails; the batch must be rewound, not acknowledged.
+    """
+    from sqlalchemy import create_engine
+
+    source = QueueEventSource()
+    for item_id in ('a', 'b', 'c'):
+        source.publish(item_id)
+    worker = RedistributionWorker(RedistributionSystem(engine=create_engine('sqlite://')),
+                                  source, max_latency=0.1, linger=0.0)
+    stop = threading.Event()
+    stop.set()  # Skip the backoff wait
+    worker.run_once(stop)
+    requeued = sorted(item_id for item_id, _ in list(source.events.queue))
+    if worker.stats['retries'] != 1 or requeued != ['a', 'b', 'c']:
+        raise RuntimeError(f"Failed batch was not retried: {worker.stats}, queue {requeued}")
+    logging.info("Verified: a failed batch is put back on the queue")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-driven surplus redistribution worker")
+    parser.add_argument('--install', action='store_true',
+                        help="Create the change-log table and triggers, then exit")
+    parser.add_argument('--verify', action='store_true',
+                        help="Check that a batch failing on the database is retried, then exit")
+    parser.add_argument('--max-latency', type=float, default=DEFAULT_MAX_LATENCY_S)
+    parser.add_argument('--linger', type=float, default=DEFAULT_LINGER_S)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--solver', choices=['optimal', 'greedy'], default='optimal')
+    parser.add_argument('--max-distance', type=int, default=30)
+    args = parser.parse_args()
+
+    if args.verify:
+        verify_retry_on_db_failure()
+        return
+    system = RedistributionSystem(max_distance_km=args.max_distance)
+    system.migrate_schedule_schema()
+    if args.install:
+        install_change_log(system.engine)
+        logging.info(f"Installed {CHANGE_LOG_TABLE} and triggers")
+        return
+
+    worker = RedistributionWorker(
+        system,
+        ChangeLogEventSource(system.engine, poll_interval=args.poll_interval),
+        max_latency=args.max_latency,
+        linger=args.linger,
+        max_batch=args.max_batch,
+        solver=args.solver
+    )
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logging.info(f"Redistribution worker stopped: {worker.report()}")
+
+
+if __name__ == "__main__":
+    main()
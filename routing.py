@@ -0,0 +1,211 @@
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from geo import haversine_km
+from operating_hours import OperatingHoursIndex, minute_of_week
+
+AVERAGE_SPEED_KMH = 20  # Typical urban van speed in Mumbai traffic
+SERVICE_MINUTES = 10  # Unloading time per stop
+DEFAULT_VEHICLE_CAPACITY_KG = 500
+DEFAULT_SHIFT_HOURS = 12
+DEFAULT_VEHICLES_PER_DEPOT = 10  # Vans per store; bounds the tours planned per depot
+
+
+class _DepotRouter:
+    """Plans the tours leaving one depot (store)"""
+
+    def __init__(self, depot, lat, lon, kg, rows, hours, base_minute, horizon,
+                 vehicle_capacity_kg, speed_kmh, service_minutes):
+        self.depot = depot
+        self.lat, self.lon, self.kg, self.rows = lat, lon, kg, rows
+        self.hours = hours
+        self.base_minute = base_minute
+        self.horizon = horizon
+        self.capacity = vehicle_capacity_kg
+        self.minutes_per_km = 60 / speed_kmh
+        self.service = service_minutes
+
+    def _travel(self, from_lat, from_lon, to_lat, to_lon):
+        return haversine_km(from_lat, from_lon, to_lat, to_lon) * self.minutes_per_km
+
+    def schedule(self, route, start):
+        """Service start minute at each stop and the depot return minute
+
+        Returns None when a stop cannot be served inside its opening hours
+        before the end of the shift.
+        """
+        lat, lon = self.depot
+        t = start
+        times = []
+        for stop in route:
+            t += self._travel(lat, lon, self.lat[stop], self.lon[stop])
+            t += self.hours.minutes_until_open([self.rows[stop]], [self.base_minute + t])[0]
+            if t + self.service > self.horizon:
+                return None
+            times.append(t)
+            t += self.service
+            lat, lon = self.lat[stop], self.lon[stop]
+        return times, t + self._travel(lat, lon, *self.depot)
+
+    def build_tour(self, remaining, start):
+        """Nearest-in-time construction: always serve the stop reachable earliest"""
+        route = []
+        lat, lon = self.depot
+        t, load = start, 0.0
+        while True:
+            candidates = np.flatnonzero(remaining & (self.kg <= self.capacity - load))
+            if not len(candidates):
+                break
+            arrive = t + self._travel(lat, lon, self.lat[candidates], self.lon[candidates])
+            begin = arrive + self.hours.minutes_until_open(
+                self.rows[candidates], self.base_minute + arrive
+            )
+            feasible = begin + self.service <= self.horizon
+            if not feasible.any():
+                break
+            best = np.argmin(np.where(feasible, begin, np.inf))
+            stop = candidates[best]
+            route.append(stop)
+            remaining[stop] = False
+            t = begin[best] + self.service
+            load += self.kg[stop]
+            lat, lon = self.lat[stop], self.lon[stop]
+        return route
+
+    def two_opt(self, route, start, max_passes=20):
+        """Improve a tour with 2-opt moves that keep every stop inside its hours"""
+        if len(route) < 3:
+            return route
+        best = self.schedule(route, start)
+        for _ in range(max_passes):
+            points = np.r_[[self.depot], np.c_[self.lat[route], self.lon[route]], [self.depot]]
+            dist = haversine_km(points[:, None, 0], points[:, None, 1],
+                                points[None, :, 0], points[None, :, 1])
+            n = len(route)
+            i, j = np.triu_indices(n, k=1)
+            # Reverse route[i..j]: edges (i-1, i) and (j, j+1) in padded positions
+            gain = (dist[i, i + 1] + dist[j + 1, j + 2]) - (dist[i, j + 1] + dist[i + 1, j + 2])
+            improved = False
+            for move in np.argsort(-gain):
+                if gain[move] <= 1e-9:
+                    break
+                a, b = i[move], j[move]
+                candidate = route[:a] + route[a:b + 1][::-1] + route[b + 1:]
+                result = self.schedule(candidate, start)
+                if result is not None and result[1] < best[1]:
+                    route, best, improved = candidate, result, True
+                    break
+            if not improved:
+                break
+        return route
+
+
+def plan_routes(stops: pd.DataFrame, hours: OperatingHoursIndex,
+                start_time: Optional[datetime] = None,
+                vehicle_capacity_kg: float = DEFAULT_VEHICLE_CAPACITY_KG,
+                vehicles_per_depot: Optional[int] = DEFAULT_VEHICLES_PER_DEPOT,
+                shift_hours: float = DEFAULT_SHIFT_HOURS,
+                speed_kmh: float = AVERAGE_SPEED_KMH,
+                service_minutes: float = SERVICE_MINUTES) -> pd.DataFrame:
+    """Group deliveries into capacity- and hours-feasible vehicle tours
+
+    `stops` has one row per delivery with depot_lat, depot_lon, lat, lon,
+    kg and charity_row (the charity's row in `hours`). Deliveries larger
+    than a vehicle must be split beforehand. Tours are built per depot by
+    nearest-in-time insertion and refined with 2-opt; later tours start
+    when one of the depot's `vehicles_per_depot` vehicles returns. None
+    allows one vehicle per stop, which serves every stop that fits the
+    shift but rescans all remaining stops per tour: in benchmark(), 5,000
+    stops from one depot take about 7s unbounded, against about 1s with
+    the default fleet.
+    Returns `stops` with vehicle, tour, sequence and scheduled_pickup
+    columns; stops that cannot be served within the shift get NaT.
+    """
+    start_time = start_time or datetime.now()
+    base_minute = minute_of_week(start_time)
+    horizon = shift_hours * 60
+
+    vehicle_of = np.full(len(stops), -1)
+    tour_of = np.full(len(stops), -1)
+    sequence_of = np.full(len(stops), -1)
+    service_minute = np.full(len(stops), np.nan)
+    tour_id = 0
+
+    for (depot_lat, depot_lon), group in stops.groupby(['depot_lat', 'depot_lon'], sort=False):
+        positions = stops.index.get_indexer(group.index)
+        router = _DepotRouter(
+            (depot_lat, depot_lon),
+            group['lat'].to_numpy(dtype=float), group['lon'].to_numpy(dtype=float),
+            group['kg'].to_numpy(dtype=float), group['charity_row'].to_numpy(),
+            hours, base_minute, horizon, vehicle_capacity_kg, speed_kmh, service_minutes
+        )
+        remaining = np.ones(len(group), dtype=bool)
+        n_vehicles = vehicles_per_depot or len(group)
+        fleet = [(0.0, vehicle) for vehicle in range(n_vehicles)]
+
+        while remaining.any() and fleet:
+            available, vehicle = heapq.heappop(fleet)
+            route = router.build_tour(remaining, available)
+            if not route:
+                break
+            route = router.two_opt(route, available)
+            times, returned = router.schedule(route, available)
+            served = positions[route]
+            vehicle_of[served] = vehicle
+            tour_of[served] = tour_id
+            sequence_of[served] = np.arange(len(route))
+            service_minute[served] = times
+            tour_id += 1
+            if returned < horizon:
+                heapq.heappush(fleet, (returned, vehicle))
+
+    scheduled_pickup = pd.Series(pd.NaT, index=stops.index, dtype='datetime64[ns]')
+    scheduled = ~np.isnan(service_minute)
+    scheduled_pickup[scheduled] = [
+        start_time + timedelta(minutes=float(m)) for m in service_minute[scheduled]
+    ]
+    return stops.assign(vehicle=vehicle_of, tour=tour_of, sequence=sequence_of,
+                        scheduled_pickup=scheduled_pickup)
+
+
+def benchmark(n_stops=5_000, n_depots=50, n_charities=300, seed=0,
+              vehicles_per_depot=DEFAULT_VEHICLES_PER_DEPOT):
+    """Plan tours for synthetic Mumbai deliveries and report the timing"""
+    rng = np.random.default_rng(seed)
+    depots = np.c_[rng.uniform(18.9, 19.3, n_depots), rng.uniform(72.8, 73.0, n_depots)]
+    charity_coords = np.c_[rng.uniform(18.9, 19.3, n_charities), rng.uniform(72.8, 73.0, n_charities)]
+    slots = ['{"daily": "06:00-21:00"}', '{"weekdays": "10:00-18:00"}',
+             '{"daily": "11:00-15:00, 18:00-21:00"}', '{"night": "20:00-06:00"}']
+    hours = OperatingHoursIndex(rng.choice(slots, n_charities))
+
+    depot = rng.integers(0, n_depots, n_stops)
+    charity = rng.integers(0, n_charities, n_stops)
+    stops = pd.DataFrame({
+        'depot_lat': depots[depot, 0], 'depot_lon': depots[depot, 1],
+        'lat': charity_coords[charity, 0], 'lon': charity_coords[charity, 1],
+        'kg': rng.gamma(2.0, 20.0, n_stops).clip(1, DEFAULT_VEHICLE_CAPACITY_KG),
+        'charity_row': charity
+    })
+
+    start = time.perf_counter()
+    plan = plan_routes(stops, hours, start_time=datetime(2025, 1, 27, 8, 0),
+                       vehicles_per_depot=vehicles_per_depot)
+    elapsed = time.perf_counter() - start
+    scheduled = plan['scheduled_pickup'].notna()
+    print(f"Planned {n_stops} stops from {n_depots} depots "
+          f"({vehicles_per_depot or 'unbounded'} vehicles each) in {elapsed:.2f}s: "
+          f"{plan.loc[scheduled, 'tour'].nunique()} tours, "
+          f"{scheduled.sum()} stops scheduled, {(~scheduled).sum()} left for tomorrow")
+    return plan
+
+
+if __name__ == "__main__":
+    benchmark(n_stops=500, n_depots=5)
+    benchmark()
+    benchmark(n_depots=1)
+    benchmark(n_depots=1, vehicles_per_depot=None)
@@ -0,0 +1,453 @@
+import argparse
+import logging
+import os
+import re
+import resource
+import sqlite3
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# Database configuration
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "abhi1234",
+    "database": "food_demand_db"
+}
+
+DEFAULT_BATCH_ROWS = 200_000  # Rows per table buffered before a sink write
+READ_BLOCK = 1 << 20  # Characters read at a time from one INSERT statement
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+_CREATE = re.compile(r"^CREATE TABLE `(?P<table>[^`]+)`")
+_COLUMN = re.compile(r"^\s*`(?P<name>[^`]+)`\s+(?P<type>\w+)")
+_INSERT = re.compile(r"^INSERT INTO `(?P<table>[^`]+)` VALUES ")
+# One SQL literal; punctuation between tuples is skipped by findall
+_VALUE = re.compile(r"'(?:[^'\\]|\\.)*'|NULL|0x[0-9A-Fa-f]+|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_ESCAPED = re.compile(r"\\.", re.DOTALL)
+_UNESCAPE = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a', 'b': '\b'}
+
+INTEGER_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint', 'year'}
+FLOAT_TYPES = {'decimal', 'numeric', 'float', 'double', 'real'}
+DATE_TYPES = {'date': '%Y-%m-%d', 'datetime': '%Y-%m-%d %H:%M:%S', 'timestamp': '%Y-%m-%d %H:%M:%S'}
+SQLITE_AFFINITY = {'int': 'INTEGER', 'float': 'REAL', 'date': 'TEXT', 'str': 'TEXT'}
+
+
+class TableSchema:
+    """Column names and kinds ('int', 'float', 'date', 'str') from a CREATE TABLE"""
+
+    def __init__(self, name: str, ddl: str):
+        self.name = name
+        self.ddl = ddl
+        self.columns: List[str] = []
+        self.sql_types: List[str] = []
+        for line in ddl.splitlines()[1:]:
+            match = _COLUMN.match(line)
+            if match:
+                self.columns.append(match.group('name'))
+                self.sql_types.append(match.group('type').lower())
+
+    def kind(self, sql_type: str) -> str:
+        if sql_type in INTEGER_TYPES:
+            return 'int'
+        if sql_type in FLOAT_TYPES:
+            return 'float'
+        if sql_type in DATE_TYPES:
+            return 'date'
+        return 'str'
+
+    @property
+    def kinds(self) -> List[str]:
+        return [self.kind(t) for t in self.sql_types]
+
+
+def _unescape(value: str) -> str:
+    return _ESCAPED.sub(lambda m: _UNESCAPE.get(m.group()[1], m.group()[1]), value)
+
+
+def _safe_cut(buffer: str) -> int:
+    """Offset just past the last complete tuple in `buffer`, or 0
+
+    A '),(' only separates tuples outside string literals, i.e. where the
+    number of unescaped quotes before it is even.
+    """
+    position = buffer.rfind('),(')
+    while position > 0:
+        if _ESCAPED.sub('', buffer[:position]).count("'") % 2 == 0:
+            return position + 1
+        position = buffer.rfind('),(', 0, position)
+    return 0
+
+
+def _value_blocks(first: str, source: TextIO) -> Iterator[str]:
+    """Pieces of one INSERT's VALUES list, each holding whole tuples only
+
+    A statement ends at a raw newline (mysqldump escapes newlines inside
+    strings), so a multi-megabyte line is read in READ_BLOCK pieces and
+    never held in memory at once.
+    """
+    buffer = first
+    while not buffer.endswith('\n'):
+        more = source.readline(READ_BLOCK)
+        if not more:
+            break
+        buffer += more
+        cut = _safe_cut(buffer)
+        if cut:
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    yield buffer
+
+
+def read_schemas(path: str) -> Dict[str, TableSchema]:
+    """Table schemas from a dump's CREATE TABLE statements, skipping the data"""
+    schemas: Dict[str, TableSchema] = {}
+    ddl: Optional[List[str]] = None
+    with open(path, encoding='utf-8', errors='replace') as source:
+        for line in source:
+            if ddl is not None:
+                ddl.append(line)
+                if line.startswith(')'):
+                    schema = TableSchema(_CREATE.match(ddl[0]).group('table'), ''.join(ddl))
+                    schemas[schema.name] = schema
+                    ddl = None
+            elif _CREATE.match(line):
+                ddl = [line]
+    return schemas
+
+
+def to_columns(tokens: List[str], schema: TableSchema) -> pd.DataFrame:
+    """Typed DataFrame from a flat list of SQL literals, row-major"""
+    width = len(schema.columns)
+    if len(tokens) % width:
+        raise ValueError(f"{schema.name}: {len(tokens)} values do not split into "
+                         f"rows of {width} columns")
+    grid = np.array(tokens, dtype=object).reshape(-1, width)
+    columns = {}
+    for i, (name, sql_type) in enumerate(zip(schema.columns, schema.sql_types)):
+        raw = pd.Series(grid[:, i], dtype=object)
+        null = raw == 'NULL'
+        kind = schema.kind(sql_type)
+        if kind in ('int', 'float'):
+            values = pd.to_numeric(raw.mask(null), errors='coerce')
+            columns[name] = values.astype('Int64' if kind == 'int' else 'float64')
+            continue
+        values = raw.mask(null).str.slice(1, -1)
+        if kind == 'date':
+            columns[name] = pd.to_datetime(values, format=DATE_TYPES[sql_type], errors='coerce')
+            continue
+        escaped = values.str.contains('\\', regex=False, na=False)
+        if escaped.any():
+            values[escaped] = values[escaped].map(_unescape)
+        columns[name] = values
+    return pd.DataFrame(columns)
+
+
+def iter_dump(source: TextIO, batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[tuple]:
+    """Yield ('schema', TableSchema) and ('rows', TableSchema, DataFrame) events
+
+    Rows are buffered per table and released every `batch_rows`, so memory
+    depends on the batch size rather than on the dump size.
+    """
+    schemas: Dict[str, TableSchema] = {}
+    pending: Dict[str, list] = {}
+    pending_rows: Dict[str, int] = {}
+
+    def flush(table):
+        if pending.get(table):
+            frame = pd.concat(pending.pop(table), ignore_index=True)
+            pending_rows[table] = 0
+            return ('rows', schemas[table], frame)
+        return None
+
+    ddl: Optional[List[str]] = None
+    while True:
+        line = source.readline(READ_BLOCK)
+        if not line:
+            break
+        # Only INSERT statements may be left partly unread; finish other lines
+        while not line.endswith('\n') and not _INSERT.match(line):
+            more = source.readline(READ_BLOCK)
+            if not more:
+                break
+            line += more
+        if ddl is not None:
+            ddl.append(line)
+            if line.startswith(')'):
+                schema = TableSchema(_CREATE.match(ddl[0]).group('table'), ''.join(ddl))
+                schemas[schema.name] = schema
+                ddl = None
+                yield ('schema', schema)
+            continue
+        if _CREATE.match(line):
+            ddl = [line]
+            continue
+        match = _INSERT.match(line)
+        if not match:
+            continue
+        table = match.group('table')
+        schema = schemas[table]
+        for block in _value_blocks(line[match.end():], source):
+            tokens = _VALUE.findall(block)
+            if not tokens:
+                continue
+            pending.setdefault(table, []).append(to_columns(tokens, schema))
+            pending_rows[table] = pending_rows.get(table, 0) + len(tokens) // len(schema.columns)
+            if pending_rows[table] >= batch_rows:
+                yield flush(table)
+    for table in list(pending):
+        event = flush(table)
+        if event:
+            yield event
+
+
+class SQLiteSink:
+    """Embedded SQLite file; dates are stored as ISO text"""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+
+    def create(self, schema: TableSchema):
+        columns = ", ".join(f'"{name}" {SQLITE_AFFINITY[kind]}'
+                            for name, kind in zip(schema.columns, schema.kinds))
+        self.connection.execute(f'DROP TABLE IF EXISTS "{schema.name}"')
+        self.connection.execute(f'CREATE TABLE "{schema.name}" ({columns})')
+
+    def write(self, schema: TableSchema, frame: pd.DataFrame):
+        frame = frame.copy()
+        for name, sql_type in zip(schema.columns, schema.sql_types):
+            if sql_type in DATE_TYPES:
+                frame[name] = frame[name].dt.strftime(DATE_TYPES[sql_type])
+        frame = frame.astype(object).where(frame.notna(), None)
+        placeholders = ", ".join("?" * len(schema.columns))
+        with self.connection:
+            self.connection.executemany(f'INSERT INTO "{schema.name}" VALUES ({placeholders})',
+                                        frame.itertuples(index=False, name=None))
+
+    def close(self):
+        self.connection.close()
+
+
+class DuckDBSink:
+    """Embedded DuckDB file, loaded straight from the DataFrame batches"""
+
+    def __init__(self, path: str):
+        import duckdb  # Optional dependency, only needed for this sink
+        self.connection = duckdb.connect(path)
+        self._created = set()
+
+    def create(self, schema: TableSchema):
+        self.connection.execute(f'DROP TABLE IF EXISTS "{schema.name}"')
+        self._created.discard(schema.name)
+
+    def write(self, schema: TableSchema, frame: pd.DataFrame):
+        self.connection.register('batch', frame)
+        if schema.name in self._created:
+            self.connection.execute(f'INSERT INTO "{schema.name}" SELECT * FROM batch')
+        else:
+            self.connection.execute(f'CREATE TABLE "{schema.name}" AS SELECT * FROM batch')
+            self._created.add(schema.name)
+        self.connection.unregister('batch')
+
+    def close(self):
+        self.connection.close()
+
+
+class ParquetSink:
+    """One Parquet file per table in `directory`, one row group per batch"""
+
+    def __init__(self, directory: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+        self.directory = directory
+        self.writers = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, schema: TableSchema):
+        writer = self.writers.pop(schema.name, None)
+        if writer is not None:
+            writer.close()
+
+    def write(self, schema: TableSchema, frame: pd.DataFrame):
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        writer = self.writers.get(schema.name)
+        if writer is None:
+            writer = self.writers[schema.name] = self.pq.ParquetWriter(
+                os.path.join(self.directory, f"{schema.name}.parquet"), table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+# LOAD DATA's escapes with ESCAPED BY '\\'; NULL is written as a bare \N
+_LOAD_DATA_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def to_load_data_lines(schema: TableSchema, frame: pd.DataFrame) -> pd.Series:
+    """One tab-separated LOAD DATA line per row, unquoted and backslash-escaped"""
+    fields = []
+    for name, sql_type in zip(schema.columns, schema.sql_types):
+        column = frame[name]
+        if sql_type in DATE_TYPES:
+            values = column.dt.strftime(DATE_TYPES[sql_type])
+        else:
+            values = column.astype(str).str.translate(_LOAD_DATA_ESCAPES)
+        fields.append(values.where(column.notna(), '\\N').astype(object))
+    return fields[0].str.cat(fields[1:], sep='\t') if len(fields) > 1 else fields[0]
+
+
+def from_load_data_line(line: str) -> List[Optional[str]]:
+    """Field values of one LOAD DATA line as MySQL reads them back"""
+    return [None if field == '\\N' else _unescape(field) for field in line.split('\t')]
+
+
+def check_load_data_round_trip():
+    """Raise if awkward strings do not survive the MySQL bulk-load encoding"""
+    schema = TableSchema('roundtrip', "CREATE TABLE `roundtrip` (\n  `id` int,\n  `note` varchar(64)\n)")
+    notes = [None, 'tab\there', 'new\nline', 'carriage\rreturn', 'say "hi"', "it's",
+             'back\\slash', '\\N', 'NULL', '']
+    frame = pd.DataFrame({'id': pd.array(range(len(notes)), dtype='Int64'),
+                          'note': pd.Series(notes, dtype=object)})
+    for i, line in enumerate(to_load_data_lines(schema, frame)):
+        if '\n' in line:
+            raise ValueError(f"Row {i} spans more than one line: {line!r}")
+        decoded = from_load_data_line(line)
+        if decoded != [str(i), notes[i]]:
+            raise ValueError(f"Row {i} read back as {decoded!r}, expected {notes[i]!r}")
+
+
+class MySQLSink:
+    """MySQL via LOAD DATA LOCAL INFILE, replaying the dump's own DDL"""
+
+    def __init__(self, url: Optional[str] = None):
+        url = url or (f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}"
+                      f"@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}")
+        self.engine = create_engine(url, connect_args={'local_infile': True})
+
+    def create(self, schema: TableSchema):
+        with self.engine.begin() as conn:
+            conn.execute(text("SET FOREIGN_KEY_CHECKS=0"))
+            conn.execute(text(f"DROP TABLE IF EXISTS `{schema.name}`"))
+            conn.execute(text(schema.ddl.rstrip().rstrip(';')))
+
+    def write(self, schema: TableSchema, frame: pd.DataFrame):
+        if frame.empty:
+            return
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False) as f:
+            f.write('\n'.join(to_load_data_lines(schema, frame)))
+            f.write('\n')
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("SET FOREIGN_KEY_CHECKS=0, UNIQUE_CHECKS=0"))
+                conn.execute(text(
+                    f"LOAD DATA LOCAL INFILE :path INTO TABLE `{schema.name}` "
+                    f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(f'`{c}`' for c in schema.columns)})"
+                ), {'path': f.name})
+        finally:
+            os.remove(f.name)
+
+    def close(self):
+        self.engine.dispose()
+
+
+def load_dump(path: str, sinks: list, batch_rows: int = DEFAULT_BATCH_ROWS,
+              tables: Optional[List[str]] = None) -> Dict[str, int]:
+    """Stream a mysqldump file into every sink; returns rows loaded per table"""
+    counts: Dict[str, int] = {}
+    with open(path, encoding='utf-8', errors='replace') as source:
+        for event in iter_dump(source, batch_rows):
+            schema = event[1]
+            if tables and schema.name not in tables:
+                continue
+            if event[0] == 'schema':
+                for sink in sinks:
+                    sink.create(schema)
+                counts[schema.name] = 0
+            else:
+                for sink in sinks:
+                    sink.write(schema, event[2])
+                counts[schema.name] += len(event[2])
+    for sink in sinks:
+        sink.close()
+    return counts
+
+
+def scale_dump(path: str, output: str, factor: int):
+    """Write a copy of the dump with every INSERT statement repeated `factor` times"""
+    with open(path, encoding='utf-8') as source, open(output, 'w', encoding='utf-8') as out:
+        for line in source:
+            out.write(line * factor if _INSERT.match(line) else line)
+
+
+def benchmark(path: str = 'data.sql', factor: int = 50, batch_rows: int = DEFAULT_BATCH_ROWS):
+    """Load a scaled-up copy of the dump into SQLite and Parquet"""
+    check_load_data_round_trip()
+    with tempfile.TemporaryDirectory() as tmp:
+        scaled = os.path.join(tmp, 'scaled.sql')
+        scale_dump(path, scaled, factor)
+        size_mb = os.path.getsize(scaled) / 1e6
+        for name, make_sink in [('sqlite', lambda: SQLiteSink(os.path.join(tmp, 'dump.db'))),
+                                ('parquet', lambda: ParquetSink(os.path.join(tmp, 'parquet')))]:
+            start = time.perf_counter()
+            counts = load_dump(scaled, [make_sink()], batch_rows)
+            elapsed = time.perf_counter() - start
+            rows = sum(counts.values())
+            # Peak resident memory of the whole process, which streams the dump
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            logging.info(f"{name}: {rows:,} rows from {size_mb:.0f} MB ({factor}x) in {elapsed:.1f}s "
+                         f"({rows / elapsed:,.0f} rows/s, {size_mb / elapsed:.1f} MB/s, "
+                         f"peak RSS {peak_mb:.0f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a mysqldump file into columnar batches")
+    parser.add_argument('dump', nargs='?', default='data.sql')
+    parser.add_argument('--sqlite', help="SQLite file to load into")
+    parser.add_argument('--duckdb', help="DuckDB file to load into")
+    parser.add_argument('--parquet', help="Directory for one Parquet file per table")
+    parser.add_argument('--mysql', action='store_true', help="Bulk load into MYSQL_CONFIG")
+    parser.add_argument('--tables', nargs='+', help="Only load these tables")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument('--benchmark', type=int, nargs='?', const=50, metavar='FACTOR',
+                        help="Benchmark on the dump scaled up by FACTOR")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.dump, args.benchmark, args.batch_rows)
+        return
+    sinks = []
+    if args.sqlite:
+        sinks.append(SQLiteSink(args.sqlite))
+    if args.duckdb:
+        sinks.append(DuckDBSink(args.duckdb))
+    if args.parquet:
+        sinks.append(ParquetSink(args.parquet))
+    if args.mysql:
+        sinks.append(MySQLSink())
+    if not sinks:
+        parser.error("Choose at least one of --sqlite, --duckdb, --parquet or --mysql")
+
+    start = time.perf_counter()
+    counts = load_dump(args.dump, sinks, args.batch_rows, args.tables)
+    for table, rows in counts.items():
+        logging.info(f"{table}: {rows:,} rows")
+    logging.info(f"Loaded {sum(counts.values()):,} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Shared Streamlit caching layer for the dashboards
+
+Engines, API sessions and models are cached as resources (one per server
+process). Query and API results are cached as data with a TTL and keyed on
+their filter arguments, so repeated widget states are served from memory.
+The invalidate_* hooks clear a group of cached results after writes.
+"""
+import json
+import logging
+
+import pandas as pd
+import requests
+import streamlit as st
+from sqlalchemy import create_engine, text
+
+from geo import HAVERSINE_SQL
+from operating_hours import OperatingHoursIndex
+
+# Database configuration
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "abhi1234",
+    "database": "food_demand_db"
+}
+
+API_BASE_URL = "http://localhost:8000"
+
+# Cache lifetimes in seconds
+ANALYTICS_TTL = 3600  # Predictions refresh hourly
+API_TTL = 300
+CHARITY_TTL = 600
+CHARITY_FINGERPRINT_TTL = 30  # How often the charity index checks for changes
+
+
+@st.cache_resource
+def get_engine():
+    return create_engine(
+        f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}"
+        f"@{MYSQL_CONFIG['host']}/{MYSQL_CONFIG['database']}",
+        pool_pre_ping=True
+    )
+
+
+@st.cache_resource
+def get_waste_analyzer():
+    """Load the trained models and database connection once per process"""
+    from core import WasteAnalyzer
+    return WasteAnalyzer()
+
+
+@st.cache_resource
+def get_api_session():
+    return requests.Session()
+
+
+# WasteAnalyzer results
+
+@st.cache_data(ttl=ANALYTICS_TTL, show_spinner="Predicting production waste...")
+def predict_production_waste(start_date=None, end_date=None, crop_types=None):
+    return get_waste_analyzer().predict_production_waste(start_date, end_date, crop_types)
+
+
+@st.cache_data(ttl=ANALYTICS_TTL, show_spinner="Detecting retail anomalies...")
+def detect_retail_anomalies(start_date=None, end_date=None, store_ids=None, products=None):
+    return get_waste_analyzer().detect_retail_anomalies(start_date, end_date, store_ids, products)
+
+
+@st.cache_data(ttl=ANALYTICS_TTL, show_spinner="Clustering consumption patterns...")
+def analyze_consumption_patterns(start_date=None, end_date=None, meal_types=None,
+                                 storage_methods=None):
+    return get_waste_analyzer().analyze_consumption_patterns(
+        start_date, end_date, meal_types, storage_methods
+    )
+
+
+@st.cache_data(ttl=ANALYTICS_TTL)
+def get_retail_filter_options():
+    return get_waste_analyzer().get_retail_filter_options()
+
+
+# Analysis API responses
+
+def _json_body(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+@st.cache_data(ttl=API_TTL, show_spinner=False)
+def _fetch_api_ok(path):
+    """JSON body of a 200 response; anything else raises so it is not cached"""
+    response = get_api_session().get(f"{API_BASE_URL}{path}")
+    if response.status_code != 200:
+        raise requests.HTTPError(f"{response.status_code} from {path}", response=response)
+    return _json_body(response)
+
+
+def fetch_api(path):
+    """GET an API endpoint, returning (status_code, json body)
+
+    Only successful responses are cached; errors are returned as they come
+    so the next rerun asks the API again.
+    """
+    try:
+        return 200, _fetch_api_ok(path)
+    except requests.HTTPError as e:
+        return e.response.status_code, _json_body(e.response)
+
+
+# Charity lookups
+
+@st.cache_data(ttl=CHARITY_TTL, show_spinner=False)
+def find_charities(lat, lon, food_type, max_dist, quantity):
+    """Verified charities accepting a food type within range and capacity"""
+    with get_engine().connect() as conn:
+        return pd.read_sql(
+            text("""
+            SELECT *, """ + HAVERSINE_SQL.format(lat='latitude', lon='longitude') + """
+                AS distance_km
+            FROM Charities
+            WHERE verification_status = 'verified'
+            AND JSON_CONTAINS(accepted_categories, :food_type)
+            HAVING distance_km <= :max_dist
+            AND capacity_kg >= :quantity
+            """),
+            conn,
+            params={
+                'lat': lat,
+                'lon': lon,
+                'food_type': json.dumps([food_type]),
+                'max_dist': max_dist,
+                'quantity': quantity
+            }
+        )
+
+
+@st.cache_data(ttl=CHARITY_FINGERPRINT_TTL, show_spinner=False)
+def charity_fingerprint():
+    from charity_index import charity_fingerprint as fetch_fingerprint
+    return fetch_fingerprint(get_engine())
+
+
+@st.cache_resource(max_entries=2, show_spinner="Indexing charities...")
+def get_charity_index(fingerprint):
+    """Spatial index over verified charities, rebuilt when the fingerprint changes"""
+    from charity_index import CharityIndex, load_charities
+    return CharityIndex(load_charities(get_engine()))
+
+
+def find_nearby_charities(lat, lon, food_type, max_dist, quantity):
+    """Radius search on the in-memory index, falling back to the SQL query
+
+    The result carries an open_now column, answered from the hours parsed
+    when the index was built so reruns only do the time comparison.
+    """
+    try:
+        index = get_charity_index(charity_fingerprint())
+    except Exception as e:
+        logging.warning(f"Charity index unavailable, using SQL: {str(e)}")
+        charities = find_charities(lat, lon, food_type, max_dist, quantity).copy()
+        charities['open_now'] = OperatingHoursIndex(charities['operating_hours']).open_now()
+        return charities
+    idx, dist = index.query_indices(lat, lon, max_dist, categories=food_type, min_capacity=quantity)
+    charities = index.charities.iloc[idx].copy()
+    charities['distance_km'] = dist
+    charities['open_now'] = index.hours.open_now(idx)
+    return charities
+
+
+# Invalidation hooks
+
+def invalidate_waste_analytics():
+    """Drop cached predictions, e.g. after new production/retail data lands"""
+    predict_production_waste.clear()
+    detect_retail_anomalies.clear()
+    analyze_consumption_patterns.clear()
+    get_retail_filter_options.clear()
+
+
+def invalidate_models():
+    """Reload models on next use, e.g. after train.py has run"""
+    get_waste_analyzer.clear()
+    invalidate_waste_analytics()
+
+
+def invalidate_api_results():
+    """Drop cached API responses, e.g. after a new analysis run"""
+    _fetch_api_ok.clear()
+
+
+def invalidate_charities():
+    """Drop cached charity lookups, e.g. after charity data is edited"""
+    find_charities.clear()
+    charity_fingerprint.clear()
+    get_charity_index.clear()
+
+
+def invalidate_all():
+    invalidate_models()
+    invalidate_api_results()
+    invalidate_charities()
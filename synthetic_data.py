@@ -0,0 +1,319 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from sql_loader import MySQLSink, ParquetSink, SQLiteSink, read_schemas
+
+DEFAULT_ROWS_PER_CHUNK = 2_000_000  # Expected sales rows generated per worker task
+CHUNKS_IN_FLIGHT_PER_WORKER = 2  # Bounds SQLite chunks waiting in memory for the writer
+OPEN_HOUR, CLOSE_HOUR = 8, 22  # Sales are stamped within store hours
+MONSOON_MONTHS = (6, 7, 8, 9)
+# Relative demand Monday..Sunday; each item scales the deviation from 1
+WEEKLY_PROFILE = np.array([0.9, 0.85, 0.9, 1.0, 1.15, 1.3, 1.25])
+INTERMITTENT_SHARE = 0.3  # Share of slow movers that sell on only some days
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+class Scenario:
+    """Item, store and weather parameters shared by every chunk
+
+    Everything is derived from `seed`, so a chunk generated by any worker,
+    in any order, is identical to a serial run.
+    """
+
+    def __init__(self, n_items: int = 1_000, n_sales: int = 8_000, n_locations: int = 10,
+                 start: str = '2024-01-01', days: int = 365, seed: int = 0):
+        self.n_items, self.n_sales, self.n_locations = n_items, n_sales, n_locations
+        self.start = pd.Timestamp(start).normalize()
+        self.days = days
+        self.seed = seed
+        rng = np.random.default_rng([seed, 0])
+
+        dates = self.start + pd.to_timedelta(np.arange(days), unit='D')
+        self.dates = dates
+        self.dow = dates.dayofweek.to_numpy()
+        self.item_ids = np.array([f"prod_{i:0{max(4, len(str(n_items)))}d}"
+                                  for i in range(1, n_items + 1)], dtype=object)
+        self.location_ids = np.array([f"store_{i:03d}" for i in range(1, n_locations + 1)],
+                                     dtype=object)
+        self.location_weights = rng.dirichlet(np.full(n_locations, 5.0))
+
+        # Daily weather: seasonal temperature with AR(1) anomalies, monsoon rain
+        doy = dates.dayofyear.to_numpy()
+        anomaly = np.zeros(days)
+        shocks = rng.normal(0, 1.2, days)
+        for d in range(1, days):
+            anomaly[d] = 0.7 * anomaly[d - 1] + shocks[d]
+        city_temp = 27 + 3.5 * np.sin(2 * np.pi * (doy - 80) / 365) + anomaly
+        monsoon = np.isin(dates.month.to_numpy(), MONSOON_MONTHS)
+        wet = rng.random(days) < np.where(monsoon, 0.75, 0.05)
+        city_rain = np.where(wet, rng.gamma(1.5, np.where(monsoon, 20.0, 5.0)), 0.0)
+        self.temperature = np.round(city_temp[:, None]
+                                    + rng.normal(0, 0.8, (days, n_locations)), 2)
+        self.precipitation = np.round(np.clip(
+            city_rain[:, None] * rng.lognormal(0, 0.3, (days, n_locations)), 0, 999.99), 2)
+        self.temp_z = (city_temp - city_temp.mean()) / city_temp.std()
+        self.rain_z = (city_rain - city_rain.mean()) / max(city_rain.std(), 1e-9)
+
+        # Per-item demand: level, weekly amplitude, weather sensitivity, intermittency
+        self.base = rng.lognormal(0, 1.0, n_items)
+        self.weekly_amplitude = rng.uniform(0.3, 1.5, n_items)
+        self.temp_coef = rng.normal(0, 0.15, n_items)
+        self.rain_coef = rng.normal(-0.1, 0.08, n_items)
+        intermittent = rng.random(n_items) < INTERMITTENT_SHARE
+        self.active_prob = np.where(intermittent, rng.uniform(0.05, 0.4, n_items),
+                                    rng.uniform(0.9, 1.0, n_items))
+        self.mean_quantity = rng.uniform(1.0, 4.0, n_items)
+        # Scale transaction rates so the expected total is n_sales
+        self.rate_scale = n_sales / max(self._expected_transactions(), 1e-9)
+
+    def rates(self, items: slice) -> np.ndarray:
+        """Unscaled transaction rate per item and day on days the item sells"""
+        weekly = 1 + self.weekly_amplitude[items, None] * (WEEKLY_PROFILE[self.dow] - 1)[None, :]
+        weather = np.exp(self.temp_coef[items, None] * self.temp_z[None, :]
+                         + self.rain_coef[items, None] * self.rain_z[None, :])
+        return self.base[items, None] * np.clip(weekly, 0.05, None) * weather
+
+    def _expected_transactions(self, block: int = 10_000) -> float:
+        total = 0.0
+        for start in range(0, self.n_items, block):
+            items = slice(start, start + block)
+            total += float((self.rates(items).sum(axis=1) * self.active_prob[items]).sum())
+        return total
+
+    def chunks(self, rows_per_chunk: int = DEFAULT_ROWS_PER_CHUNK) -> list:
+        """Item ranges expected to produce about `rows_per_chunk` sales each"""
+        per_item = max(self.n_sales / self.n_items, 1e-9)
+        size = int(np.clip(rows_per_chunk / per_item, 1, self.n_items))
+        return [(start, min(start + size, self.n_items)) for start in range(0, self.n_items, size)]
+
+    def _counts(self, chunk_id: int, items: slice) -> tuple:
+        rng = np.random.default_rng([self.seed, 1, chunk_id])
+        rates = self.rates(items) * self.rate_scale
+        active = rng.random(rates.shape) < self.active_prob[items, None]
+        return rng, np.where(active, rng.poisson(rates), 0)
+
+    def count_sales(self, chunk_id: int, start: int, stop: int) -> int:
+        return int(self._counts(chunk_id, slice(start, stop))[1].sum())
+
+    def sales(self, chunk_id: int, start: int, stop: int, first_id: int) -> pd.DataFrame:
+        """Sales rows for items [start, stop), with transaction ids from `first_id`"""
+        items = slice(start, stop)
+        rng, counts = self._counts(chunk_id, items)
+        item_index, day = np.nonzero(counts)
+        repeats = counts[item_index, day]
+        item_index = np.repeat(item_index + start, repeats)
+        day = np.repeat(day, repeats)
+        n = len(day)
+
+        location = rng.choice(self.n_locations, size=n, p=self.location_weights)
+        seconds = rng.integers(OPEN_HOUR * 3600, CLOSE_HOUR * 3600, size=n)
+        quantity = rng.geometric(1 / self.mean_quantity[item_index])
+        return pd.DataFrame({
+            'transaction_id': np.arange(first_id, first_id + n, dtype=np.int64),
+            'item_id': self.item_ids[item_index],
+            'quantity': quantity.astype(np.int32),
+            'timestamp': (self.start.to_datetime64()
+                          + (day.astype(np.int64) * 86400 + seconds).astype('timedelta64[s]')),
+            'location_id': self.location_ids[location],
+            'weather_id': (day * self.n_locations + location + 1).astype(np.int64)
+        })
+
+    def weather(self) -> pd.DataFrame:
+        """One reading per store and day, at noon"""
+        day, location = np.divmod(np.arange(self.days * self.n_locations), self.n_locations)
+        return pd.DataFrame({
+            'weather_id': np.arange(1, len(day) + 1, dtype=np.int64),
+            'temperature': self.temperature[day, location],
+            'precipitation': self.precipitation[day, location],
+            'timestamp': self.dates[day] + pd.Timedelta(hours=12)
+        })
+
+    def inventory(self) -> pd.DataFrame:
+        """Stock covering a few days of expected demand, with expiry dates"""
+        rng = np.random.default_rng([self.seed, 2])
+        daily = self.base * self.active_prob * self.mean_quantity * self.rate_scale
+        suppliers = np.array([f"Supplier {i:04d}" for i in range(1, 201)], dtype=object)
+        end = self.start + pd.Timedelta(days=self.days)
+        return pd.DataFrame({
+            'item_id': self.item_ids,
+            'current_stock': (np.round(daily * rng.uniform(0, 20, self.n_items))
+                              + rng.integers(0, 50, self.n_items)).astype(np.int64),
+            'expiry_date': end + pd.to_timedelta(rng.integers(1, 400, self.n_items), unit='D'),
+            'supplier_id': suppliers[rng.integers(0, len(suppliers), self.n_items)]
+        })
+
+
+# Per-process state, set once by _init_worker so tasks only carry chunk bounds
+_worker = {}
+
+
+def _open_sink(target: str, path: Optional[str]):
+    if target == 'mysql':
+        return MySQLSink(path)
+    if target == 'sqlite':
+        return SQLiteSink(path)
+    return ParquetSink(path)
+
+
+def _init_worker(scenario: Scenario, schema, target: str, path: Optional[str]):
+    _worker.update(scenario=scenario, schema=schema, target=target, path=path, sink=None)
+
+
+def _count_task(chunk_id: int, start: int, stop: int) -> int:
+    return _worker['scenario'].count_sales(chunk_id, start, stop)
+
+
+def _write_task(chunk_id: int, start: int, stop: int, first_id: int):
+    """Generate one chunk and write it from the worker, or return it for SQLite"""
+    frame = _worker['scenario'].sales(chunk_id, start, stop, first_id)
+    target, path = _worker['target'], _worker['path']
+    if target == 'sqlite':
+        return frame  # A single connection writes SQLite
+    if target == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        directory = os.path.join(path, 'sales')
+        os.makedirs(directory, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False),
+                       os.path.join(directory, f"part-{chunk_id:05d}.parquet"))
+    else:
+        if _worker['sink'] is None:
+            _worker['sink'] = _open_sink(target, path)
+        _worker['sink'].write(_worker['schema'], frame)
+    return len(frame)
+
+
+def _collect(result, sink, schema) -> int:
+    """Rows written by one task; SQLite chunks come back as frames for the single writer"""
+    if isinstance(result, pd.DataFrame):
+        sink.write(schema, result)
+        return len(result)
+    return result
+
+
+def generate(scenario: Scenario, target: str = 'parquet', path: Optional[str] = 'synthetic',
+             workers: Optional[int] = None, rows_per_chunk: int = DEFAULT_ROWS_PER_CHUNK,
+             dump: str = 'data.sql') -> Dict[str, int]:
+    """Write inventory, weather and sales for `scenario` to Parquet, SQLite or MySQL
+
+    Sales are generated in item-range chunks on a process pool. A first
+    pass draws only the per-day counts, which fixes every chunk's size and so
+    its dense transaction-id range; the second pass redraws the same counts
+    and expands them into rows, each worker writing its own chunk.
+    """
+    schemas = read_schemas(dump)
+    sink = _open_sink(target, path)
+    for table, frame in [('inventory', scenario.inventory()), ('weather', scenario.weather())]:
+        sink.create(schemas[table])
+        sink.write(schemas[table], frame)
+    sink.create(schemas['sales'])
+    if target != 'sqlite':
+        sink.close()
+    if target == 'parquet':
+        # Parts from an earlier, larger run would otherwise be read back with these
+        for part in glob.glob(os.path.join(path, 'sales', 'part-*.parquet')):
+            os.remove(part)
+
+    chunks = scenario.chunks(rows_per_chunk)
+    counts = {'inventory': scenario.n_items, 'weather': scenario.days * scenario.n_locations,
+              'sales': 0}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(scenario, schemas['sales'], target, path)) as pool:
+        chunk_ids, starts, stops = zip(*[(i, a, b) for i, (a, b) in enumerate(chunks)])
+        sizes = list(pool.map(_count_task, chunk_ids, starts, stops))
+        first_ids = np.concatenate([[1], np.cumsum(sizes)[:-1] + 1]).astype(int).tolist()
+        # Submit through a bounded window: pool.map would queue every task at
+        # once, and for SQLite each finished chunk waits in memory for the writer
+        window = (workers or os.cpu_count() or 1) * CHUNKS_IN_FLIGHT_PER_WORKER
+        pending = deque()
+        for task in zip(chunk_ids, starts, stops, first_ids):
+            pending.append(pool.submit(_write_task, *task))
+            if len(pending) >= window:
+                counts['sales'] += _collect(pending.popleft().result(), sink, schemas['sales'])
+        while pending:
+            counts['sales'] += _collect(pending.popleft().result(), sink, schemas['sales'])
+    if target == 'sqlite':
+        sink.close()
+    return counts
+
+
+def describe(sales: pd.DataFrame, weather: pd.DataFrame) -> Dict[str, float]:
+    """Checks that the generated demand has the intended structure"""
+    daily = (sales.assign(day=sales['timestamp'].dt.normalize())
+             .groupby(['item_id', 'day'])['quantity'].sum())
+    by_day = sales.assign(day=sales['timestamp'].dt.normalize()).groupby('day')['quantity'].sum()
+    weekday = by_day.groupby(by_day.index.dayofweek).mean()
+    city = (weather.assign(day=weather['timestamp'].dt.normalize())
+            .groupby('day')[['temperature', 'precipitation']].mean())
+    joined = city.join(by_day.rename('quantity'), how='inner')
+    n_items = sales['item_id'].nunique()
+    return {
+        'weekend_uplift': round(float(weekday.loc[[5, 6]].mean() / weekday.loc[[0, 1, 2, 3]].mean()), 3),
+        'item_day_zero_share': round(1 - len(daily) / (n_items * len(by_day)), 3),
+        'corr_daily_qty_precip': round(float(joined['quantity'].corr(joined['precipitation'])), 3),
+        'corr_daily_qty_temp': round(float(joined['quantity'].corr(joined['temperature'])), 3)
+    }
+
+
+def benchmark(n_items: int = 2_000, n_sales: int = 5_000_000, workers: Optional[int] = None):
+    """Generate to Parquet, then report throughput and the demand structure"""
+    import tempfile
+
+    scenario = Scenario(n_items=n_items, n_sales=n_sales)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        counts = generate(scenario, 'parquet', tmp, workers)
+        elapsed = time.perf_counter() - start
+        logging.info(f"{counts['sales']:,} sales for {n_items:,} items in {elapsed:.1f}s "
+                     f"({counts['sales'] / elapsed:,.0f} rows/s, {workers or os.cpu_count()} workers)")
+        sales = pd.read_parquet(os.path.join(tmp, 'sales'))
+        weather = pd.read_parquet(os.path.join(tmp, 'weather.parquet'))
+        assert sales['transaction_id'].is_monotonic_increasing
+        logging.info(f"Demand structure: {describe(sales, weather)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate inventory, sales and weather data")
+    parser.add_argument('--items', type=int, default=1_000)
+    parser.add_argument('--sales', type=float, default=8_000, help="Expected sales rows, e.g. 1e9")
+    parser.add_argument('--locations', type=int, default=10)
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--rows-per-chunk', type=int, default=DEFAULT_ROWS_PER_CHUNK)
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--parquet', help="Output directory (default: synthetic/)")
+    output.add_argument('--sqlite', help="SQLite file to write")
+    output.add_argument('--mysql', action='store_true', help="Bulk load into MYSQL_CONFIG")
+    parser.add_argument('--benchmark', action='store_true')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(workers=args.workers)
+        return
+    target, path = (('sqlite', args.sqlite) if args.sqlite else
+                    ('mysql', None) if args.mysql else ('parquet', args.parquet or 'synthetic'))
+    scenario = Scenario(args.items, int(args.sales), args.locations, args.start, args.days, args.seed)
+    start = time.perf_counter()
+    counts = generate(scenario, target, path, args.workers, args.rows_per_chunk)
+    elapsed = time.perf_counter() - start
+    logging.info(f"Wrote {counts} to {target} in {elapsed:.1f}s "
+                 f"({counts['sales'] / elapsed:,.0f} sales rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Lightweight spans, counters and histograms for the pipeline stages
+
+    with span('db_query', query='sales'):
+        ...
+
+    @traced()
+    def analyze_and_forecast(): ...
+
+    count('forecast_items_total', outcome='ok')
+
+Every span records its duration in the `span_duration_seconds` histogram
+(labelled with the span name and its labels) and counts exceptions that
+escape it in `span_errors_total`. Finished spans are also kept in a small
+ring buffer with their parent, for ad-hoc inspection. render_prometheus()
+returns everything in the Prometheus text exposition format, which api.py
+serves on /metrics.
+
+Set PIPELINE_TRACING=0 to disable tracing. span() then returns a shared
+no-op context manager, count()/observe() return immediately and @traced
+leaves functions undecorated, so the disabled cost is one flag check.
+"""
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+ENABLED = os.environ.get('PIPELINE_TRACING', '1').strip().lower() not in ('0', 'false', 'off', 'no')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from a fast indexed query to a full forecast run
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SPANS = 1000
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_histograms: Dict[str, Dict[LabelKey, List]] = {}
+_help: Dict[str, str] = {
+    'span_duration_seconds': "Duration of traced pipeline stages",
+    'span_errors_total': "Exceptions raised inside traced pipeline stages"
+}
+_recent = deque(maxlen=RECENT_SPANS)
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+def _key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def count(name: str, value: float = 1, **labels):
+    """Add `value` to the counter `name`"""
+    if not ENABLED:
+        return
+    key = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    """Record `value` in the histogram `name`"""
+    if not ENABLED:
+        return
+    _observe(name, value, _key(labels))
+
+
+def _observe(name: str, value: float, key: LabelKey):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        state = series.get(key)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, then sum and count
+            state = series[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(DEFAULT_BUCKETS, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+
+def describe(name: str, text: str):
+    """HELP text for a metric on /metrics"""
+    _help[name] = text
+
+
+class Span:
+    """Times one stage; nests under the span active in the same context"""
+
+    __slots__ = ('name', 'labels', 'parent', 'start', 'duration', '_token')
+
+    def __init__(self, name: str, labels: Dict):
+        self.name = name
+        self.labels = labels
+        self.parent = None
+        self.start = None
+        self.duration = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current.reset(self._token)
+        key = _key({'span': self.name, **self.labels})
+        _observe('span_duration_seconds', self.duration, key)
+        if exc_type is not None:
+            with _lock:
+                errors = _counters.setdefault('span_errors_total', {})
+                errors[key] = errors.get(key, 0) + 1
+        _recent.append({
+            'name': self.name,
+            'labels': self.labels,
+            'parent': self.parent.name if self.parent is not None else None,
+            'duration_s': self.duration,
+            'error': exc_type.__name__ if exc_type is not None else None
+        })
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """Context manager timing the enclosed block as span `name`
+
+    Keep label values low-cardinality (a query or stage name, not an item id):
+    every distinct label set becomes its own metric series.
+    """
+    if not ENABLED:
+        return _NOOP
+    return Span(name, labels)
+
+
+def traced(name: Optional[str] = None, **labels) -> Callable:
+    """Decorator running the function inside a span, named after it by default"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def recent_spans(limit: Optional[int] = None) -> List[Dict]:
+    """The most recently finished spans, oldest first"""
+    spans = list(_recent)
+    return spans[-limit:] if limit else spans
+
+
+def reset():
+    """Drop all recorded metrics and spans"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _recent.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key: LabelKey, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus() -> str:
+    """All counters and histograms in the Prometheus text exposition format"""
+    with _lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {name: {key: [list(state[0]), state[1], state[2]] for key, state in series.items()}
+                      for name, series in _histograms.items()}
+
+    lines = []
+    for name in sorted(counters):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(counters[name].items()):
+            lines.append(f"{name}{_labels(key)} {_number(value)}")
+    for name in sorted(histograms):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, (buckets, total, n) in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, hits in zip(DEFAULT_BUCKETS + (float('inf'),), buckets):
+                cumulative += hits
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket = _labels(key, f'le="{le}"')
+                lines.append(f"{name}_bucket{bucket} {cumulative}")
+            lines.append(f"{name}_sum{_labels(key)} {total!r}")
+            lines.append(f"{name}_count{_labels(key)} {n}")
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == "__main__":
+    # Per-call overhead of an empty span, enabled versus the no-op path
+    n = 200_000
+    start = time.perf_counter()
+    for _ in range(n):
+        with span('overhead', query='noop'):
+            pass
+    enabled = (time.perf_counter() - start) / n
+    ENABLED = False
+    start = time.perf_counter()
+    for _ in range(n):
+        with span('overhead', query='noop'):
+            pass
+    disabled = (time.perf_counter() - start) / n
+    print(f"empty span: {enabled * 1e6:.2f} us enabled, {disabled * 1e9:.0f} ns disabled")
@@ -1,4 +1,9 @@
 # train_models.py
+import argparse
+import json
+import os
+import time
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 from sqlalchemy.sql.elements import quoted_name
@@ -8,7 +13,9 @@ from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.cluster import KMeans
 from sklearn.ensemble import IsolationForest
-from joblib import dump
+from joblib import dump, load
+from core import (CompactForest, COMPACT_PRODUCTION_FILE, MODEL_FILES, MODEL_FEATURES,
+                  prepare_features)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -54,14 +61,15 @@ def load_and_preprocess_data():
         
     return production_df, retail_df, consumption_df
 
-def train_production_model(production_df):
-    """Train production waste prediction model"""
-    production_df = convert_columns_to_string(production_df)
-    
-    X = production_df[['yield', 'storage_days', 'temperature']]
-    X = convert_columns_to_string(X)
-    y = production_df['waste_percentage']
-    
+# Hyperparameters used when training without a tuning run
+DEFAULT_PARAMS = {
+    'production': {'n_estimators': 150},
+    'retail': {'n_estimators': 100, 'contamination': 0.1},
+    'consumption': {'n_clusters': 4}
+}
+
+def build_production_model(**params):
+    """Build the unfitted production waste pipeline"""
     numeric_transformer = Pipeline(steps=[
         ('scaler', StandardScaler())
     ])
@@ -71,15 +79,44 @@ def train_production_model(production_df):
             ('num', numeric_transformer, ['yield', 'storage_days', 'temperature'])
         ])
 
-    model = Pipeline(steps=[
+    return Pipeline(steps=[
         ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(n_estimators=150, random_state=42))
+        ('regressor', RandomForestRegressor(random_state=42, **params))
     ])
 
+def build_retail_model(**params):
+    """Build the unfitted retail anomaly detector"""
+    return IsolationForest(random_state=42, **params)
+
+def build_consumption_model(**params):
+    """Build the unfitted consumption clustering pipeline"""
+    categorical_features = ['meal_type', 'storage_method']
+    numeric_features = ['portion_size', 'leftovers']
+    
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numeric_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+        ])
+    
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('cluster', KMeans(random_state=42, **params))
+    ])
+
+def train_production_model(production_df, **params):
+    """Train production waste prediction model"""
+    production_df = convert_columns_to_string(production_df)
+    
+    X = production_df[['yield', 'storage_days', 'temperature']]
+    X = convert_columns_to_string(X)
+    y = production_df['waste_percentage']
+
+    model = build_production_model(**(params or DEFAULT_PARAMS['production']))
     model.fit(X, y)
     return model
 
-def train_retail_model(retail_df):
+def train_retail_model(retail_df, **params):
     """Train retail anomaly detection model"""
     retail_df = convert_columns_to_string(retail_df)
     
@@ -89,43 +126,117 @@ def train_retail_model(retail_df):
     # Final verification
     print("Retail feature columns types:", [type(c) for c in features.columns])
     
-    model = IsolationForest(
-        n_estimators=100,
-        contamination=0.1,
-        random_state=42
-    )
+    model = build_retail_model(**(params or DEFAULT_PARAMS['retail']))
     model.fit(features)
     return model
 
-def train_consumption_model(consumption_df):
+def train_consumption_model(consumption_df, **params):
     """Train consumption clustering model"""
     consumption_df = convert_columns_to_string(consumption_df)
-    
-    categorical_features = ['meal_type', 'storage_method']
-    numeric_features = ['portion_size', 'leftovers']
-    
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', StandardScaler(), numeric_features),
-            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
-        ])
-    
-    model = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('cluster', KMeans(n_clusters=4, random_state=42))
-    ])
-    
+
+    model = build_consumption_model(**(params or DEFAULT_PARAMS['consumption']))
     model.fit(consumption_df)
     return model
 
 def save_models(prod_model, retail_model, cons_model):
     """Persist trained models to disk"""
-    dump(prod_model, 'production_waste_predictor.joblib')
-    dump(retail_model, 'retail_anomaly_detector.joblib')
-    dump(cons_model, 'consumption_clusterer.joblib')
+    dump(prod_model, MODEL_FILES['production'])
+    dump(retail_model, MODEL_FILES['retail'])
+    dump(cons_model, MODEL_FILES['consumption'])
     print("Models saved successfully")
 
-def main():
+def export_compact_model(prod_model, path=COMPACT_PRODUCTION_FILE):
+    """Flatten the fitted scaler and forest into NumPy node arrays"""
+    scaler = prod_model.named_steps['preprocessor'].named_transformers_['num'].named_steps['scaler']
+    forest = prod_model.named_steps['regressor']
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        # sklearn compares float32 inputs against float64 thresholds, so the
+        # largest float32 not above each threshold gives identical splits
+        threshold = tree.threshold.astype(np.float32)
+        rounded_up = threshold.astype(np.float64) > tree.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(threshold)
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+
+    np.savez(
+        path,
+        feature_names=np.array(MODEL_FEATURES['production']),
+        mean=scaler.mean_,
+        scale=scaler.scale_,
+        feature=np.concatenate(features).astype(np.int8),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values).astype(np.float32),
+        roots=np.array(roots, dtype=np.int32)
+    )
+    print(f"Compact production model exported to {path}")
+    return CompactForest.load(path)
+
+def verify_compact_parity(prod_model, compact_model, X, tolerance=1e-5):
+    """Check the compact forest reproduces the sklearn predictions
+
+    Runs on X as given and with its float columns cast to float32 (e.g. read
+    from Parquet), both through prepare_features as at inference time.
+    """
+    stored = X.astype({column: 'float32' for column in X.select_dtypes('float').columns})
+    max_error = 0.0
+    for name, inputs in [('float64', X), ('float32', stored)]:
+        features = prepare_features('production', inputs)
+        expected = prod_model.predict(features)
+        actual = compact_model.predict(features)
+        error = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+        if not np.allclose(actual, expected, rtol=tolerance, atol=tolerance):
+            raise ValueError(f"Compact model diverges from sklearn on {name} inputs "
+                             f"(max abs error {error:.3g})")
+        max_error = max(max_error, error)
+    print(f"Parity verified on {len(X)} float64 and float32 rows (max abs error {max_error:.3g})")
+    return max_error
+
+def _best_time(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def benchmark_compact_model(X, joblib_path=MODEL_FILES['production'],
+                            compact_path=COMPACT_PRODUCTION_FILE):
+    """Compare load time, size and predict latency of both model formats"""
+    results = {}
+    for name, path, loader in [
+        ('joblib', joblib_path, load),
+        ('compact', compact_path, CompactForest.load)
+    ]:
+        model = loader(path)
+        single_row = X.iloc[:1]
+        results[name] = {
+            'size_mb': os.path.getsize(path) / 1e6,
+            'load_ms': _best_time(lambda: loader(path), repeats=3) * 1e3,
+            'single_row_ms': _best_time(lambda: model.predict(single_row)) * 1e3,
+            'batch_ms': _best_time(lambda: model.predict(X)) * 1e3
+        }
+
+    report = pd.DataFrame(results).T.round(3)
+    print(f"\nProduction model benchmark ({len(X)} rows per batch):")
+    print(report)
+    return report
+
+def train_all():
     # Load and preprocess data
     production_df, retail_df, consumption_df = load_and_preprocess_data()
     
@@ -142,5 +253,61 @@ def main():
     # Save models
     save_models(prod_model, retail_model, cons_model)
 
+    # Export the fast-inference production model
+    X = production_df[MODEL_FEATURES['production']]
+    compact_model = export_compact_model(prod_model)
+    verify_compact_parity(prod_model, compact_model, X)
+
+def export_production_model():
+    """Export the saved production model and benchmark it against joblib"""
+    production_df, _, _ = load_and_preprocess_data()
+    X = production_df[MODEL_FEATURES['production']]
+    prod_model = load(MODEL_FILES['production'])
+    compact_model = export_compact_model(prod_model)
+    verify_compact_parity(prod_model, compact_model, X)
+    benchmark_compact_model(X)
+
+def tune_models(args):
+    """Run the hyperparameter search over the selected models"""
+    from tuning import tune, DEFAULT_GRIDS
+
+    grids = DEFAULT_GRIDS
+    if args.grid:
+        with open(args.grid) as f:
+            grids = {**DEFAULT_GRIDS, **json.load(f)}
+
+    production_df, retail_df, consumption_df = load_and_preprocess_data()
+    datasets = {
+        'production': production_df,
+        'retail': retail_df,
+        'consumption': consumption_df
+    }
+    tune({name: datasets[name] for name in args.models}, grids,
+         n_splits=args.splits, n_jobs=args.jobs, cache_dir=args.cache_dir,
+         latency_budget_ms=args.latency_budget_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the food waste models")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('train', help="Train and save all models (default)")
+    subparsers.add_parser('export', help="Export and benchmark the compact production model")
+
+    tune_parser = subparsers.add_parser('tune', help="Cross-validated hyperparameter search")
+    tune_parser.add_argument('--models', nargs='+', choices=sorted(MODEL_FILES),
+                             default=sorted(MODEL_FILES))
+    tune_parser.add_argument('--grid', help="JSON file of {model: {param: [values]}}")
+    tune_parser.add_argument('--splits', type=int, default=3)
+    tune_parser.add_argument('--jobs', type=int, default=-1)
+    tune_parser.add_argument('--cache-dir', default='tuning_cache')
+    tune_parser.add_argument('--latency-budget-ms', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_production_model()
+    elif args.command == 'tune':
+        tune_models(args)
+    else:
+        train_all()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
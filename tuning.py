@@ -0,0 +1,180 @@
+# tuning.py
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import f1_score, mean_absolute_error, silhouette_score
+from sklearn.model_selection import TimeSeriesSplit
+
+from core import MODEL_FEATURES
+from train import build_production_model, build_retail_model, build_consumption_model
+
+CACHE_DIR = 'tuning_cache'
+
+DEFAULT_GRIDS = {
+    'production': {
+        'n_estimators': [50, 100, 150, 300],
+        'max_depth': [None, 8, 16],
+        'min_samples_leaf': [1, 5]
+    },
+    'retail': {
+        'n_estimators': [50, 100, 200],
+        'contamination': [0.05, 0.1, 0.15],
+        'max_samples': ['auto', 0.5]
+    },
+    'consumption': {
+        'n_clusters': [3, 4, 5, 6],
+        'n_init': [1, 10]
+    }
+}
+
+DATE_COLUMNS = {
+    'production': 'date',
+    'retail': 'record_date',
+    'consumption': 'record_date'
+}
+
+BUILDERS = {
+    'production': build_production_model,
+    'retail': build_retail_model,
+    'consumption': build_consumption_model
+}
+
+# Share of highest waste_ratio rows treated as true anomalies when scoring
+# the unsupervised retail detector
+REFERENCE_ANOMALY_RATE = 0.1
+
+
+def expand_grid(grid):
+    """Expand {param: [values]} into a list of parameter dicts"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _fold_loss(stage, model, train, test):
+    """Fit on one fold and return a lower-is-better validation loss"""
+    features = MODEL_FEATURES[stage]
+    if stage == 'production':
+        model.fit(train[features], train['waste_percentage'])
+        return mean_absolute_error(test['waste_percentage'], model.predict(test[features]))
+
+    if stage == 'retail':
+        model.fit(train[features])
+        cutoff = train['waste_ratio'].quantile(1 - REFERENCE_ANOMALY_RATE)
+        expected = np.where(test['waste_ratio'] > cutoff, -1, 1)
+        return 1 - f1_score(expected, model.predict(test[features]), pos_label=-1,
+                            zero_division=0)
+
+    model.fit(train[features])
+    transformed = model.named_steps['preprocessor'].transform(test[features])
+    labels = model.predict(test[features])
+    if len(set(labels)) < 2:
+        return 1.0
+    return 1 - silhouette_score(transformed, labels)
+
+
+def _latency_ms(model, rows, repeats=20):
+    """Median single-row predict latency"""
+    model.predict(rows.iloc[:1])  # warm-up
+    timings = []
+    for i in range(repeats):
+        row = rows.iloc[[i % len(rows)]]
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1e3)
+
+
+def _trial_key(stage, params, n_splits, fingerprint):
+    payload = json.dumps([stage, params, n_splits, fingerprint], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def run_trial(stage, params, df, n_splits, cache_path):
+    """Cross-validate one parameter set and cache the result on disk"""
+    losses = []
+    model = None
+    for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits).split(df):
+        model = BUILDERS[stage](**params)
+        losses.append(_fold_loss(stage, model, df.iloc[train_idx], df.iloc[test_idx]))
+
+    # Latency and size are measured on the model from the last (largest) fold
+    result = {
+        'model': stage,
+        'params': params,
+        'loss': float(np.mean(losses)),
+        'loss_std': float(np.std(losses)),
+        'latency_ms': _latency_ms(model, df[MODEL_FEATURES[stage]]),
+        'size_mb': len(pickle.dumps(model)) / 1e6
+    }
+    with open(cache_path, 'w') as f:
+        json.dump(result, f)
+    return result
+
+
+def pareto_front(results):
+    """Flag trials that no other trial beats on loss, latency and size"""
+    objectives = results[['loss', 'latency_ms', 'size_mb']].to_numpy()
+    dominated = np.zeros(len(results), dtype=bool)
+    for i, row in enumerate(objectives):
+        no_worse = (objectives <= row).all(axis=1)
+        better = (objectives < row).any(axis=1)
+        dominated[i] = (no_worse & better).any()
+    return ~dominated
+
+
+def tune(datasets, grids=None, n_splits=3, n_jobs=-1, cache_dir=CACHE_DIR,
+         latency_budget_ms=None):
+    """Search the grids for each model with time-series cross-validation
+
+    `datasets` maps model name to its training frame. Finished trials are
+    read back from `cache_dir`, so an interrupted search resumes where it
+    stopped.
+    """
+    grids = grids or DEFAULT_GRIDS
+    reports = {}
+
+    for stage, df in datasets.items():
+        df = df.sort_values(DATE_COLUMNS[stage]).reset_index(drop=True)
+        fingerprint = int(pd.util.hash_pandas_object(df, index=False).sum())
+        stage_dir = os.path.join(cache_dir, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+
+        cached, pending = [], []
+        for params in expand_grid(grids[stage]):
+            path = os.path.join(stage_dir, f"{_trial_key(stage, params, n_splits, fingerprint)}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    cached.append(json.load(f))
+            else:
+                pending.append((params, path))
+
+        print(f"Tuning {stage}: {len(cached)} cached trials, {len(pending)} to run")
+        fresh = Parallel(n_jobs=n_jobs)(
+            delayed(run_trial)(stage, params, df, n_splits, path)
+            for params, path in pending
+        )
+
+        report = pd.DataFrame(cached + fresh)
+        report['pareto'] = pareto_front(report)
+        report = report.sort_values('loss').reset_index(drop=True)
+        reports[stage] = report
+
+        print(report[report['pareto']][['params', 'loss', 'latency_ms', 'size_mb']]
+              .to_string(index=False))
+        if latency_budget_ms is not None:
+            within_budget = report[report['latency_ms'] <= latency_budget_ms]
+            if within_budget.empty:
+                print(f"No {stage} trial fits the {latency_budget_ms} ms budget")
+            else:
+                print(f"Best {stage} within {latency_budget_ms} ms: "
+                      f"{within_budget.iloc[0]['params']}")
+
+    return reports
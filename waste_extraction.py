@@ -0,0 +1,179 @@
+import io
+import re
+import time
+from typing import Iterable, Iterator, TextIO, Union
+
+import numpy as np
+import pandas as pd
+
+# Unit spellings and their size in kg
+UNIT_TO_KG = {
+    **dict.fromkeys(['mg', 'milligram', 'milligrams'], 1e-6),
+    **dict.fromkeys(['g', 'gm', 'gms', 'gr', 'gram', 'grams', 'gramme', 'grammes'], 1e-3),
+    **dict.fromkeys(['kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms'], 1.0),
+    **dict.fromkeys(['t', 'ton', 'tons', 'tonne', 'tonnes', 'mt'], 1000.0),
+    **dict.fromkeys(['lb', 'lbs', 'pound', 'pounds'], 0.45359237),
+    **dict.fromkeys(['oz', 'ounce', 'ounces'], 0.028349523125)
+}
+
+UNSPECIFIED = 'unspecified'
+DEFAULT_CHUNK_LINES = 100_000
+
+# Thousands groups ("1,200"), a decimal comma ("1,5"), or a plain/decimal-point number
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+,\d{1,2}(?![\d,])|\d+(?:\.\d+)?|\.\d+"
+_DECIMAL_COMMA = re.compile(r"\d+,\d{1,2}")
+_UNIT = "|".join(sorted(map(re.escape, set(UNIT_TO_KG) - {'t'}), key=len, reverse=True))
+
+# Anchored on the number, so the scan skips quickly over plain text. A bare
+# "t" only counts as tonnes when the word ends there ("2 t-shirts" is not 2 t).
+QUANTITY_PATTERN = re.compile(
+    rf"(?<![\w.])(?<!\d,)(?P<quantity>{_NUMBER})\s*"
+    rf"(?P<unit>(?:{_UNIT})(?![A-Za-z])|t(?![\w-]))",
+    re.IGNORECASE
+)
+# Clause boundaries: the food named next to a quantity never crosses these
+CLAUSE_SEPARATOR = re.compile(r"[;\n,()]|\.(?!\d)|\band\b", re.IGNORECASE)
+_AFTER_WORDS = r"^\s*(?:of\s+)?([A-Za-z][A-Za-z &/'-]*)"
+_BEFORE_WORDS = r"([A-Za-z][A-Za-z &/'-]*?)\s*[:=\-–]?\s*$"
+_FILLER = (r"^(?:of|the|a|an|some|wasted|waste|discarded|spoiled|spoilt|leftover)\b\s*|"
+           r"\s*\b(?:wasted|waste|discarded|spoiled|spoilt|today|yesterday)$")
+# A phrase opening with a preposition is a date, place or recipient, not a
+# food ("5 kg on monday"); the other stopwords never name a food on their own
+_PREPOSITIONS = frozenset('on in at by for from to per with over since until during into'.split())
+_STOPWORDS = _PREPOSITIONS | frozenset('''
+    a an the and or is are was were be been it this that we they total about around approx
+    collected donated received used sold removed logged recorded thrown threw out away
+'''.split())
+
+
+def _clean_category(fragments: list, words: str) -> np.ndarray:
+    """Food name in each text fragment ('' when there is none)
+
+    Fragments repeat heavily in real logs, so only distinct ones are parsed.
+    """
+    codes, uniques = pd.factorize(pd.Series(fragments, dtype=object))
+    cleaned = (pd.Series(uniques, dtype=object).str.extract(words)[0].fillna('')
+               .str.lower().str.replace(r"\s+", " ", regex=True).str.strip())
+    for _ in range(3):  # Stacked fillers like "of wasted rice"
+        cleaned = cleaned.str.replace(_FILLER, '', regex=True).str.strip()
+    words = cleaned.str.split()
+    not_food = words.map(lambda ws: not ws or ws[0] in _PREPOSITIONS
+                         or all(w in _STOPWORDS for w in ws))
+    cleaned[not_food] = ''
+    return cleaned.to_numpy(dtype=object)[codes]
+
+
+def extract_frame(text: Union[str, Iterable[str]]) -> pd.DataFrame:
+    """Every quantity in `text` as category, quantity, unit and kg rows
+
+    One compiled scan finds the quantity/unit pairs and another the clause
+    separators; each quantity's food is the words right after it in its
+    clause ("5 kg of rice"), else the words right before it ("rice: 5 kg").
+    Unit conversion and category cleaning are vectorised.
+    """
+    if not isinstance(text, str):
+        text = "\n".join(text)
+    matches = list(QUANTITY_PATTERN.finditer(text))
+    if not matches:
+        return pd.DataFrame(columns=['category', 'quantity', 'unit', 'kg'])
+
+    starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+    ends = np.fromiter((m.end() for m in matches), dtype=np.int64, count=len(matches))
+    separators = [m.span() for m in CLAUSE_SEPARATOR.finditer(text)]
+    sep_starts = np.array([a for a, _ in separators] + [len(text)], dtype=np.int64)
+    sep_ends = np.array([0] + [b for _, b in separators], dtype=np.int64)
+
+    # Clause around each quantity, also cut at neighbouring quantities
+    left = np.maximum(sep_ends[np.searchsorted(sep_ends, starts, side='right') - 1],
+                      np.r_[0, ends[:-1]])
+    right = np.minimum(sep_starts[np.searchsorted(sep_starts, ends, side='left')],
+                       np.r_[starts[1:], len(text)])
+    after = _clean_category([text[a:b] for a, b in zip(ends, right)], _AFTER_WORDS)
+    before = _clean_category([text[a:b] for a, b in zip(left, starts)], _BEFORE_WORDS)
+    category = np.where(after != '', after, before)
+
+    quantity = np.array([number.replace(',', '.') if _DECIMAL_COMMA.fullmatch(number)
+                         else number.replace(',', '')
+                         for number in (m.group('quantity') for m in matches)], dtype=np.float64)
+    unit = pd.Series([m.group('unit').lower() for m in matches])
+    return pd.DataFrame({
+        'category': np.where(category != '', category, UNSPECIFIED),
+        'quantity': quantity,
+        'unit': unit.to_numpy(),
+        'kg': quantity * unit.map(UNIT_TO_KG).to_numpy(dtype=np.float64)
+    })
+
+
+def waste_by_category(text: str) -> pd.Series:
+    """Total kg per food category mentioned in `text`, largest first"""
+    frame = extract_frame(text)
+    return frame.groupby('category')['kg'].sum().sort_values(ascending=False)
+
+
+def total_waste_kg(text: str) -> float:
+    """Sum of every quantity in `text`, converted to kg"""
+    return float(extract_frame(text)['kg'].sum())
+
+
+def _line_chunks(source: Union[str, TextIO, Iterable[str]],
+                 chunk_lines: int) -> Iterator[list]:
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    chunk = []
+    for line in source:
+        chunk.append(line.decode('utf-8', 'replace') if isinstance(line, bytes) else line)
+        if len(chunk) >= chunk_lines:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_waste_by_category(source: Union[str, TextIO, Iterable[str]],
+                             chunk_lines: int = DEFAULT_CHUNK_LINES) -> pd.Series:
+    """Per-category kg over a large text, file object or line iterator
+
+    Lines are read `chunk_lines` at a time, so memory stays bounded no
+    matter how large the log is; per-chunk totals are merged at the end.
+    """
+    totals = []
+    for chunk in _line_chunks(source, chunk_lines):
+        frame = extract_frame(chunk)
+        if not frame.empty:
+            totals.append(frame.groupby('category')['kg'].sum())
+    if not totals:
+        return pd.Series(dtype=np.float64, name='kg')
+    return pd.concat(totals).groupby(level=0).sum().sort_values(ascending=False)
+
+
+def stream_file(path: str, chunk_lines: int = DEFAULT_CHUNK_LINES) -> pd.Series:
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return stream_waste_by_category(f, chunk_lines)
+
+
+def benchmark(n_lines=500_000, seed=0):
+    """Throughput on a synthetic kitchen waste log"""
+    rng = np.random.default_rng(seed)
+    foods = ['rice', 'bread', 'dal', 'vegetables', 'chicken curry', 'milk', 'fruit']
+    units = ['kg', 'g', 'kgs', 'lbs', 'tonnes', 'grams']
+    lines = [
+        f"{rng.choice(foods)}: {rng.uniform(0.1, 50):.2f} {rng.choice(units)}, "
+        f"{rng.integers(1, 900)} {rng.choice(units)} of {rng.choice(foods)} discarded"
+        for _ in range(n_lines)
+    ]
+    text = "\n".join(lines)
+    start = time.perf_counter()
+    totals = stream_waste_by_category(text)
+    elapsed = time.perf_counter() - start
+    print(f"{n_lines:,} lines ({len(text) / 1e6:.1f} MB) in {elapsed:.2f}s: "
+          f"{n_lines / elapsed:,.0f} lines/s, {len(text) / 1e6 / elapsed:.1f} MB/s")
+    print(totals.round(1).to_string())
+
+
+if __name__ == "__main__":
+    sample = """Rice: 12.5 kg
+    300 g of bread, 2 lbs chicken curry; dal 1,200 g
+    Vegetables - 0.2 tonnes wasted and 5kg of spoilt fruit"""
+    print(waste_by_category(sample).round(3).to_string())
+    print(f"Total: {total_waste_kg(sample):.3f} kg")
+    benchmark()